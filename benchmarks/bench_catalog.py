@@ -0,0 +1,50 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+"""Benchmarks of the AFLOW prototype catalog."""
+
+import fedorov
+
+QUERIES = {
+    "cP8": {"pearson_symbol": "cP8"},
+    "cubic": {"lattice_system": "cubic"},
+    "sg_range": {"space_group": range(190, 231), "n_atoms": range(1, 9)},
+}
+
+
+def time_aflow_prototype_all():
+    for prototype_index in range(590):
+        fedorov.AflowPrototype(prototype_index, set_type=True)
+
+
+def peakmem_aflow_prototype_all():
+    time_aflow_prototype_all()
+
+
+def time_aflow_vectors_all():
+    for prototype_index in range(590):
+        structure = fedorov.AflowPrototype(prototype_index)
+        structure.get_basis_vectors()
+        structure.get_lattice_vectors()
+
+
+def time_default_structure_all():
+    for prototype_index in range(590):
+        fedorov.bank.get_default_structure(prototype_index)
+
+
+def time_from_query(query):
+    fedorov.AflowPrototype.from_query(**QUERIES[query])
+
+
+time_from_query.params = list(QUERIES)
+time_from_query.param_names = ["query"]
+
+
+def time_from_query_construct(query):
+    list(fedorov.AflowPrototype.from_query(**QUERIES[query]))
+
+
+time_from_query_construct.params = list(QUERIES)
+time_from_query_construct.param_names = ["query"]
@@ -0,0 +1,27 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+"""Benchmarks of ``import fedorov``, timed in fresh interpreters.
+
+The lazy import is compared with the import followed by loading every bundled
+data table and heavy dependency, the cost that the lazy import defers to first
+use. The structure bank is built from the bundled tables rather than bundled
+itself, so it is left out.
+"""
+
+
+def timeraw_import_fedorov():
+    return "import fedorov"
+
+
+def timeraw_import_and_load_data():
+    return """
+    import os, tempfile
+    # never touch the cache directory of the user
+    os.environ["FEDOROV_CACHE_DIR"] = tempfile.mkdtemp()
+    import fedorov, rowan
+    for name in fedorov.data._LOADERS:
+        if name != "aflow_structure_bank":
+            fedorov.data._load_data(name)
+    """
@@ -0,0 +1,67 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+"""Benchmarks of the supercell size scaling."""
+
+import fedorov
+
+# rock salt, with 8 particles per unit cell
+structure = fedorov.Prototype(225, "ab", "AB")
+
+
+def time_build_supercell(replicas):
+    structure.get_supercell(replicas)
+
+
+time_build_supercell.params = [4, 16, 64]
+time_build_supercell.param_names = ["replicas"]
+
+
+def peakmem_build_supercell(replicas):
+    structure.get_supercell(replicas)
+
+
+peakmem_build_supercell.params = time_build_supercell.params
+peakmem_build_supercell.param_names = time_build_supercell.param_names
+
+
+def time_iter_supercell(replicas):
+    basis_vectors, type_list = structure.get_basis_vectors()
+    for _ in fedorov.supercell.iter_supercell(
+        basis_vectors,
+        structure.get_lattice_vectors(),
+        replicas,
+        type_list,
+        chunk_size=2**16,
+    ):
+        pass
+
+
+time_iter_supercell.params = time_build_supercell.params
+time_iter_supercell.param_names = time_build_supercell.param_names
+
+
+def peakmem_iter_supercell(replicas):
+    time_iter_supercell(replicas)
+
+
+peakmem_iter_supercell.params = time_build_supercell.params
+peakmem_iter_supercell.param_names = time_build_supercell.param_names
+
+
+def setup_find_neighbors(replicas):
+    global supercell
+    supercell = structure.get_supercell(replicas)
+
+
+def time_find_neighbors(replicas):
+    # the nearest neighbors of rock salt, at 0.5
+    fedorov.neighbors.find_neighbors(
+        supercell.positions, supercell.lattice_vectors, 0.6
+    )
+
+
+time_find_neighbors.params = [4, 16, 32]
+time_find_neighbors.param_names = ["replicas"]
+time_find_neighbors.setup = setup_find_neighbors
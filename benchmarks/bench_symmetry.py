@@ -0,0 +1,114 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+"""Benchmarks of the symmetry expansion of space groups and prototypes."""
+
+import numpy as np
+
+import fedorov
+
+# general Wyckoff positions of high multiplicity (192, 192 and 96 sites)
+HIGH_MULTIPLICITY = {225: "l", 227: "i", 229: "l"}
+POINT = np.array([[0.11, 0.23, 0.37]])
+
+
+def time_space_group_all():
+    for space_group_number in range(1, 231):
+        fedorov.SpaceGroup(space_group_number)
+
+
+def time_space_group_basis_vectors(space_group_number):
+    space_group = fedorov.SpaceGroup(space_group_number)
+    space_group.get_basis_vectors(POINT)
+
+
+time_space_group_basis_vectors.params = list(HIGH_MULTIPLICITY)
+time_space_group_basis_vectors.param_names = ["space_group_number"]
+
+
+def time_space_group_orientations(n_sites):
+    space_group = fedorov.SpaceGroup(229)
+    positions = np.random.RandomState(0).uniform(0, 1, (n_sites, 3))
+    quaternions = np.tile([1.0, 0.0, 0.0, 0.0], (n_sites, 1))
+    space_group.get_basis_vectors(
+        positions,
+        base_quaternions=quaternions,
+        apply_orientation=True,
+        improper=[1.0, 0.0, 0.0, 0.0],
+    )
+
+
+time_space_group_orientations.params = [1, 100]
+time_space_group_orientations.param_names = ["n_sites"]
+
+
+def setup_orientations(*params):
+    global orientations
+    # one million random unit quaternions
+    orientations = np.random.RandomState(0).normal(size=(10**6, 4))
+    orientations /= np.linalg.norm(orientations, axis=1)[:, np.newaxis]
+
+
+def time_fundamental_zone(point_group_number):
+    point_group = fedorov.PointGroup(point_group_number)
+    point_group.to_fundamental_zone(orientations)
+
+
+time_fundamental_zone.params = [12, 32]
+time_fundamental_zone.param_names = ["point_group_number"]
+time_fundamental_zone.setup = setup_orientations
+
+
+def time_misorientations(n_orientations):
+    point_group = fedorov.PointGroup(30)
+    point_group.get_misorientations(
+        orientations[:n_orientations], orientations[-n_orientations:]
+    )
+
+
+time_misorientations.params = [100, 2000]
+time_misorientations.param_names = ["n_orientations"]
+time_misorientations.setup = setup_orientations
+
+
+def _general_prototype(space_group_number):
+    letter = HIGH_MULTIPLICITY[space_group_number]
+    return fedorov.Prototype(space_group_number, letter)
+
+
+def time_prototype_basis_vectors(space_group_number):
+    prototype = _general_prototype(space_group_number)
+    prototype.get_basis_vectors(x1=0.11, y1=0.23, z1=0.37)
+
+
+time_prototype_basis_vectors.params = list(HIGH_MULTIPLICITY)
+time_prototype_basis_vectors.param_names = ["space_group_number"]
+
+
+def time_prototype_batch(n_points):
+    prototype = _general_prototype(225)
+    values = np.linspace(0, 1, n_points)
+    prototype.get_vectors_batch({"x1": values, "y1": 0.23, "z1": 0.37})
+
+
+time_prototype_batch.params = [10, 1000]
+time_prototype_batch.param_names = ["n_points"]
+
+
+def peakmem_prototype_batch(n_points):
+    time_prototype_batch(n_points)
+
+
+peakmem_prototype_batch.params = time_prototype_batch.params
+peakmem_prototype_batch.param_names = time_prototype_batch.param_names
+
+
+def time_prototype_min_distances(n_points):
+    prototype = _general_prototype(225)
+    values = np.linspace(0, 1, n_points)
+    prototype.get_min_distances({"x1": values, "y1": 0.23, "z1": 0.37})
+
+
+time_prototype_min_distances.params = [10, 100]
+time_prototype_min_distances.param_names = ["n_points"]
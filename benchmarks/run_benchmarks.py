@@ -0,0 +1,204 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+"""Run the benchmarks, store their results and compare them with a baseline.
+
+The benchmarks follow the conventions of airspeed velocity (asv), so they can
+also be run with asv. The modules ``bench_*.py`` of this directory define
+functions named
+
+* ``time_*``, timed in this process;
+* ``timeraw_*``, returning code that is timed in a fresh interpreter;
+* ``peakmem_*``, whose peak memory allocated by Python and numpy is measured
+  with tracemalloc.
+
+A benchmark can be parametrized by a list of values in its ``params``
+attribute. The ``setup`` attribute of the benchmark, or else the ``setup``
+function of the module, is called with the parameter before the benchmark.
+
+Run with ``python benchmarks/run_benchmarks.py [--bench REGEX] [--save FILE]
+[--compare FILE]``. The exit status is 1 if any benchmark is slower or uses
+more memory than in the compared results by more than ``--factor``.
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import pathlib
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import textwrap
+import timeit
+import tracemalloc
+
+_PREFIXES = ("time_", "timeraw_", "peakmem_")
+_TIMERAW = """
+import time
+_start = time.perf_counter()
+exec({code!r})
+print(time.perf_counter() - _start)
+"""
+
+
+def _discover(pattern):
+    """Yield the name, module, function and parameter of the benchmarks."""
+    directory = pathlib.Path(__file__).resolve().parent
+    sys.path.insert(0, str(directory))
+    regex = re.compile(pattern)
+    for path in sorted(directory.glob("bench_*.py")):
+        module = importlib.import_module(path.stem)
+        for name, function in sorted(vars(module).items()):
+            if not name.startswith(_PREFIXES) or not callable(function):
+                continue
+            for param in getattr(function, "params", [None]):
+                key = f"{path.stem}.{name}"
+                if param is not None:
+                    key += f"({param})"
+                if regex.search(key):
+                    yield key, module, function, param
+
+
+def _run(module, function, param, repeat):
+    """Run one benchmark and return its unit and samples."""
+    args = () if param is None else (param,)
+    setup = getattr(function, "setup", getattr(module, "setup", None))
+    if setup is not None:
+        setup(*args)
+    name = function.__name__
+    if name.startswith("timeraw_"):
+        code = _TIMERAW.format(code=textwrap.dedent(function(*args)))
+        samples = [
+            float(
+                subprocess.run(
+                    [sys.executable, "-c", code],
+                    check=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    universal_newlines=True,
+                ).stdout
+            )
+            for _ in range(repeat)
+        ]
+        return "s", samples
+    if name.startswith("peakmem_"):
+        tracemalloc.start()
+        try:
+            function(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return "bytes", [peak]
+    timer = timeit.Timer(lambda: function(*args))
+    number, _ = timer.autorange()
+    return "s", [time / number for time in timer.repeat(repeat, number)]
+
+
+def _format(value, unit):
+    if unit == "bytes":
+        scales = [(2**20, "MiB"), (2**10, "KiB"), (1, "B")]
+    else:
+        scales = [(1, "s"), (1e-3, "ms"), (1e-6, "us"), (1e-9, "ns")]
+    for scale, name in scales:
+        if value >= scale:
+            break
+    return f"{value / scale:.3g} {name}"
+
+
+def _metadata():
+    import numpy
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=pathlib.Path(__file__).parent,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(baseline, results, factor):
+    """Print the ratios of the results to the baseline.
+
+    :param baseline:
+        stored results of a previous run
+    :type baseline:
+        dict
+    :param results:
+        results of this run
+    :type results:
+        dict
+    :param factor:
+        ratio above which a result is a regression
+    :type factor:
+        float
+    :return:
+        names of the regressed benchmarks
+    :rtype:
+        list
+    """
+    regressions = []
+    print(f"\n{'benchmark':<60} {'before':>10} {'after':>10} {'ratio':>6}")
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key]["value"], result["value"]
+        ratio = after / before if before else float("inf")
+        mark = ""
+        if ratio > factor:
+            mark = "+"
+            regressions.append(key)
+        elif ratio < 1 / factor:
+            mark = "-"
+        print(
+            f"{mark:1} {key:<58} {_format(before, result['unit']):>10} "
+            f"{_format(after, result['unit']):>10} {ratio:6.2f}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bench", default="", help="regex of benchmark names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="store the results in a json file")
+    parser.add_argument("--compare", help="compare with results in a json file")
+    parser.add_argument("--factor", type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = {}
+    for key, module, function, param in _discover(args.bench):
+        unit, samples = _run(module, function, param, args.repeat)
+        value = statistics.median(samples)
+        results[key] = {"unit": unit, "value": value, "samples": samples}
+        print(f"{key:<60} {_format(value, unit):>10}", flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {"metadata": _metadata(), "results": results}, f, indent=1
+            )
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(baseline, results, args.factor):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,17 @@
-from . import data
-from .fedorov import AflowPrototype, Prototype
+from . import (
+    bank,
+    catalog,
+    cif,
+    data,
+    generate,
+    io,
+    neighbors,
+    packing,
+    profiling,
+    supercell,
+    wyckoff,
+)
+from .fedorov import AflowPrototype, AflowPrototypeSequence, Prototype
 from .lattice import (
     Cubic,
     Hexagonal,
@@ -19,7 +31,17 @@ from .space_group import PlaneGroup, PointGroup, SpaceGroup
 __version__ = "0.1.0"
 
 __all__ = [
+    "bank",
+    "catalog",
+    "cif",
     "data",
+    "generate",
+    "io",
+    "neighbors",
+    "packing",
+    "profiling",
+    "supercell",
+    "wyckoff",
     "PlaneGroup",
     "Oblique2D",
     "Rectangular2D",
@@ -28,6 +50,7 @@ __all__ = [
     "SpaceGroup",
     "Prototype",
     "AflowPrototype",
+    "AflowPrototypeSequence",
     "Triclinic",
     "Monoclinic",
     "Orthorhombic",
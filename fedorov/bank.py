@@ -0,0 +1,162 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import glob
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from . import data, fedorov
+
+# version of the bank layout and generation code, part of the checksum
+_BANK_VERSION = 1
+# every bundled data file read when evaluating the AFLOW prototypes
+_SOURCES = (
+    "aflow_catalog.bin",
+    "wyckoff_site_data.bin",
+    "wyckoff_orbit_templates.bin",
+    "space_group_symmetry_operations.bin",
+    "space_group_hall_mapping.json",
+    "space_group_lattice_mapping.json",
+)
+_N_PROTOTYPES = 590
+
+
+def _get_checksum():
+    """Hash the bank version and the source data the bank is built from."""
+    digest = hashlib.sha256(str(_BANK_VERSION).encode())
+    for filename in _SOURCES:
+        with open(os.path.join(data._DATA_PATH, filename), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_cache_dir():
+    """Get the directory of the cached structure bank.
+
+    The directory is given by the environment variable ``FEDOROV_CACHE_DIR``,
+    by default ``fedorov`` in ``XDG_CACHE_HOME`` or ``~/.cache``.
+
+    :return:
+        path of the cache directory
+    :rtype:
+        str
+    """
+    cache_dir = os.environ.get("FEDOROV_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "fedorov")
+
+
+def _build_bank():
+    """Evaluate all AFLOW prototypes at their default parameters.
+
+    :return:
+        the offsets of the particles of each prototype, the basis vectors and
+        type ids of all particles, and the lattice vectors of each prototype
+    :rtype:
+        list
+    """
+    offsets = np.zeros(_N_PROTOTYPES + 1, dtype=np.int64)
+    basis_vectors, typeids = [], []
+    lattice_vectors = np.empty((_N_PROTOTYPES, 3, 3))
+    for i in range(_N_PROTOTYPES):
+        structure = fedorov.AflowPrototype(i, set_type=True)
+        basis, type_list = structure.get_basis_vectors()
+        basis_vectors.append(basis)
+        typeids.append([ord(name) - ord("A") for name in type_list])
+        lattice_vectors[i] = structure.get_lattice_vectors()
+        offsets[i + 1] = offsets[i] + len(basis)
+    return [
+        offsets,
+        np.concatenate(basis_vectors),
+        np.concatenate(typeids).astype(np.int8),
+        lattice_vectors,
+    ]
+
+
+def _write_bank(path, arrays):
+    """Write the bank atomically and remove the banks of older source data.
+
+    Only banks of the same bank version are removed, so that installations
+    with a different bank version can share the cache directory.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for array in arrays:
+                np.lib.format.write_array(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    for stale in glob.glob(os.path.join(directory, _bank_prefix() + "*")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def _bank_prefix():
+    return f"aflow_structure_bank_v{_BANK_VERSION}_"
+
+
+@data._register_loader("aflow_structure_bank")
+def _load_bank():
+    path = os.path.join(
+        get_cache_dir(), f"{_bank_prefix()}{_get_checksum()[:16]}.bin"
+    )
+    if not os.path.exists(path):
+        arrays = _build_bank()
+        try:
+            _write_bank(path, arrays)
+        except OSError:
+            # read-only cache directory, keep the bank in memory
+            for array in arrays:
+                array.flags.writeable = False
+            return arrays
+    return data._load_packed_arrays(path)
+
+
+def get_default_structure(prototype_index):
+    """Get an AFLOW prototype evaluated at its default parameters.
+
+    The basis vectors, type ids and lattice vectors of all 590 AFLOW
+    prototypes are computed once and stored in a packed file in
+    :func:`get_cache_dir`, which is memory-mapped afterwards. The file name
+    contains a checksum of the source data, so that the bank is rebuilt when
+    the source data changes. The returned arrays are zero-copy read-only
+    views into the bank.
+
+    :param prototype_index:
+        prototype index [0, 589] for all 590 prototypes in AFLOW
+    :type prototype_index:
+        int
+    :return:
+        N by 3 basis vectors, N type ids (0 for type A, 1 for type B, ..., as
+        with ``set_type=True``) and 3 by 3 lattice vectors
+    :rtype:
+        tuple
+    """
+    if prototype_index < 0 or prototype_index >= _N_PROTOTYPES:
+        raise ValueError(
+            "prototype_index must be an integer between 0 and 590."
+        )
+    offsets, basis_vectors, typeids, lattice_vectors = data._load_data(
+        "aflow_structure_bank"
+    )
+    particles = slice(offsets[prototype_index], offsets[prototype_index + 1])
+    return (
+        basis_vectors[particles],
+        typeids[particles],
+        lattice_vectors[prototype_index],
+    )
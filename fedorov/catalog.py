@@ -0,0 +1,165 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import functools
+import re
+
+import numpy as np
+
+from . import data
+
+_EMPTY = np.zeros(0, dtype=np.intp)
+# re.Pattern only exists from Python 3.7 on
+_PATTERN_TYPE = type(re.compile(""))
+
+
+class _Index:
+    """Hash map and sorted array index of one catalog column.
+
+    The hash map groups the rows by value, each group holding the increasing
+    row indices of that value. The rows sorted by value allow range queries
+    with a binary search.
+    """
+
+    def __init__(self, values):
+        order = np.argsort(values, kind="stable")
+        order.flags.writeable = False
+        keys, starts = np.unique(values[order], return_index=True)
+        self.order = order
+        self.sorted_values = values[order]
+        self.groups = dict(zip(keys.tolist(), np.split(order, starts[1:])))
+
+    def lookup(self, value):
+        """Get the increasing indices of the rows matching ``value``.
+
+        :param value:
+            a single value, a compiled regular expression searched in the
+            values, a ``range`` of integer values, or a collection of values
+        :return:
+            the matching row indices
+        :rtype:
+            np.ndarray
+        """
+        if isinstance(value, _PATTERN_TYPE):
+            groups = [
+                group
+                for key, group in self.groups.items()
+                if isinstance(key, str) and value.search(key)
+            ]
+        elif isinstance(value, range) and value.step == 1:
+            start, stop = np.searchsorted(
+                self.sorted_values, [value.start, value.stop]
+            )
+            return np.sort(self.order[start:stop])
+        elif isinstance(
+            value, (range, set, frozenset, list, tuple, np.ndarray)
+        ):
+            groups = [self.groups.get(key, _EMPTY) for key in set(value)]
+        else:
+            return self.groups.get(value, _EMPTY)
+        if not groups:
+            return _EMPTY
+        if len(groups) == 1:
+            return groups[0]
+        return np.sort(np.concatenate(groups))
+
+
+class AflowCatalog:
+    """Indexed catalog of the AFLOW prototypes.
+
+    The catalog holds the columns of the AFLOW prototype database as arrays,
+    and indexes the columns ``id``, ``pearson_symbol``, ``space_group``,
+    ``prototype``, ``lattice_system`` and ``n_atoms`` (the number of atoms in
+    the conventional cell, from the Pearson symbol) when it is built. Queries
+    are answered from the indexes in time proportional to the size of the
+    result, see :meth:`query`.
+
+    :param entries:
+        structured array of the entries of the AFLOW prototype database
+    :type entries:
+        np.ndarray
+    """
+
+    columns = (
+        "id",
+        "pearson_symbol",
+        "space_group",
+        "prototype",
+        "lattice_system",
+        "n_atoms",
+    )
+
+    def __init__(self, entries):
+        self.id = np.asarray(entries["id"])
+        self.pearson_symbol = np.asarray(entries["pearson_symbol"])
+        self.space_group = np.asarray(entries["space_group"], dtype=int)
+        self.prototype = np.asarray(entries["prototype"])
+        lattice_mapping = data._load_data("space_group_lattice_mapping")
+        self.lattice_system = np.array(
+            [lattice_mapping[number] for number in self.space_group.tolist()]
+        )
+        self.n_atoms = np.array(
+            [int(symbol[2:]) for symbol in self.pearson_symbol.tolist()]
+        )
+        self._indexes = {
+            column: _Index(getattr(self, column)) for column in self.columns
+        }
+
+    def __len__(self):
+        return len(self.id)
+
+    def query(self, **criteria):
+        """Find the prototypes matching all the given criteria.
+
+        Each criterion is a column name with one of the following values:
+
+        * a single value, e.g. ``space_group=225``;
+        * a collection of values, e.g. ``lattice_system={"cubic",
+          "hexagonal"}``;
+        * a ``range`` of values of an integer column, e.g.
+          ``n_atoms=range(1, 9)``;
+        * a compiled regular expression searched in the values of a string
+          column, e.g. ``prototype=re.compile("^Al")``;
+        * None, which matches any value.
+
+        :param criteria:
+            criteria on the columns ``id``, ``pearson_symbol``,
+            ``space_group``, ``prototype``, ``lattice_system`` and ``n_atoms``
+        :return:
+            the increasing indices of the matching prototypes
+        :rtype:
+            np.ndarray
+        """
+        unknown = criteria.keys() - set(self.columns)
+        if unknown:
+            raise ValueError(
+                f"unknown catalog columns {sorted(unknown)}, the columns are "
+                f"{list(self.columns)}"
+            )
+        matches = [
+            self._indexes[column].lookup(value)
+            for column, value in criteria.items()
+            if value is not None
+        ]
+        if not matches:
+            return np.arange(len(self))
+        matches.sort(key=len)
+        result = matches[0]
+        for match in matches[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, match, assume_unique=True)
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def get_aflow_catalog():
+    """Get the shared indexed catalog of the AFLOW prototypes.
+
+    :return:
+        the catalog of the AFLOW prototype database
+    :rtype:
+        :class:`AflowCatalog`
+    """
+    return AflowCatalog(data._load_data("aflow_database")[0])
@@ -0,0 +1,419 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import collections
+import concurrent.futures
+import pathlib
+import re
+import string
+
+import numpy as np
+
+from . import data, fedorov, space_group, wyckoff
+
+CifStructure = collections.namedtuple(
+    "CifStructure",
+    [
+        "prototype",
+        "basis_params",
+        "lattice_params",
+        "type_names",
+        "basis_vectors",
+        "type_list",
+        "lattice_vectors",
+    ],
+)
+CifStructure.__doc__ = """Crystal structure read from a CIF.
+
+:param prototype:
+    the :class:`Prototype` of the structure, or None if the CIF has no Wyckoff
+    symbols or is not in the setting of the Wyckoff database
+:param basis_params:
+    basis parameters of the prototype, or None
+:param lattice_params:
+    lattice parameters of the prototype, or None
+:param type_names:
+    chemical symbol of each type letter of the prototype, in the order A, B,
+    C, ...
+:param basis_vectors:
+    N by 3 array of fractional coordinates of all particles in the unit cell
+:param type_list:
+    chemical symbol of each particle
+:param lattice_vectors:
+    3 by 3 array of lattice vectors
+"""
+
+_TOKEN_REGEX = re.compile(
+    r"(?ms)^;(.*?)^;"
+    r"|'([^\n]*?)'(?=\s|$)"
+    r'|"([^\n]*?)"(?=\s|$)'
+    r"|#[^\n]*"
+    r"|(\S+)"
+)
+_BARE = 4
+
+_SPACE_GROUP_TAGS = ("_space_group_it_number", "_symmetry_int_tables_number")
+_SYMMETRY_OPERATION_TAGS = (
+    "_space_group_symop_operation_xyz",
+    "_symmetry_equiv_pos_as_xyz",
+)
+_CELL_TAGS = {
+    "a": "_cell_length_a",
+    "b": "_cell_length_b",
+    "c": "_cell_length_c",
+    "alpha": "_cell_angle_alpha",
+    "beta": "_cell_angle_beta",
+    "gamma": "_cell_angle_gamma",
+}
+# hexagonal to rhombohedral fractional coordinates (obverse setting)
+_HEXAGONAL_TO_RHOMBOHEDRAL = np.array([[1, -1, 0], [0, 1, -1], [1, 1, 1]])
+_SHIFTS = np.stack(
+    np.meshgrid(*[np.arange(-3, 4)] * 3, indexing="ij"), axis=-1
+).reshape(-1, 3)
+
+
+def _parse_cif(text):
+    """Parse the data items of the first data block of a CIF.
+
+    :return:
+        mapping of the lower case tags to their value, or to the list of their
+        values for looped items
+    :rtype:
+        dict
+    """
+    tokens = [
+        (match.lastindex, match.group(match.lastindex))
+        for match in _TOKEN_REGEX.finditer(text)
+        if match.lastindex
+    ]
+
+    def is_keyword(i):
+        kind, token = tokens[i]
+        return kind == _BARE and (
+            token[0] == "_"
+            or token.lower() in ("loop_", "global_")
+            or token[:5].lower() in ("data_", "save_")
+        )
+
+    items = {}
+    in_block = False
+    i = 0
+    while i < len(tokens):
+        kind, token = tokens[i]
+        keyword = token.lower().replace(".", "_") if kind == _BARE else ""
+        i += 1
+        if keyword.startswith("data_"):
+            if in_block:
+                break
+            in_block = True
+        elif keyword == "loop_":
+            tags = []
+            while (
+                i < len(tokens)
+                and tokens[i][0] == _BARE
+                and tokens[i][1][0] == "_"
+            ):
+                tags.append(tokens[i][1].lower().replace(".", "_"))
+                i += 1
+            values = []
+            while i < len(tokens) and not is_keyword(i):
+                values.append(tokens[i][1])
+                i += 1
+            for j, tag in enumerate(tags):
+                items[tag] = values[j :: len(tags)]
+        elif keyword.startswith("_") and i < len(tokens):
+            items[keyword] = tokens[i][1]
+            i += 1
+    return items
+
+
+def _to_float(value):
+    """Convert a CIF number, possibly with an uncertainty, to a float."""
+    return float(value.split("(", 1)[0])
+
+
+def _get_item(items, tags):
+    for tag in tags:
+        if tag in items:
+            return items[tag]
+    return None
+
+
+def _get_symbol(value):
+    match = re.match(r"[A-Za-z]+", value)
+    if match is None:
+        raise ValueError(f"'{value}' is not a valid atom type")
+    return match.group()
+
+
+def _fit_site(positions, letter, point):
+    """Find the free parameters of a Wyckoff site from one of its points.
+
+    The parameters are solved for every map of the orbit of the Wyckoff
+    position and every integer shift of the point, the first exact solution
+    is returned.
+
+    :return:
+        the values of x, y, z in [0, 1), or None if the point is not on the
+        Wyckoff position
+    :rtype:
+        np.ndarray
+    """
+    matrices, translations, _ = positions.get_orbit(letter)
+    # the first map of the orbit is the Wyckoff position itself
+    for orbit in (slice(0, 1), slice(0, None)):
+        targets = point - translations[orbit, np.newaxis, :] + _SHIFTS
+        params = np.einsum(
+            "kij,ksj->ksi", np.linalg.pinv(matrices[orbit]), targets
+        )
+        residuals = np.einsum("kij,ksj->ksi", matrices[orbit], params) - targets
+        residuals = np.abs(residuals - np.rint(residuals)).max(axis=-1)
+        exact = np.argwhere(residuals < 1e-3)
+        if len(exact):
+            values = params[tuple(exact[0])]
+            return values - np.floor(values)
+    return None
+
+
+def _to_rhombohedral(cell, points):
+    """Convert a cell and points from hexagonal to rhombohedral axes."""
+    a, c = cell["a"], cell["c"]
+    cell = dict(
+        cell,
+        a=np.sqrt(3 * a**2 + c**2) / 3,
+        alpha=np.arccos((2 * c**2 - 3 * a**2) / (2 * c**2 + 6 * a**2)),
+    )
+    return cell, points.dot(_HEXAGONAL_TO_RHOMBOHEDRAL)
+
+
+def _fit_prototype(number, wyckoff_symbols, cell, points, type_by_site):
+    """Map the atom sites of a CIF onto the Wyckoff sites of a prototype.
+
+    :return:
+        the arguments, basis parameters and lattice parameters of the
+        prototype, or None if the sites do not match the Wyckoff database
+    :rtype:
+        tuple
+    """
+    if number is None or wyckoff_symbols is None:
+        return None
+    if isinstance(wyckoff_symbols, str):
+        wyckoff_symbols = [wyckoff_symbols]
+    positions = wyckoff.get_wyckoff_positions(number)
+    letters = "".join(
+        symbol.lstrip(string.digits) for symbol in wyckoff_symbols
+    )
+    if len(letters) != len(points) or any(
+        letter not in positions for letter in letters
+    ):
+        return None
+    prototype = fedorov.Prototype(number, letters, type_by_site)
+    basis_params = {}
+    for order, (letter, point) in enumerate(zip(letters, points)):
+        values = _fit_site(positions, letter, point)
+        if values is None:
+            return None
+        for param, value in zip("xyz", values):
+            if param + str(order + 1) in prototype.basis_params:
+                basis_params[param + str(order + 1)] = float(value)
+    lattice_params = {
+        param: float(cell[param]) for param in prototype.lattice_params
+    }
+    return (number, letters, type_by_site), basis_params, lattice_params
+
+
+def _read_spec(filename):
+    """Read a CIF into picklable data, see :func:`read_cif`."""
+    items = _parse_cif(pathlib.Path(filename).read_text(errors="replace"))
+    try:
+        cell = {
+            param: _to_float(items[tag]) for param, tag in _CELL_TAGS.items()
+        }
+        points = np.array(
+            [
+                [_to_float(value) for value in items[f"_atom_site_fract_{x}"]]
+                for x in "xyz"
+            ]
+        ).T.reshape(-1, 3)
+        symbols = _get_item(
+            items, ("_atom_site_type_symbol", "_atom_site_label")
+        )
+        if symbols is None:
+            raise KeyError("_atom_site_type_symbol")
+    except KeyError as error:
+        raise ValueError(f"{filename} lacks the CIF item {error}") from None
+    for param in ("alpha", "beta", "gamma"):
+        cell[param] = np.radians(cell[param])
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    symbols = [_get_symbol(symbol) for symbol in symbols]
+    type_names = list(dict.fromkeys(symbols))
+    number = _get_item(items, _SPACE_GROUP_TAGS)
+    number = None if number in (None, "?", ".") else int(number)
+    operations = _get_item(items, _SYMMETRY_OPERATION_TAGS)
+
+    standard_cell, standard_points = cell, points
+    if (
+        number is not None
+        and space_group.SpaceGroup(number).lattice_type == "rhombohedral"
+        and np.isclose(cell["gamma"], 2 * np.pi / 3)
+    ):
+        standard_cell, standard_points = _to_rhombohedral(cell, points)
+
+    if len(type_names) <= len(string.ascii_uppercase):
+        type_by_site = "".join(
+            string.ascii_uppercase[type_names.index(symbol)]
+            for symbol in symbols
+        )
+        prototype = _fit_prototype(
+            number,
+            items.get("_atom_site_wyckoff_symbol"),
+            standard_cell,
+            standard_points,
+            type_by_site,
+        )
+        if prototype is not None:
+            return prototype + (type_names,)
+
+    if operations is not None:
+        if isinstance(operations, str):
+            operations = [operations]
+        affine = [
+            wyckoff.compile_position(operation.lower().split(","))
+            for operation in operations
+        ]
+        rotations = np.array([matrix for matrix, _ in affine])
+        translations = np.array([offset for _, offset in affine])
+    elif number is not None:
+        rotations, translations = space_group._get_symmetry_operations(number)
+        cell, points = standard_cell, standard_points
+    else:
+        raise ValueError(
+            f"{filename} has neither a space group number nor symmetry "
+            "operations"
+        )
+    # the coordinates in CIFs are rounded, merge the images within the
+    # precision used to match the Wyckoff sites
+    basis_vectors, _, site = space_group._expand_orbits(
+        rotations,
+        translations,
+        points - np.floor(points),
+        ordering="site",
+        threshold=1e-3,
+    )
+    return (
+        None,
+        None,
+        None,
+        type_names,
+        basis_vectors,
+        [symbols[i] for i in site],
+        data.translate_to_vector(**cell),
+    )
+
+
+def _build(spec):
+    """Build the :class:`CifStructure` of the data read by a worker."""
+    if len(spec) == 7:
+        return CifStructure(*spec)
+    (number, letters, type_by_site), basis_params, lattice_params, names = spec
+    prototype = fedorov.Prototype(number, letters, type_by_site)
+    basis_vectors, type_list = prototype.get_basis_vectors(**basis_params)
+    return CifStructure(
+        prototype,
+        basis_params,
+        lattice_params,
+        names,
+        basis_vectors,
+        [names[string.ascii_uppercase.index(name)] for name in type_list],
+        prototype.get_lattice_vectors(**lattice_params),
+    )
+
+
+def read_cif(filename):
+    """Read a crystal structure from the first data block of a CIF.
+
+    When the CIF gives the space group number and the Wyckoff symbol of every
+    atom site, the sites are mapped onto the Wyckoff sites of a
+    :class:`Prototype` and their free parameters are solved from the
+    fractional coordinates. The CIF must then be in the setting of the
+    Wyckoff database, except for rhombohedral space groups, which can be
+    given in hexagonal axes. Otherwise, the atom sites are expanded into the
+    basis vectors of the unit cell with the symmetry operations listed in the
+    CIF, or with those of the space group. Partial occupancies are ignored.
+
+    :param filename:
+        path of the CIF
+    :type filename:
+        str
+    :return:
+        the crystal structure
+    :rtype:
+        :class:`CifStructure`
+    """
+    return _build(_read_spec(filename))
+
+
+def _read_spec_or_error(filename):
+    try:
+        return _read_spec(filename), None
+    except Exception as error:
+        return None, error
+
+
+def read_cif_directory(
+    directory, pattern="*.cif", processes=None, chunksize=16, skip_errors=False
+):
+    """Read all the CIFs of a directory in parallel worker processes.
+
+    The files are parsed by a pool of worker processes, ``chunksize`` files
+    at a time, and the structures are built in the calling process.
+
+    :param directory:
+        path of the directory
+    :type directory:
+        str
+    :param pattern:
+        glob pattern of the file names relative to the directory, e.g.
+        ``"**/*.cif"`` to also read the files of the subdirectories
+    :type pattern:
+        str
+    :param processes:
+        number of worker processes, default the number of CPUs, 1 to read the
+        files in the calling process
+    :type processes:
+        int
+    :param chunksize:
+        number of files sent to a worker process at once
+    :type chunksize:
+        int
+    :param skip_errors:
+        leave out the files that can not be read instead of raising an error
+    :type skip_errors:
+        bool
+    :return:
+        mapping of the sorted file paths to their structures
+    :rtype:
+        dict
+    """
+    filenames = sorted(
+        str(path) for path in pathlib.Path(directory).glob(pattern)
+    )
+    if processes == 1:
+        results = map(_read_spec_or_error, filenames)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = list(
+                executor.map(
+                    _read_spec_or_error, filenames, chunksize=chunksize
+                )
+            )
+    structures = {}
+    for filename, (spec, error) in zip(filenames, results):
+        if error is not None:
+            if skip_errors:
+                continue
+            raise ValueError(f"could not read {filename}") from error
+        structures[filename] = _build(spec)
+    return structures
@@ -0,0 +1,112 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+# NOTE: this is the code for record that generates the packed AFLOW prototype
+# catalog from Aflow_processed_data.csv. The use of this code is not required
+# to use this package
+
+# The file consists of seven consecutive npy arrays: the entries of the 590
+# prototypes, then the row offsets and the rows of their lattice parameters,
+# of their basis parameters and of their Wyckoff sites (rows
+# offsets[i]:offsets[i + 1] belong to prototype i). The lattice parameters are
+# stored in the form used by fedorov: angles in radians, b/a and c/a ratios
+# converted to lengths, and rhombohedral lattices in rhombohedral axes. The
+# type letter of each Wyckoff site is the one used with set_type=True.
+import ast
+import csv
+
+import numpy as np
+
+RHOMBOHEDRAL_SPACE_GROUPS = {146, 148, 155, 160, 161, 166, 167}
+
+entries = []
+lattice_params = []
+basis_params = []
+sites = []
+offsets = {
+    "lattice": [0],
+    "basis": [0],
+    "sites": [0],
+}
+
+with open("Aflow_processed_data.csv", newline="") as f:
+    for row in csv.DictReader(f):
+        space_group_number = int(row["space_group"])
+        lattice = dict(
+            zip(
+                ast.literal_eval(row["lattice_params"]),
+                ast.literal_eval(row["lattice_params_value"]),
+            )
+        )
+        for key in {"alpha", "beta", "gamma"} & lattice.keys():
+            lattice[key] = lattice[key] / 180 * np.pi
+        if space_group_number in RHOMBOHEDRAL_SPACE_GROUPS:
+            a = lattice.pop("a")
+            c = lattice.pop("c/a") * a
+            lattice["a"] = np.sqrt(a**2 / 3 + c**2 / 9)
+            lattice["alpha"] = np.arccos(
+                (2 * c**2 - 3 * a**2) / (2 * (c**2 + 3 * a**2))
+            )
+        else:
+            a = lattice["a"]
+            if "b/a" in lattice:
+                lattice["b"] = lattice.pop("b/a") * a
+            if "c/a" in lattice:
+                lattice["c"] = lattice.pop("c/a") * a
+        lattice_params.extend(lattice.items())
+
+        basis_params.extend(
+            zip(
+                ast.literal_eval(row["basis_params"]),
+                ast.literal_eval(row["basis_params_value"]),
+            )
+        )
+
+        # the sites are sorted by letter, the sites of the n-th atom type get
+        # the n-th type letter
+        sites_by_type = ast.literal_eval(row["wyckoff_sites"])
+        letters = sorted("".join(sites_by_type))
+        types = ["A"] * len(letters)
+        remaining = "".join(letters)
+        for type_name, type_sites in zip(
+            "ABCDEFGHIJKLMNOPQRSTUVWXYZ", sites_by_type
+        ):
+            for letter in type_sites:
+                order = remaining.find(letter)
+                remaining = remaining.replace(letter, "0", 1)
+                types[order] = type_name
+        sites.extend(zip(letters, types))
+
+        entries.append(
+            (
+                row["id"],
+                row["pearson_symbol"],
+                space_group_number,
+                row["prototype"],
+            )
+        )
+        offsets["lattice"].append(len(lattice_params))
+        offsets["basis"].append(len(basis_params))
+        offsets["sites"].append(len(sites))
+
+with open("aflow_catalog.bin", "wb") as f:
+    np.lib.format.write_array(
+        f,
+        np.array(
+            entries,
+            dtype=[
+                ("id", "U28"),
+                ("pearson_symbol", "U8"),
+                ("space_group", "i2"),
+                ("prototype", "U20"),
+            ],
+        ),
+    )
+    for name, rows, dtype in (
+        ("lattice", lattice_params, [("name", "U5"), ("value", "f8")]),
+        ("basis", basis_params, [("name", "U5"), ("value", "f8")]),
+        ("sites", sites, [("letter", "U1"), ("type", "U1")]),
+    ):
+        np.lib.format.write_array(f, np.array(offsets[name], dtype=np.int32))
+        np.lib.format.write_array(f, np.array(rows, dtype=dtype))
@@ -0,0 +1,38 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+# NOTE: this is the code for record that generates the packed symmetry
+# operations of all space groups from spglib. The use of this code is not
+# required to use this package
+
+# The file consists of three consecutive npy arrays: the row offsets of each
+# space group (rows offsets[n]:offsets[n + 1] belong to space group n), the
+# rotation matrices and the translations of all symmetry operations. All the
+# translations are multiples of 1/12 and are stored in units of 1/12.
+import json
+
+import numpy as np
+import spglib as spg
+
+with open("space_group_hall_mapping.json", "r") as f:
+    space_group_hall_mapping = json.load(f)
+
+rotations = []
+translations = []
+offsets = np.zeros(232, dtype=np.int32)
+for space_group_number in range(1, 231):
+    info = spg.get_symmetry_from_database(
+        space_group_hall_mapping[str(space_group_number)]
+    )
+    rotations.append(info["rotations"])
+    translations.append(info["translations"])
+    offsets[space_group_number + 1] = (
+        offsets[space_group_number] + info["rotations"].shape[0]
+    )
+
+with open("space_group_symmetry_operations.bin", "wb") as f:
+    np.lib.format.write_array(f, offsets)
+    np.lib.format.write_array(f, np.concatenate(rotations).astype(np.int8))
+    translations = np.rint(np.concatenate(translations) * 12)
+    np.lib.format.write_array(f, translations.astype(np.int8))
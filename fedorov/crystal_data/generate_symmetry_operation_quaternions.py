@@ -0,0 +1,66 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+# NOTE: this is the code for record that generates the quaternions of the
+# symmetry operations of all space and plane groups from the packed space
+# group symmetry operations and the plane group data. The use of this code is
+# not required to use this package
+
+# The rotation matrices of the operations are given in the basis of the
+# lattice vectors, and are converted to Cartesian coordinates with the lattice
+# vectors of the default parameters of the lattice of each group. The result
+# does not depend on the lattice parameters, except for the rhombohedral space
+# groups, whose quaternions are computed from the actual lattice vectors when
+# the particles are oriented. The quaternion of an operation is the quaternion
+# of its Cartesian rotation matrix R when R is proper, and of -R when R is
+# improper, i.e. the rotation composed with the inversion to give the
+# operation. The plane group operations are embedded in 3D as rotations of the
+# xy plane. The file consists of five
+# consecutive npy arrays: the quaternions and improper flags of the space
+# group operations, in the order of space_group_symmetry_operations.bin, the
+# row offsets of each plane group (rows offsets[n]:offsets[n + 1] belong to
+# plane group n), and the quaternions and improper flags of the plane group
+# operations.
+import numpy as np
+
+from fedorov import PlaneGroup, SpaceGroup, space_group
+
+space_quaternions = []
+space_improper = []
+for space_group_number in range(1, 231):
+    group = SpaceGroup(space_group_number)
+    quaternions, improper = space_group._get_cartesian_quaternions(
+        group.rotations, group.get_lattice_vectors()
+    )
+    space_quaternions.append(quaternions)
+    space_improper.append(improper)
+space_quaternions = np.concatenate(space_quaternions)
+space_improper = np.concatenate(space_improper)
+
+plane_quaternions = []
+plane_improper = []
+offsets = np.zeros(19, dtype=np.int32)
+for plane_group_number in range(1, 18):
+    group = PlaneGroup(plane_group_number)
+    rotations = np.tile(np.identity(3), (len(group.rotations), 1, 1))
+    rotations[:, :2, :2] = group.rotations
+    lattice_vectors = np.identity(3)
+    lattice_vectors[:2, :2] = group.get_lattice_vectors()
+    quaternions, improper = space_group._get_cartesian_quaternions(
+        rotations, lattice_vectors
+    )
+    plane_quaternions.append(quaternions)
+    plane_improper.append(improper)
+    offsets[plane_group_number + 1] = offsets[plane_group_number] + len(
+        rotations
+    )
+plane_quaternions = np.concatenate(plane_quaternions)
+plane_improper = np.concatenate(plane_improper)
+
+with open("symmetry_operation_quaternions.bin", "wb") as f:
+    np.lib.format.write_array(f, space_quaternions)
+    np.lib.format.write_array(f, space_improper)
+    np.lib.format.write_array(f, offsets)
+    np.lib.format.write_array(f, plane_quaternions)
+    np.lib.format.write_array(f, plane_improper)
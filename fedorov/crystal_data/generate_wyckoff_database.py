@@ -0,0 +1,33 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+# NOTE: this is the code for record that packs the per space group Wyckoff
+# site json files into the single binary Wyckoff database read by the package.
+# The use of this code is not required to use this package
+
+# The database consists of two consecutive npy arrays: the row offsets of each
+# space group (rows offsets[n]:offsets[n + 1] belong to space group n) and the
+# Wyckoff site records sorted by space group.
+import json
+
+import numpy as np
+
+sites = []
+offsets = np.zeros(232, dtype=np.int32)
+for space_group_number in range(1, 231):
+    with open(
+        "space_group_{}_Wyckoff_site_data.json".format(space_group_number), "r"
+    ) as f:
+        wyckoff_positions = json.load(f)
+    for letter, position in wyckoff_positions.items():
+        sites.append((letter, position))
+    offsets[space_group_number + 1] = len(sites)
+
+width = max(len(item) for _, position in sites for item in position)
+dtype = np.dtype([("letter", "S1"), ("position", "S{}".format(width), (3,))])
+sites = np.array(sites, dtype=dtype)
+
+with open("wyckoff_site_data.bin", "wb") as f:
+    np.lib.format.write_array(f, offsets)
+    np.lib.format.write_array(f, sites)
@@ -0,0 +1,48 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+# NOTE: this is the code for record that generates the orbit templates of all
+# Wyckoff positions from the packed Wyckoff database and symmetry operations.
+# The use of this code is not required to use this package
+
+# The orbit of the Wyckoff position x -> M.x + t under the symmetry operations
+# x -> R.x + tau is the list of the distinct affine maps
+# x -> (R.M).x + R.t + tau
+# (modulo lattice translations). The file consists of four consecutive npy
+# arrays: the offsets of the orbit of each row of the Wyckoff database (rows
+# offsets[i]:offsets[i + 1] belong to Wyckoff position i), the matrices R.M,
+# the translations R.t + tau in units of 1/24 and the index of the first
+# symmetry operation generating each map.
+import numpy as np
+
+from fedorov import space_group, wyckoff
+
+matrices = []
+translations = []
+operations = []
+offsets = [0]
+for space_group_number in range(1, 231):
+    rotations, taus = space_group._get_symmetry_operations(space_group_number)
+    positions = wyckoff.get_wyckoff_positions(space_group_number)
+    for letter in positions:
+        matrix, offset = positions.get_affine(letter)
+        orbit_matrices = np.einsum("oij,jk->oik", rotations, matrix)
+        orbit_translations = (
+            np.rint((rotations.dot(offset) + taus) * 24).astype(int) % 24
+        )
+        keys = np.concatenate(
+            [orbit_matrices.reshape(-1, 9), orbit_translations], axis=1
+        )
+        _, first = np.unique(keys, axis=0, return_index=True)
+        first.sort()
+        matrices.append(orbit_matrices[first])
+        translations.append(orbit_translations[first])
+        operations.append(first)
+        offsets.append(offsets[-1] + len(first))
+
+with open("wyckoff_orbit_templates.bin", "wb") as f:
+    np.lib.format.write_array(f, np.array(offsets, dtype=np.int32))
+    np.lib.format.write_array(f, np.concatenate(matrices).astype(np.int8))
+    np.lib.format.write_array(f, np.concatenate(translations).astype(np.int8))
+    np.lib.format.write_array(f, np.concatenate(operations).astype(np.int16))
@@ -2,13 +2,219 @@
 # This file is part of the fedorov project, released under the BSD 3-Clause
 # License.
 
+import json
 import os
+import pickle
+import threading
 
 import numpy as np
 
+from . import profiling, util
+
 _DATA_PATH = os.path.join(os.path.dirname(__file__), "crystal_data")
 
+# Registry of the bundled crystal data tables. Each table is only read from
+# disk (and its heavy dependencies imported) the first time it is requested.
+# The lock is reentrant so that a loader can itself load other tables.
+_LOADERS = {}
+_TABLES = {}
+_TABLES_LOCK = threading.RLock()
+
+
+def _register_loader(name):
+    """Register the decorated function as the loader of data table ``name``."""
+
+    def decorator(loader):
+        _LOADERS[name] = loader
+        return loader
+
+    return decorator
+
+
+def _load_data(name):
+    """Return the data table ``name``, loading it on first use.
+
+    :param name:
+        name of a registered data table
+    :type name:
+        str
+    :return:
+        the loaded data table
+    """
+    try:
+        return _TABLES[name]
+    except KeyError:
+        pass
+    if name not in _LOADERS:
+        raise KeyError(f"no loader is registered for data table '{name}'")
+    with _TABLES_LOCK:
+        if name not in _TABLES:
+            with profiling._phase(f"data.load.{name}"):
+                _TABLES[name] = _LOADERS[name]()
+    return _TABLES[name]
+
+
+class _LazyData:
+    """Class attribute that resolves to a data table on first access."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        return _load_data(self.name)
+
+
+def _load_json(filename):
+    with open(os.path.join(_DATA_PATH, filename), "r") as f:
+        return json.load(f, object_hook=util.json_key_to_int)
+
+
+def _load_pickle(filename):
+    with open(os.path.join(_DATA_PATH, filename), "rb") as f:
+        return pickle.load(f)
+
+
+def _load_packed_arrays(filename):
+    """Memory-map the consecutive npy arrays stored in a packed data file.
+
+    :param filename:
+        name of the packed file in the crystal data directory
+    :type filename:
+        str
+    :return:
+        read-only views of the memory-mapped arrays, in file order
+    :rtype:
+        list
+    """
+    path = os.path.join(_DATA_PATH, filename)
+    arrays = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        while f.tell() < size:
+            if np.lib.format.read_magic(f) == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            offset = f.tell()
+            # plain ndarray views of the maps avoid the indexing overhead of
+            # np.memmap
+            arrays.append(
+                np.asarray(
+                    np.memmap(
+                        path,
+                        dtype=dtype,
+                        mode="r",
+                        offset=offset,
+                        shape=shape,
+                        order="F" if fortran_order else "C",
+                    )
+                )
+            )
+            f.seek(offset + arrays[-1].nbytes)
+    return arrays
+
+
+@_register_loader("wyckoff_database")
+def _load_wyckoff_database():
+    return _load_packed_arrays("wyckoff_site_data.bin")
+
+
+@_register_loader("wyckoff_orbit_templates")
+def _load_wyckoff_orbit_templates():
+    offsets, matrices, translations, operations = _load_packed_arrays(
+        "wyckoff_orbit_templates.bin"
+    )
+    # translations are stored in units of 1/24
+    translations = translations / 24
+    translations.flags.writeable = False
+    return offsets, matrices, translations, operations
+
+
+@_register_loader("space_group_symmetry_operations")
+def _load_space_group_symmetry_operations():
+    offsets, rotations, translations = _load_packed_arrays(
+        "space_group_symmetry_operations.bin"
+    )
+    # translations are stored in units of 1/12
+    translations = translations / 12
+    translations.flags.writeable = False
+    return offsets, rotations, translations
+
+
+@_register_loader("symmetry_operation_quaternions")
+def _load_symmetry_operation_quaternions():
+    # quaternions and improper flags of the space group operations, then the
+    # offsets, quaternions and improper flags of the plane group operations
+    return _load_packed_arrays("symmetry_operation_quaternions.bin")
+
+
+@_register_loader("aflow_database")
+def _load_aflow_database():
+    # entries, then the offsets and rows of the lattice parameters, of the
+    # basis parameters and of the Wyckoff sites of each prototype
+    return _load_packed_arrays("aflow_catalog.bin")
+
+
+@_register_loader("plane_group_info")
+def _load_plane_group_info():
+    return _load_pickle("plane_group_info.pickle")
+
+
+@_register_loader("plane_group_lattice_mapping")
+def _load_plane_group_lattice_mapping():
+    return _load_json("plane_group_lattice_mapping.json")
+
+
+@_register_loader("space_group_hall_mapping")
+def _load_space_group_hall_mapping():
+    return _load_json("space_group_hall_mapping.json")
+
+
+@_register_loader("space_group_lattice_mapping")
+def _load_space_group_lattice_mapping():
+    return _load_json("space_group_lattice_mapping.json")
+
+
+@_register_loader("point_group_rotation_matrix")
+def _load_point_group_rotation_matrix():
+    return _load_pickle("point_group_rotation_matrix_dict.pickle")
+
 
+@_register_loader("point_group_quat")
+def _load_point_group_quat():
+    return _load_json("point_group_quat_dict.json")
+
+
+@_register_loader("point_group_name_mapping")
+def _load_point_group_name_mapping():
+    return _load_json("point_group_name_mapping.json")
+
+
+def _stack_matrix(rows):
+    """Assemble matrices from rows of scalar or array entries.
+
+    The entries are broadcast against each other, so scalar entries give a
+    single D1 by D2 matrix and entries of shape S give an array of shape
+    S + (D1, D2).
+
+    :param rows:
+        D1 rows of D2 entries
+    :type rows:
+        list
+    :return:
+        matrix or array of matrices
+    :rtype:
+        np.ndarray
+    """
+    entries = np.broadcast_arrays(
+        *[np.asarray(entry, dtype=float) for row in rows for entry in row]
+    )
+    matrix = np.stack(entries, axis=-1)
+    return matrix.reshape(entries[0].shape + (len(rows), len(rows[0])))
+
+
+@profiling._instrument("data.wrap")
 def wrap(basis_vectors):
     """Wrap fractional coordinates within a unitcell based on periodic boundary.
 
@@ -104,6 +310,7 @@ def get_volume(lattice_vectors):
     return abs(np.cross(a1, a2).dot(a3))
 
 
+@profiling._instrument("data.fractional_to_cartesian")
 def fractional_to_cartesian(basis_vectors, lattice_vectors):
     """Convert fractional coordinates to cartesian coordinates.
 
@@ -123,6 +330,7 @@ def fractional_to_cartesian(basis_vectors, lattice_vectors):
     return basis_vectors.dot(lattice_vectors)
 
 
+@profiling._instrument("data.translate_to_vector")
 def translate_to_vector(
     a=1, b=1, c=1, alpha=np.pi / 2, beta=np.pi / 2, gamma=np.pi / 2
 ):
@@ -157,19 +365,20 @@ def translate_to_vector(
     ca = np.cos(alpha)
     cb = np.cos(beta)
     cy = (ca - cb * cg) / sg
-    if (1 - ca * ca - cb * cb - cg * cg + 2 * ca * cb * cg) < 0:
+    if np.any((1 - ca * ca - cb * cb - cg * cg + 2 * ca * cb * cg) < 0):
         raise ValueError(
             "Error: the box length and angle parameters provided are not "
             "feasible. Please not the unit used for angle paramters should be "
             "in unit of rad"
         )
     cz = np.sqrt(1 - ca * ca - cb * cb - cg * cg + 2 * ca * cb * cg) / sg
-    lattice_vectors = np.array(
+    lattice_vectors = _stack_matrix(
         [[a, 0, 0], [b * cg, b * sg, 0], [c * cb, c * cy, c * cz]]
     )
     return lattice_vectors
 
 
+@profiling._instrument("data.translate_to_vector_2D")
 def translate_to_vector_2D(a=1, b=1, theta=np.pi / 2):
     """Convert box parameters a, b, theta to lattice vectors [a1, a2].
 
@@ -187,7 +396,9 @@ def translate_to_vector_2D(a=1, b=1, theta=np.pi / 2):
     :rtype:
         np.ndarray
     """
-    lattice_vectors = np.array([[a, 0], [b * np.cos(theta), b * np.sin(theta)]])
+    lattice_vectors = _stack_matrix(
+        [[a, 0], [b * np.cos(theta), b * np.sin(theta)]]
+    )
     return lattice_vectors
 
 
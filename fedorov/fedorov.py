@@ -4,17 +4,20 @@
 
 # Maintainer: Pengji Zhou
 
-import copy
-import json
-import os
-import re
+import functools
+from collections.abc import Sequence
 
 import numpy as np
-import pandas as pd
 
-from . import data, space_group
-
-_WYCKOFF_FILE = "space_group_{}_Wyckoff_site_data.json"
+from . import (
+    catalog,
+    data,
+    neighbors,
+    profiling,
+    space_group,
+    supercell,
+    wyckoff,
+)
 
 
 class Prototype:
@@ -38,6 +41,7 @@ class Prototype:
         str
     """
 
+    @profiling._instrument("prototype.init")
     def __init__(
         self,
         space_group_number=1,
@@ -73,17 +77,14 @@ class Prototype:
         wyckoff_site_list = list(wyckoff_site.lower())
         type_by_site = list(type_by_site.upper())
 
-        wyckoff_data_dir = os.path.join(
-            data._DATA_PATH, _WYCKOFF_FILE.format(space_group_number)
+        full_wyckoff_positions = wyckoff.get_wyckoff_positions(
+            space_group_number
         )
-        with open(wyckoff_data_dir, "r") as f:
-            full_wyckoff_positions = json.load(f)
 
         basis_params_list = []
         order = 1
         for site in wyckoff_site_list:
-            pos = copy.deepcopy(full_wyckoff_positions[site])
-            pos = "".join(pos)
+            pos = "".join(full_wyckoff_positions[site])
             for letter in ("x", "y", "z"):
                 if letter in pos:
                     basis_params_list.append(letter + str(order))
@@ -99,6 +100,72 @@ class Prototype:
         self.basis_params = dict(
             zip(basis_params_list, basis_params_value_list)
         )
+        (
+            self._basis_matrix,
+            self._basis_offset,
+            self._basis_site,
+        ) = self._compile_basis()
+
+    @profiling._instrument("prototype.compile_basis")
+    def _compile_basis(self):
+        """Compile the Wyckoff sites into one affine map of the basis params.
+
+        The map is assembled from the precomputed orbit templates of the
+        Wyckoff sites, so the fractional coordinates of all the particles in
+        the unit cell are ``(matrix.dot(values) + offset).reshape(-1, 3)``,
+        where ``values`` are the basis parameter values in the order of
+        ``self.basis_params``. The particles are ordered by the first symmetry
+        operation generating them, then by Wyckoff site.
+
+        :return:
+            3N by P matrix, offset vector of length 3N and the index of the
+            Wyckoff site of each particle, for N particles and P basis
+            parameters
+        :rtype:
+            tuple
+        """
+        columns = {param: i for i, param in enumerate(self.basis_params)}
+        matrices, offsets, sites, operations = [], [], [], []
+        for order, site in enumerate(self.wyckoff_site_list):
+            (
+                orbit_matrices,
+                orbit_translations,
+                orbit_operations,
+            ) = self.full_wyckoff_positions.get_orbit(site)
+            site_matrix, _ = self.full_wyckoff_positions.get_affine(site)
+            free = site_matrix.any(axis=0)
+            # AFLOW may name the single free parameter of a site after another
+            # coordinate, e.g. y2 for the Wyckoff position (x, -x, 0)
+            site_params = [p for p in columns if p[1:] == str(order + 1)]
+            # select the free parameters x, y, z of the site from the values
+            select = np.zeros((3, len(columns)))
+            for i, letter in enumerate(("x", "y", "z")):
+                if not free[i]:
+                    continue
+                param = letter + str(order + 1)
+                if (
+                    param not in columns
+                    and free.sum() == 1
+                    and len(site_params) == 1
+                ):
+                    param = site_params[0]
+                if param not in columns:
+                    raise ValueError(
+                        f"basis parameter {param} of Wyckoff site {site} is "
+                        "not defined"
+                    )
+                select[i, columns[param]] = 1
+            matrices.append(orbit_matrices.dot(select))
+            offsets.append(orbit_translations)
+            sites.append(np.full(len(orbit_operations), order))
+            operations.append(orbit_operations)
+
+        sites = np.concatenate(sites)
+        order = np.lexsort((sites, np.concatenate(operations)))
+        matrix = np.concatenate(matrices)[order]
+        matrix = matrix.reshape(3 * len(order), len(columns))
+        offset = np.concatenate(offsets)[order].reshape(-1)
+        return matrix, offset, sites[order]
 
     def print_info(self):
         print(
@@ -109,7 +176,7 @@ class Prototype:
         )
 
     def update_basis_params(self, user_basis_params):
-        params = copy.deepcopy(self.basis_params)
+        params = dict(self.basis_params)
         for param, value in user_basis_params.items():
             if param in params:
                 if value is not None:
@@ -127,6 +194,7 @@ class Prototype:
                 )
         return params
 
+    @profiling._instrument("prototype.get_basis_vectors")
     def get_basis_vectors(self, **user_basis_params):
         """Initialize fractional coordinates of the particles in the unitcell.
 
@@ -141,37 +209,15 @@ class Prototype:
             np.ndarray
         """
         basis_params = self.update_basis_params(user_basis_params)
-        base_positions = np.zeros((0, 3))
-
-        order = 1
-        for site in self.wyckoff_site_list:
-            pos = copy.deepcopy(self.full_wyckoff_positions[site])
-            for letter in ("x", "y", "z"):
-                if letter + str(order) in basis_params.keys():
-                    exec(
-                        "{} = {}".format(
-                            letter, basis_params[letter + str(order)]
-                        )
-                    )
-            for i in range(0, 3):
-                # add * back for eval
-                target = re.findall(r"(\d[xyz])", pos[i])
-                for item in target:
-                    pos[i] = pos[i].replace(
-                        item, "*".join(re.findall(r"(\d)([xyz])", item)[0])
-                    )
-                pos[i] = eval(pos[i])
-            base_positions = np.append(
-                base_positions, np.array(pos).reshape(1, -1), axis=0
-            )
-            order += 1
-
-        return self.space_group.get_basis_vectors(
-            data.wrap(base_positions), base_type=self.type_by_site
-        )
+        values = np.array(list(basis_params.values()), dtype=float)
+        with profiling._phase("wyckoff.evaluate"):
+            basis_vectors = self._basis_matrix.dot(values) + self._basis_offset
+            basis_vectors -= np.floor(basis_vectors)
+        type_list = [self.type_by_site[i] for i in self._basis_site]
+        return data.wrap(basis_vectors.reshape(-1, 3)), type_list
 
     def update_lattice_params(self, user_lattice_params):
-        params = copy.deepcopy(self.lattice_params)
+        params = dict(self.lattice_params)
         for param, value in user_lattice_params.items():
             if param in params:
                 if value is not None:
@@ -183,6 +229,7 @@ class Prototype:
                 )
         return params
 
+    @profiling._instrument("prototype.get_lattice_vectors")
     def get_lattice_vectors(self, **user_lattice_params):
         """Initialize the unitcell and return lattice vectors [a1, a2, a3]
 
@@ -199,6 +246,159 @@ class Prototype:
         lattice_params = self.update_lattice_params(user_lattice_params)
         return self.space_group.lattice.get_lattice_vectors(**lattice_params)
 
+    def get_supercell(
+        self, replicas, basis_params=None, lattice_params=None, dtype=float
+    ):
+        """Build a supercell of the prototype in Cartesian coordinates.
+
+        See :func:`fedorov.supercell.build_supercell`.
+
+        :param replicas:
+            number of unit cells along each lattice vector
+        :type replicas:
+            int or list
+        :param basis_params:
+            basis parameters as accepted by :meth:`get_basis_vectors`
+        :type basis_params:
+            dict
+        :param lattice_params:
+            lattice parameters as accepted by :meth:`get_lattice_vectors`
+        :type lattice_params:
+            dict
+        :param dtype:
+            floating point type of the positions
+        :type dtype:
+            np.dtype
+        :return:
+            the particles of the supercell
+        :rtype:
+            :class:`fedorov.supercell.Supercell`
+        """
+        basis_vectors, type_list = self.get_basis_vectors(
+            **(basis_params or {})
+        )
+        lattice_vectors = self.get_lattice_vectors(**(lattice_params or {}))
+        return supercell.build_supercell(
+            basis_vectors,
+            lattice_vectors,
+            replicas,
+            type_list=type_list,
+            dtype=dtype,
+        )
+
+    @profiling._instrument("prototype.get_vectors_batch")
+    def get_vectors_batch(self, basis_params=None, lattice_params=None):
+        """Evaluate the prototype for M sets of parameters at once.
+
+        Every parameter value can be a scalar or an array of length M, the
+        values are broadcast against each other.
+
+        :param basis_params:
+            basis parameters as accepted by :meth:`get_basis_vectors`
+        :type basis_params:
+            dict
+        :param lattice_params:
+            lattice parameters as accepted by :meth:`get_lattice_vectors`
+        :type lattice_params:
+            dict
+        :return:
+            M by N by 3 basis vectors, the type list shared by all M
+            structures and M by 3 by 3 lattice vectors
+        :rtype:
+            tuple
+        """
+        basis_params = self.update_basis_params(basis_params or {})
+        lattice_params = self.update_lattice_params(lattice_params or {})
+        values = np.broadcast_arrays(
+            *[
+                np.asarray(value, dtype=float).reshape(-1)
+                for value in (*basis_params.values(), *lattice_params.values())
+            ]
+        )
+        n_points, n_basis = len(values[0]), len(basis_params)
+        basis_values = np.array(values[:n_basis], dtype=float)
+        basis_values = basis_values.reshape(n_basis, n_points).T
+        lattice_params = dict(zip(lattice_params, values[n_basis:]))
+
+        with profiling._phase("wyckoff.evaluate"):
+            basis_vectors = basis_values.dot(self._basis_matrix.T)
+            basis_vectors += self._basis_offset
+            basis_vectors -= np.floor(basis_vectors)
+        basis_vectors = data.wrap(basis_vectors.reshape(n_points, -1, 3))
+        type_list = [self.type_by_site[i] for i in self._basis_site]
+        lattice_vectors = self.space_group.lattice.get_lattice_vectors(
+            **lattice_params
+        )
+        return basis_vectors, type_list, lattice_vectors
+
+    @profiling._instrument("prototype.get_min_distances")
+    def get_min_distances(
+        self, basis_params=None, lattice_params=None, radii=None
+    ):
+        """Get the minimum distance between particles for M sets of parameters.
+
+        The parameters are evaluated as in :meth:`get_vectors_batch`, and the
+        minimum distance over all pairs of particles and their periodic
+        images is computed for all M structures at once by
+        :func:`fedorov.neighbors.get_min_distances`. With radii, the minimum
+        surface distance is returned instead, which is negative if particles
+        overlap.
+
+        :param basis_params:
+            basis parameters as accepted by :meth:`get_vectors_batch`
+        :type basis_params:
+            dict
+        :param lattice_params:
+            lattice parameters as accepted by :meth:`get_vectors_batch`
+        :type lattice_params:
+            dict
+        :param radii:
+            radius of the particles of each type name, or of all particles
+        :type radii:
+            dict or float
+        :return:
+            the M minimum distances
+        :rtype:
+            np.ndarray
+        """
+        basis_vectors, type_list, lattice_vectors = self.get_vectors_batch(
+            basis_params, lattice_params
+        )
+        if isinstance(radii, dict):
+            radii = [radii[name] for name in type_list]
+        return neighbors.get_min_distances(
+            basis_vectors, lattice_vectors, radii
+        )
+
+    def get_feasible(self, basis_params=None, lattice_params=None, radii=None):
+        """Check which of M sets of parameters give no overlapping particles.
+
+        See :meth:`get_min_distances`.
+
+        :param basis_params:
+            basis parameters as accepted by :meth:`get_vectors_batch`
+        :type basis_params:
+            dict
+        :param lattice_params:
+            lattice parameters as accepted by :meth:`get_vectors_batch`
+        :type lattice_params:
+            dict
+        :param radii:
+            radius of the particles of each type name, or of all particles,
+            required
+        :type radii:
+            dict or float
+        :return:
+            M booleans, True where no particles overlap
+        :rtype:
+            np.ndarray
+        """
+        if radii is None:
+            raise ValueError(
+                "radii must be given, particles of zero radius never overlap"
+            )
+        return self.get_min_distances(basis_params, lattice_params, radii) >= 0
+
 
 class AflowPrototype(Prototype):
     """Aflow prototype class.
@@ -217,66 +417,64 @@ class AflowPrototype(Prototype):
         bool
     """
 
-    _Aflow_database = pd.read_csv(
-        os.path.join(data._DATA_PATH, "Aflow_processed_data.csv"), index_col=0
-    )
-    _name_regex = re.compile(r"'(.*?)'")
+    _Aflow_database = data._LazyData("aflow_database")
 
+    @profiling._instrument("aflow_prototype.init")
     def __init__(self, prototype_index=0, set_type=False):
         if prototype_index < 0 or prototype_index >= 590:
             raise ValueError(
                 "prototype_index must be an integer between 0 and 590."
             )
-        entry = self._Aflow_database.iloc[prototype_index]
-
-        def get_values(value_str: str):
-            try:
-                return [float(i) for i in value_str.strip("[]").split(",")]
-            except Exception:
-                return []
-
-        lattice_params = self._name_regex.findall(entry["lattice_params"])
-        lattice_params_value = get_values(entry["lattice_params_value"])
-        lattice_params = dict(zip(lattice_params, lattice_params_value))
-
-        basis_params = self._name_regex.findall(entry["basis_params"])
-        basis_params_value = get_values(entry["basis_params_value"])
-        basis_params = dict(zip(basis_params, basis_params_value))
-
-        # convert Aflow angle unit from degree to rad
-        for key in {"alpha", "beta", "gamma"} & lattice_params.keys():
-            lattice_params[key] = lattice_params[key] / 180 * np.pi
-
-        space_group_number = entry["space_group"]
-        # process proper unitcell params
-        if space_group_number in {146, 148, 155, 160, 161, 166, 167}:
-            a = lattice_params.pop("a")
-            c = lattice_params.pop("c/a") * a
-            lattice_params["a"] = np.sqrt(a**2 / 3 + c**2 / 9)
-            lattice_params["alpha"] = np.arccos(
-                (2 * c**2 - 3 * a**2) / (2 * (c**2 + 3 * a**2))
-            )
+        (
+            entries,
+            lattice_offsets,
+            lattice_rows,
+            basis_offsets,
+            basis_rows,
+            site_offsets,
+            site_rows,
+        ) = self._Aflow_database
+        entry = entries[prototype_index]
+        lattice_rows = lattice_rows[
+            lattice_offsets[prototype_index] : lattice_offsets[
+                prototype_index + 1
+            ]
+        ]
+        basis_rows = basis_rows[
+            basis_offsets[prototype_index] : basis_offsets[prototype_index + 1]
+        ]
+        site_rows = site_rows[
+            site_offsets[prototype_index] : site_offsets[prototype_index + 1]
+        ]
+
+        space_group_number = int(entry["space_group"])
+        wyckoff_sites = site_rows["letter"].tolist()
+        if set_type:
+            types = site_rows["type"].tolist()
         else:
-            a = lattice_params["a"]
-            if "b/a" in lattice_params:
-                lattice_params["b"] = lattice_params.pop("b/a") * a
-            if "c/a" in lattice_params:
-                lattice_params["c"] = lattice_params.pop("c/a") * a
-
-        wyckoff_sites, wyckoff_positions, types = self._get_wyckoff_sites(
-            entry, space_group_number, set_type
-        )
+            types = ["A"] * len(wyckoff_sites)
 
-        self.id = entry["id"]
-        self.pearson_symbol = entry["pearson_symbol"]
-        self.prototype = entry["prototype"]
+        self.id = str(entry["id"])
+        self.pearson_symbol = str(entry["pearson_symbol"])
+        self.prototype = str(entry["prototype"])
         self.space_group_number = space_group_number
         self.space_group = space_group.SpaceGroup(space_group_number)
         self.wyckoff_site_list = wyckoff_sites
-        self.full_wyckoff_positions = wyckoff_positions
+        self.full_wyckoff_positions = wyckoff.get_wyckoff_positions(
+            space_group_number
+        )
         self.type_by_site = types
-        self.lattice_params = lattice_params
-        self.basis_params = basis_params
+        self.lattice_params = dict(
+            zip(lattice_rows["name"].tolist(), lattice_rows["value"].tolist())
+        )
+        self.basis_params = dict(
+            zip(basis_rows["name"].tolist(), basis_rows["value"].tolist())
+        )
+        (
+            self._basis_matrix,
+            self._basis_offset,
+            self._basis_site,
+        ) = self._compile_basis()
 
     def print_info(self):
         print(
@@ -287,32 +485,6 @@ class AflowPrototype(Prototype):
             f"available basis parameters: {self.basis_params}"
         )
 
-    def _get_wyckoff_sites(self, entry, space_group_number, set_type):
-        wyckoff_sites_by_type = self._name_regex.findall(entry["wyckoff_sites"])
-        wyckoff_sites = sorted("".join(wyckoff_sites_by_type))
-
-        wyckoff_data_path = os.path.join(
-            data._DATA_PATH, _WYCKOFF_FILE.format(space_group_number)
-        )
-
-        with open(wyckoff_data_path, "r") as f:
-            wyckoff_positions = json.load(f)
-
-        # get type label
-        if not set_type:
-            return wyckoff_sites, wyckoff_positions, ["A"] * len(wyckoff_sites)
-
-        type_by_site = list("A" * len(wyckoff_sites))
-        sorted_site_string = "".join(wyckoff_sites)
-        base = ord("A")
-        for wyckoffs in wyckoff_sites_by_type:
-            for site in wyckoffs:
-                order = sorted_site_string.find(site)
-                sorted_site_string = sorted_site_string.replace(site, "0", 1)
-                type_by_site[order] = chr(base)
-            base += 1
-        return wyckoff_sites, wyckoff_positions, type_by_site
-
     @classmethod
     def from_query(
         cls,
@@ -320,9 +492,14 @@ class AflowPrototype(Prototype):
         space_group: "int | None" = None,
         prototype: "str | None" = None,
         set_type: bool = False,
+        **criteria,
     ):
         """Create all `AflowPrototype` matching the given query.
 
+        The query is answered by the indexes of
+        :func:`fedorov.catalog.get_aflow_catalog`, see
+        :meth:`fedorov.catalog.AflowCatalog.query` for all the criteria.
+
         Args:
             pearson_symbol (`str`, optional): The Pearson symbol to search for,
                 defaults to ``None`` which accepts any Pearson symbol.
@@ -332,24 +509,113 @@ class AflowPrototype(Prototype):
                 defaults to ``None`` which accepts any prototype.
             set_type (`bool`, optional): Set different type name (in alphabetic
                 order starting with "A") for different atoms in AFLOW prototype.
+            **criteria: Criteria on the other catalog columns, e.g.
+                ``lattice_system="cubic"`` or ``n_atoms=range(1, 9)``.
 
         Returns:
-            lattices (list[`AflowPrototype`]): The list of all
-                `AflowPrototype`'s with a given Pearson symbol.
+            lattices (`AflowPrototypeSequence`): The lazy sequence of all
+                `AflowPrototype`'s matching the query, each one is created
+                when it is first accessed.
         """
+        indices = catalog.get_aflow_catalog().query(
+            pearson_symbol=pearson_symbol,
+            space_group=space_group,
+            prototype=prototype,
+            **criteria,
+        )
+        return AflowPrototypeSequence(indices, cls, set_type)
 
-        def query(row):
-            return (
-                (prototype is None or row.prototype == prototype)
-                and (
-                    pearson_symbol is None
-                    or row.pearson_symbol == pearson_symbol
-                )
-                and (space_group is None or row.space_group == space_group)
-            )
 
-        return [
-            cls(i, set_type)
-            for i, row in cls._Aflow_database.iterrows()
-            if query(row)
-        ]
+class AflowPrototypeSequence(Sequence):
+    """Lazy sequence of AFLOW prototypes.
+
+    The prototypes are created only when they are accessed, and the last
+    ``maxsize`` created prototypes are memoized, so that accessing them again
+    is free. Slices and filtered sequences are views sharing the same memo.
+
+    :param indices:
+        indices of the prototypes in the AFLOW catalog
+    :type indices:
+        np.ndarray
+    :param prototype_class:
+        class of the prototypes, :class:`AflowPrototype` or a subclass
+    :type prototype_class:
+        type
+    :param set_type:
+        set different type names for different atoms, see
+        :class:`AflowPrototype`
+    :type set_type:
+        bool
+    :param maxsize:
+        maximum number of memoized prototypes
+    :type maxsize:
+        int
+    """
+
+    def __init__(
+        self, indices, prototype_class=None, set_type=False, maxsize=128
+    ):
+        self.indices = np.array(indices, dtype=np.intp)
+        self.indices.flags.writeable = False
+        self._prototype_class = prototype_class or AflowPrototype
+        self._set_type = set_type
+        self._get = functools.lru_cache(maxsize)(
+            functools.partial(self._prototype_class, set_type=set_type)
+        )
+
+    def _view(self, indices):
+        view = object.__new__(type(self))
+        view.indices = indices
+        view._prototype_class = self._prototype_class
+        view._set_type = self._set_type
+        view._get = self._get
+        return view
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._view(self.indices[key])
+        return self._get(int(self.indices[key]))
+
+    def __iter__(self):
+        for index in self.indices.tolist():
+            yield self._get(index)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}({self.indices.tolist()}, "
+            f"{self._prototype_class.__name__}, set_type={self._set_type})"
+        )
+
+    def filter(self, predicate=None, **criteria):
+        """Select the prototypes matching a predicate and catalog criteria.
+
+        The catalog criteria are evaluated on the indexes of
+        :func:`fedorov.catalog.get_aflow_catalog` without creating any
+        prototype, see :meth:`fedorov.catalog.AflowCatalog.query`. The
+        predicate, if any, is then called on the remaining prototypes.
+
+        :param predicate:
+            function returning whether a prototype is selected
+        :type predicate:
+            callable
+        :param criteria:
+            criteria on the columns of the AFLOW catalog
+        :return:
+            the selected prototypes
+        :rtype:
+            :class:`AflowPrototypeSequence`
+        """
+        indices = self.indices
+        if criteria:
+            matches = catalog.get_aflow_catalog().query(**criteria)
+            indices = indices[np.isin(indices, matches)]
+        if predicate is not None:
+            indices = np.array(
+                [i for i in indices.tolist() if predicate(self._get(i))],
+                dtype=np.intp,
+            )
+            indices.flags.writeable = False
+        return self._view(indices)
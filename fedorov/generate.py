@@ -0,0 +1,249 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import collections
+import concurrent.futures
+import functools
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from . import fedorov
+
+Structures = collections.namedtuple(
+    "Structures", ["offsets", "basis_vectors", "typeid", "lattice_vectors"]
+)
+Structures.__doc__ = """Structures generated by :func:`generate_many`.
+
+The particles of structure i are the rows ``offsets[i]:offsets[i + 1]`` of
+``basis_vectors`` and ``typeid``.
+
+:param offsets:
+    M + 1 offsets of the particles of each of the M structures
+:param basis_vectors:
+    fractional coordinates of the particles of all structures
+:param typeid:
+    type id of the particles of all structures (0 for type A, 1 for type B,
+    ...)
+:param lattice_vectors:
+    M by 3 by 3 lattice vectors of the structures
+"""
+
+# version of the layout of the output directory
+_VERSION = 1
+_SPECS_FILE = "specs.json"
+
+
+def _normalize_spec(spec):
+    """Convert a structure spec into its canonical, JSON-serializable form."""
+    spec = dict(spec)
+    params = [
+        {
+            name: float(value)
+            for name, value in (spec.pop(kind, None) or {}).items()
+        }
+        for kind in ("basis_params", "lattice_params")
+    ]
+    if "prototype_index" in spec:
+        key = [
+            "aflow",
+            int(spec.pop("prototype_index")),
+            bool(spec.pop("set_type", False)),
+        ]
+    elif "space_group_number" in spec:
+        key = [
+            "prototype",
+            int(spec.pop("space_group_number")),
+            str(spec.pop("wyckoff_site", "")),
+            str(spec.pop("type_by_site", "")),
+        ]
+    else:
+        raise ValueError(
+            "a structure spec must contain either prototype_index or "
+            "space_group_number"
+        )
+    if spec:
+        raise ValueError(f"unknown structure spec keys {sorted(spec)}")
+    return [key, *params]
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_prototype(key):
+    if key[0] == "aflow":
+        return fedorov.AflowPrototype(key[1], set_type=key[2])
+    return fedorov.Prototype(*key[1:])
+
+
+def _open_outputs(directory, mode):
+    return [
+        np.load(os.path.join(directory, name + ".npy"), mmap_mode=mode)
+        for name in Structures._fields
+    ]
+
+
+def _generate_chunk(directory, start, specs):
+    """Write the structures of specs start, start + 1, ... into the outputs."""
+    offsets, basis_vectors, typeid, lattice_vectors = _open_outputs(
+        directory, "r+"
+    )
+    for i, (key, basis_params, lattice_params) in enumerate(specs, start):
+        structure = _get_prototype(tuple(key))
+        basis, type_list = structure.get_basis_vectors(**basis_params)
+        particles = slice(offsets[i], offsets[i + 1])
+        basis_vectors[particles] = basis
+        typeid[particles] = [ord(name) - ord("A") for name in type_list]
+        lattice_vectors[i] = structure.get_lattice_vectors(**lattice_params)
+    for array in (basis_vectors, typeid, lattice_vectors):
+        array.flush()
+    return start, len(specs)
+
+
+def _create_outputs(directory, specs):
+    """Create the output files of a sweep, sized by the prototypes."""
+    offsets = np.zeros(len(specs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(
+        [len(_get_prototype(tuple(key))._basis_site) for key, _, _ in specs]
+    )
+    n_particles = int(offsets[-1])
+    shapes = {
+        "basis_vectors": ((n_particles, 3), np.float64),
+        "typeid": ((n_particles,), np.int8),
+        "lattice_vectors": ((len(specs), 3, 3), np.float64),
+        "done": ((len(specs),), np.bool_),
+    }
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    for name, (shape, dtype) in shapes.items():
+        array = np.lib.format.open_memmap(
+            os.path.join(directory, name + ".npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=shape,
+        )
+        array.flush()
+        del array
+    # the specs file is written last, it marks the outputs as complete
+    with open(os.path.join(directory, _SPECS_FILE), "w") as f:
+        json.dump({"version": _VERSION, "specs": specs}, f)
+
+
+def _load_specs(directory):
+    try:
+        with open(os.path.join(directory, _SPECS_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def generate_many(
+    specs,
+    directory=None,
+    processes=None,
+    chunksize=64,
+    resume=True,
+    progress=None,
+):
+    """Generate many structures in parallel worker processes.
+
+    Each structure spec is a dictionary with either the ``prototype_index``
+    (and optionally ``set_type``) of an :class:`fedorov.AflowPrototype`, or
+    the ``space_group_number``, ``wyckoff_site`` and ``type_by_site`` of a
+    :class:`fedorov.Prototype`, and optionally the ``basis_params`` and
+    ``lattice_params`` dictionaries passed to ``get_basis_vectors`` and
+    ``get_lattice_vectors``.
+
+    The specs are sent to a pool of worker processes ``chunksize`` at a time.
+    The number of particles of every structure is known from its prototype,
+    so the workers write the structures straight into memory-mapped npy files
+    of ``directory`` at fixed offsets, instead of sending them back to the
+    calling process. The structures are thus stored in the order of the specs
+    whatever the order in which the chunks complete.
+
+    The completed specs are recorded in ``done.npy`` after each chunk. When
+    ``directory`` already holds the outputs of the same specs and ``resume`` is
+    True, only the specs that were not completed are generated, so that an
+    interrupted sweep can be continued.
+
+    :param specs:
+        structure specs
+    :type specs:
+        list
+    :param directory:
+        path of the output directory, by default a temporary directory whose
+        outputs are loaded in memory
+    :type directory:
+        str
+    :param processes:
+        number of worker processes, default the number of CPUs, 1 to generate
+        the structures in the calling process
+    :type processes:
+        int
+    :param chunksize:
+        number of specs sent to a worker process at once
+    :type chunksize:
+        int
+    :param resume:
+        continue the sweep stored in ``directory``, instead of starting over
+    :type resume:
+        bool
+    :param progress:
+        function called as ``progress(n_done, n_total)`` after each chunk
+    :type progress:
+        callable
+    :return:
+        the generated structures, memory-mapped from ``directory``
+    :rtype:
+        :class:`Structures`
+    """
+    if directory is None:
+        with tempfile.TemporaryDirectory() as directory:
+            structures = generate_many(
+                specs, directory, processes, chunksize, False, progress
+            )
+            return Structures(*[np.array(array) for array in structures])
+
+    specs = [_normalize_spec(spec) for spec in specs]
+    os.makedirs(directory, exist_ok=True)
+    stored = _load_specs(directory)
+    if not resume or stored != {"version": _VERSION, "specs": specs}:
+        if stored is not None and resume:
+            raise ValueError(
+                f"{directory} holds the outputs of other specs, pass "
+                "resume=False to overwrite them"
+            )
+        try:
+            os.remove(os.path.join(directory, _SPECS_FILE))
+        except FileNotFoundError:
+            pass
+        _create_outputs(directory, specs)
+
+    done = np.load(os.path.join(directory, "done.npy"), mmap_mode="r+")
+    chunks = [
+        (start, specs[start : start + chunksize])
+        for start in range(0, len(specs), chunksize)
+        if not done[start : start + chunksize].all()
+    ]
+    n_done = int(done.sum())
+
+    def _complete(start, count):
+        nonlocal n_done
+        n_done += count - int(done[start : start + count].sum())
+        done[start : start + count] = True
+        done.flush()
+        if progress is not None:
+            progress(n_done, len(specs))
+
+    if processes == 1:
+        for start, chunk in chunks:
+            _complete(*_generate_chunk(directory, start, chunk))
+    elif chunks:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            futures = [
+                executor.submit(_generate_chunk, directory, start, chunk)
+                for start, chunk in chunks
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                _complete(*future.result())
+    return Structures(*_open_outputs(directory, "r"))
@@ -0,0 +1,381 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import contextlib
+import itertools
+import shutil
+import tempfile
+
+import numpy as np
+
+from . import data, fedorov, supercell
+
+
+def _get_supercell(structure, replicas):
+    """Get the supercell of a prototype, or check a given supercell."""
+    if isinstance(structure, fedorov.Prototype):
+        return structure.get_supercell(replicas)
+    if not isinstance(structure, supercell.Supercell):
+        raise TypeError("structure must be a Supercell or a Prototype")
+    if np.any(np.asarray(replicas) != 1):
+        raise ValueError("replicas can only be used with a Prototype")
+    return structure
+
+
+def _get_chunks(structure, replicas, chunk_size):
+    """Split a structure into supercell chunks.
+
+    A prototype is replicated chunk by chunk with
+    :func:`fedorov.supercell.iter_supercell`, so that arbitrarily large
+    supercells can be written with bounded memory.
+
+    :return:
+        the number of particles of each type, the type names, the supercell
+        lattice vectors and a function returning a new iterator over the chunks
+    :rtype:
+        tuple
+    """
+    if isinstance(structure, fedorov.Prototype):
+        basis_vectors, type_list = structure.get_basis_vectors()
+        lattice_vectors = structure.get_lattice_vectors()
+        replicas = supercell._get_replicas(replicas, len(lattice_vectors))
+        typeid, types = supercell._get_typeid(type_list, len(type_list))
+        counts = np.bincount(typeid, minlength=len(types))
+        counts *= int(np.prod(replicas))
+
+        def chunks():
+            return supercell.iter_supercell(
+                basis_vectors,
+                lattice_vectors,
+                replicas,
+                type_list=type_list,
+                chunk_size=chunk_size,
+            )
+
+        return counts, types, replicas[:, np.newaxis] * lattice_vectors, chunks
+
+    structure = _get_supercell(structure, replicas)
+    counts = np.bincount(structure.typeid, minlength=len(structure.types))
+
+    def chunks():
+        for start in range(0, len(structure.positions), chunk_size):
+            yield supercell.Supercell(
+                *(
+                    (
+                        value[start : start + chunk_size]
+                        if isinstance(value, np.ndarray)
+                        and name != "lattice_vectors"
+                        else value
+                    )
+                    for name, value in zip(structure._fields, structure)
+                )
+            )
+
+    return counts, structure.types, structure.lattice_vectors, chunks
+
+
+def _write_rows(f, fmt, columns):
+    """Format all the rows of the given columns at once and write them.
+
+    The row format is repeated for all rows and applied once to the values of
+    the columns, interleaved row by row, in a single formatting operation.
+
+    :param f:
+        open text file
+    :param fmt:
+        format string of one row, including the newline
+    :param columns:
+        arrays of the same length holding the values of each column
+    """
+    values = itertools.chain.from_iterable(
+        zip(*(np.asarray(column).tolist() for column in columns))
+    )
+    f.write((fmt * len(columns[0])) % tuple(values))
+
+
+def _format_values(values):
+    """Format floating point values exactly, separated by spaces."""
+    return " ".join(repr(float(value)) for value in values)
+
+
+def _to_box_frame(structure):
+    """Express a supercell in the frame of its box.
+
+    HOOMD-blue and LAMMPS boxes have their first lattice vector along x and
+    their second lattice vector in the xy plane. The positions (and
+    orientations) of a supercell whose lattice vectors are not in that form
+    are rotated into it.
+
+    :return:
+        box parameters Lx, Ly, Lz, xy, xz, yz, the box lattice vectors, the
+        positions and the orientations
+    :rtype:
+        tuple
+    """
+    lattice_vectors = structure.lattice_vectors
+    positions = structure.positions
+    orientations = structure.orientations
+    dimensions = lattice_vectors.shape[0]
+    if dimensions == 2:
+        lattice_vectors = np.identity(3)
+        lattice_vectors[:2, :2] = structure.lattice_vectors
+    box = data.convert_to_box(lattice_vectors)
+    box_vectors = data.convert_to_vectors(*box)
+    if not np.allclose(lattice_vectors, box_vectors):
+        rotation = np.linalg.solve(lattice_vectors, box_vectors)
+        positions = positions.dot(rotation[:dimensions, :dimensions])
+        if orientations is not None:
+            import rowan
+
+            orientations = rowan.multiply(
+                rowan.from_matrix(rotation.T), orientations
+            )
+    if dimensions == 2:
+        box = (box[0], box[1], 0, box[3], 0, 0)
+        box_vectors = box_vectors[:2, :2]
+    return box, box_vectors, positions, orientations
+
+
+def write_gsd(filename, structure, replicas=1, mode="w"):
+    """Write a structure as a frame of a GSD file for HOOMD-blue.
+
+    The box is obtained with :func:`fedorov.data.convert_to_box` and the
+    particles are shifted into the box centered at the origin. Positions,
+    type ids, type names and orientations are written from contiguous arrays
+    in one bulk write. Requires the ``gsd`` package.
+
+    :param filename:
+        path of the GSD file
+    :type filename:
+        str
+    :param structure:
+        a supercell, or a prototype whose default parameters are used
+    :type structure:
+        :class:`fedorov.supercell.Supercell` or :class:`Prototype`
+    :param replicas:
+        number of unit cells along each lattice vector when ``structure`` is
+        a prototype
+    :type replicas:
+        int or list
+    :param mode:
+        mode to open the GSD file with, "w" to create a new file or "a" to
+        append a frame to an existing file
+    :type mode:
+        str
+    """
+    import gsd.hoomd
+
+    structure = _get_supercell(structure, replicas)
+    box, box_vectors, positions, orientations = _to_box_frame(structure)
+    dimensions = box_vectors.shape[0]
+
+    frame = gsd.hoomd.Frame()
+    frame.configuration.box = box
+    frame.configuration.dimensions = dimensions
+    frame.particles.N = len(positions)
+    frame.particles.types = list(structure.types)
+    frame.particles.typeid = structure.typeid.astype(np.uint32, copy=False)
+    frame.particles.position = np.zeros((len(positions), 3), dtype=np.float32)
+    np.subtract(
+        positions,
+        0.5 * box_vectors.sum(axis=0),
+        out=frame.particles.position[:, :dimensions],
+    )
+    if orientations is not None:
+        frame.particles.orientation = np.ascontiguousarray(
+            orientations, dtype=np.float32
+        )
+    with gsd.hoomd.open(filename, mode) as f:
+        f.append(frame)
+
+
+def write_lammps_data(filename, structure, replicas=1, chunk_size=2**16):
+    """Write a structure to a LAMMPS data file with atom style atomic.
+
+    The box is obtained from :func:`fedorov.data.convert_to_box`, with the
+    tilt factors converted to the LAMMPS convention for triclinic boxes. The
+    LAMMPS atom types are numbered from 1 in the order of the type names,
+    which are listed in the header. Particles are formatted ``chunk_size`` at a
+    time, and a prototype is replicated chunk by chunk.
+
+    :param filename:
+        path of the data file
+    :type filename:
+        str
+    :param structure:
+        a supercell, or a prototype whose default parameters are used
+    :type structure:
+        :class:`fedorov.supercell.Supercell` or :class:`Prototype`
+    :param replicas:
+        number of unit cells along each lattice vector when ``structure`` is
+        a prototype
+    :type replicas:
+        int or list
+    :param chunk_size:
+        number of particles formatted at once
+    :type chunk_size:
+        int
+    """
+    counts, types, lattice_vectors, chunks = _get_chunks(
+        structure, replicas, chunk_size
+    )
+    box = _to_box_frame(
+        supercell.Supercell(
+            np.zeros((0, len(lattice_vectors))),
+            None,
+            types,
+            lattice_vectors,
+            None,
+        )
+    )[0]
+    Lx, Ly, Lz, xy, xz, yz = map(float, box)
+    type_labels = " ".join(f"{i + 1} {name}" for i, name in enumerate(types))
+    with open(filename, "w") as f:
+        f.write(
+            f"LAMMPS data file written by fedorov, types: {type_labels}\n\n"
+            f"{counts.sum()} atoms\n"
+            f"{len(types)} atom types\n\n"
+            f"0 {Lx!r} xlo xhi\n"
+            f"0 {Ly!r} ylo yhi\n"
+        )
+        if len(lattice_vectors) == 2:
+            f.write("-0.5 0.5 zlo zhi\n")
+        else:
+            f.write(f"0 {Lz!r} zlo zhi\n")
+        if xy != 0 or xz != 0 or yz != 0:
+            f.write(f"{xy * Ly!r} {xz * Lz!r} {yz * Lz!r} xy xz yz\n")
+        f.write("\nAtoms # atomic\n\n")
+        start = 1
+        for chunk in chunks():
+            positions = _to_box_frame(chunk)[2]
+            columns = [
+                np.arange(start, start + len(positions)),
+                chunk.typeid + 1,
+                *positions.T,
+            ]
+            if positions.shape[1] == 2:
+                columns.append(np.zeros(len(positions)))
+            _write_rows(f, "%d %d %.10g %.10g %.10g\n", columns)
+            start += len(positions)
+
+
+def write_xyz(filename, structure, replicas=1, chunk_size=2**16):
+    """Write a structure to an extended XYZ file.
+
+    The lattice vectors are written in the ``Lattice`` property of the comment
+    line, and the particle orientations, if any, in the ``orientation``
+    property. Particles are formatted ``chunk_size`` at a time, and a
+    prototype is replicated chunk by chunk.
+
+    :param filename:
+        path of the XYZ file
+    :type filename:
+        str
+    :param structure:
+        a supercell, or a prototype whose default parameters are used
+    :type structure:
+        :class:`fedorov.supercell.Supercell` or :class:`Prototype`
+    :param replicas:
+        number of unit cells along each lattice vector when ``structure`` is
+        a prototype
+    :type replicas:
+        int or list
+    :param chunk_size:
+        number of particles formatted at once
+    :type chunk_size:
+        int
+    """
+    counts, types, lattice_vectors, chunks = _get_chunks(
+        structure, replicas, chunk_size
+    )
+    dimensions = len(lattice_vectors)
+    lattice = np.zeros((3, 3))
+    lattice[:dimensions, :dimensions] = lattice_vectors
+    pbc = " ".join(["T"] * dimensions + ["F"] * (3 - dimensions))
+    properties = "species:S:1:pos:R:3"
+    has_orientations = (
+        isinstance(structure, supercell.Supercell)
+        and structure.orientations is not None
+    )
+    if has_orientations:
+        properties += ":orientation:R:4"
+    types = np.array(types, dtype=object)
+    with open(filename, "w") as f:
+        f.write(
+            f"{counts.sum()}\n"
+            f'Lattice="{_format_values(lattice.ravel())}" '
+            f'Properties={properties} pbc="{pbc}"\n'
+        )
+        fmt = "%s" + " %.10g" * (7 if has_orientations else 3) + "\n"
+        for chunk in chunks():
+            columns = [types[chunk.typeid], *chunk.positions.T]
+            if dimensions == 2:
+                columns.append(np.zeros(len(chunk.positions)))
+            if has_orientations:
+                columns.extend(chunk.orientations.T)
+            _write_rows(f, fmt, columns)
+
+
+def write_poscar(filename, structure, replicas=1, chunk_size=2**16):
+    """Write a 3D structure to a VASP POSCAR file in Cartesian coordinates.
+
+    The particles are grouped by type, in the order of the type names.
+    Particles are formatted ``chunk_size`` at a time, and a prototype is
+    replicated chunk by chunk, once. The rows of the first type are written
+    directly and those of the other types are spooled to temporary files,
+    which are appended in order at the end.
+
+    :param filename:
+        path of the POSCAR file
+    :type filename:
+        str
+    :param structure:
+        a supercell, or a prototype whose default parameters are used
+    :type structure:
+        :class:`fedorov.supercell.Supercell` or :class:`Prototype`
+    :param replicas:
+        number of unit cells along each lattice vector when ``structure`` is
+        a prototype
+    :type replicas:
+        int or list
+    :param chunk_size:
+        number of particles formatted at once
+    :type chunk_size:
+        int
+    """
+    counts, types, lattice_vectors, chunks = _get_chunks(
+        structure, replicas, chunk_size
+    )
+    if len(lattice_vectors) != 3:
+        raise ValueError("POSCAR files can only store 3D structures")
+    with open(filename, "w") as f, contextlib.ExitStack() as stack:
+        f.write(
+            "POSCAR file written by fedorov\n1.0\n"
+            + "".join(
+                _format_values(vector) + "\n" for vector in lattice_vectors
+            )
+            + " ".join(types)
+            + "\n"
+            + " ".join(str(count) for count in counts)
+            + "\nCartesian\n"
+        )
+        spools = [f] + [
+            stack.enter_context(tempfile.TemporaryFile("w+")) for _ in types[1:]
+        ]
+        for chunk in chunks():
+            order = np.argsort(chunk.typeid, kind="stable")
+            bounds = np.searchsorted(
+                chunk.typeid[order], np.arange(len(types) + 1)
+            )
+            for typeid, spool in enumerate(spools):
+                rows = order[bounds[typeid] : bounds[typeid + 1]]
+                if len(rows):
+                    _write_rows(
+                        spool,
+                        "%.10g %.10g %.10g\n",
+                        list(chunk.positions[rows].T),
+                    )
+        for spool in spools[1:]:
+            spool.seek(0)
+            shutil.copyfileobj(spool, f)
@@ -2,12 +2,11 @@
 # This file is part of the fedorov project, released under the BSD 3-Clause
 # License.
 
-import copy
 import warnings
 
 import numpy as np
 
-from . import data
+from . import data, profiling
 
 
 class Lattice:
@@ -26,7 +25,7 @@ class Oblique2D:
 
     @classmethod
     def update_lattice_params(cls, user_lattice_params):
-        params = copy.deepcopy(cls.lattice_params)
+        params = dict(cls.lattice_params)
         for param, value in user_lattice_params.items():
             if param in params:
                 if value is not None:
@@ -39,6 +38,7 @@ class Oblique2D:
         return params
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a 2D oblique unitcell and return lattice vectors [a1, a2].
 
@@ -65,6 +65,7 @@ class Rectangular2D(Oblique2D):
     lattice_params = {"a": 1, "b": 1}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a 2D rectangular unitcell and return lattice vectors.
 
@@ -78,7 +79,9 @@ class Rectangular2D(Oblique2D):
             np.ndarray
         """
         params = cls.update_lattice_params(user_lattice_params)
-        lattice_vectors = np.array([[params["a"], 0.0], [0.0, params["b"]]])
+        lattice_vectors = data._stack_matrix(
+            [[params["a"], 0.0], [0.0, params["b"]]]
+        )
         return lattice_vectors
 
 
@@ -91,6 +94,7 @@ class Hexagonal2D(Oblique2D):
     lattice_params = {"a": 1}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a 2D hexagonal unitcell and return lattice vectors.
 
@@ -104,7 +108,7 @@ class Hexagonal2D(Oblique2D):
             np.ndarray
         """
         params = cls.update_lattice_params(user_lattice_params)
-        lattice_vectors = np.array(
+        lattice_vectors = data._stack_matrix(
             [
                 [params["a"], 0.0],
                 [-0.5 * params["a"], params["a"] * np.sqrt(3) / 2],
@@ -122,6 +126,7 @@ class Square2D(Rectangular2D):
     lattice_params = {"a": 1}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a 2D square unitcell and return lattice vectors [a1, a2].
 
@@ -135,7 +140,9 @@ class Square2D(Rectangular2D):
             np.ndarray
         """
         params = cls.update_lattice_params(user_lattice_params)
-        lattice_vectors = np.array([[params["a"], 0.0], [0.0, params["a"]]])
+        lattice_vectors = data._stack_matrix(
+            [[params["a"], 0.0], [0.0, params["a"]]]
+        )
         return lattice_vectors
 
 
@@ -164,7 +171,7 @@ class Triclinic:
 
     @classmethod
     def update_lattice_params(cls, user_lattice_params):
-        params = copy.deepcopy(cls.lattice_params)
+        params = dict(cls.lattice_params)
         for param, value in user_lattice_params.items():
             if param in params:
                 if value is not None:
@@ -177,6 +184,7 @@ class Triclinic:
         return params
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a triclinic unitcell and return lattice vectors.
 
@@ -205,6 +213,7 @@ class Monoclinic(Triclinic):
     lattice_params = {"a": 1, "b": 1, "c": 1, "beta": np.pi / 2}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a monoclinic unitcell and return lattice vectors.
 
@@ -232,6 +241,7 @@ class Orthorhombic(Monoclinic):
     lattice_params = {"a": 1, "b": 1, "c": 1}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a orthorhombi unitcell and return lattice vectors.
 
@@ -246,7 +256,7 @@ class Orthorhombic(Monoclinic):
             np.ndarray
         """
         params = cls.update_lattice_params(user_lattice_params)
-        lattice_vectors = np.array(
+        lattice_vectors = data._stack_matrix(
             [
                 [params["a"], 0.0, 0.0],
                 [0.0, params["b"], 0.0],
@@ -263,6 +273,7 @@ class Tetragonal(Orthorhombic):
     lattice_params = {"a": 1, "c": 1}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a tetragona unitcell and return lattice vectors.
 
@@ -277,7 +288,7 @@ class Tetragonal(Orthorhombic):
             np.ndarray
         """
         params = cls.update_lattice_params(user_lattice_params)
-        lattice_vectors = np.array(
+        lattice_vectors = data._stack_matrix(
             [
                 [params["a"], 0.0, 0.0],
                 [0.0, params["a"], 0.0],
@@ -294,6 +305,7 @@ class Hexagonal(Triclinic):
     lattice_params = {"a": 1, "c": 1}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a hexagonal unitcell and return lattice vectors.
 
@@ -308,7 +320,7 @@ class Hexagonal(Triclinic):
             np.ndarray
         """
         params = cls.update_lattice_params(user_lattice_params)
-        lattice_vectors = np.array(
+        lattice_vectors = data._stack_matrix(
             [
                 [params["a"], 0.0, 0.0],
                 [-0.5 * params["a"], np.sqrt(3.0) / 2.0 * params["a"], 0.0],
@@ -325,6 +337,7 @@ class Rhombohedral(Triclinic):
     lattice_params = {"a": 1, "alpha": np.pi / 2}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a rhombohedral unitcell and return lattice vectors.
 
@@ -357,6 +370,7 @@ class Cubic(Tetragonal):
     lattice_params = {"a": 1}
 
     @classmethod
+    @profiling._instrument("lattice.get_lattice_vectors")
     def get_lattice_vectors(cls, **user_lattice_params):
         """Initialize a cubicc unitcell and return lattice vectors.
 
@@ -371,7 +385,7 @@ class Cubic(Tetragonal):
             np.ndarray
         """
         params = cls.update_lattice_params(user_lattice_params)
-        lattice_vectors = np.array(
+        lattice_vectors = data._stack_matrix(
             [
                 [params["a"], 0.0, 0.0],
                 [0.0, params["a"], 0.0],
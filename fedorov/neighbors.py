@@ -0,0 +1,311 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import collections
+import itertools
+
+import numpy as np
+
+from . import data
+
+NeighborList = collections.namedtuple(
+    "NeighborList", ["i", "j", "distances", "vectors"]
+)
+NeighborList.__doc__ = """Pairs of particles found by :func:`find_neighbors`.
+
+:param i:
+    index of the first particle of each pair
+:param j:
+    index of the second particle of each pair
+:param distances:
+    distance between the particles of each pair
+:param vectors:
+    bond vector from particle i to the periodic image of particle j of each
+    pair, in Cartesian coordinates
+"""
+
+
+def _get_bins(inverse, r_max, n_particles):
+    """Divide the unit cell into bins at least r_max wide along each axis.
+
+    :return:
+        the number of bins along each lattice vector, and the number of
+        neighboring bins to search on each side along each lattice vector
+    :rtype:
+        tuple
+    """
+    # largest fractional coordinate difference of two points within r_max
+    extent = r_max * np.linalg.norm(inverse, axis=0)
+    n_bins = np.maximum(1, np.floor(1 / extent)).astype(np.intp)
+    # keep the number of bins proportional to the number of particles
+    excess = np.prod(n_bins.astype(float)) / max(n_particles, 1)
+    if excess > 1:
+        n_bins = np.maximum(1, n_bins / excess ** (1 / len(n_bins)))
+        n_bins = n_bins.astype(np.intp)
+    reach = np.ceil(extent * n_bins - 1e-12).astype(np.intp)
+    return n_bins, reach
+
+
+def find_neighbors(
+    positions,
+    lattice_vectors,
+    r_max,
+    fractional=False,
+    full=False,
+    chunk_size=2**16,
+):
+    """Find all pairs of particles closer than r_max in a periodic cell.
+
+    The particles are sorted into a cell list of bins at least ``r_max`` wide
+    along each lattice vector, so that the neighbors of a particle are in the
+    neighboring bins, and the candidate pairs of ``chunk_size`` particles at a
+    time are generated from the bins at once. The cost and memory are thus
+    linear in the number of particles. The cell can be triclinic, and smaller
+    than ``r_max``: every periodic image of a particle closer than ``r_max``
+    is a neighbor, including the images of the particle itself.
+
+    The coordination numbers of the particles are for example
+    ``np.bincount(np.concatenate([pairs.i, pairs.j]), minlength=N)``.
+
+    :param positions:
+        N by D array of positions
+    :type positions:
+        np.ndarray
+    :param lattice_vectors:
+        D by D array of lattice vectors of the periodic cell, e.g. the unit
+        cell or the supercell
+    :type lattice_vectors:
+        np.ndarray
+    :param r_max:
+        cutoff distance
+    :type r_max:
+        float
+    :param fractional:
+        the positions are fractional coordinates, as returned by
+        ``get_basis_vectors``, instead of Cartesian coordinates
+    :type fractional:
+        bool
+    :param full:
+        list every pair in both directions, instead of once with i <= j
+    :type full:
+        bool
+    :param chunk_size:
+        number of particles whose pairs are generated at once
+    :type chunk_size:
+        int
+    :return:
+        the pairs sorted by i and j
+    :rtype:
+        :class:`NeighborList`
+    """
+    lattice_vectors = np.asarray(lattice_vectors, dtype=float)
+    dimensions = len(lattice_vectors)
+    positions = np.asarray(positions, dtype=float)
+    if lattice_vectors.shape not in ((2, 2), (3, 3)):
+        raise ValueError("lattice_vectors must be a 2 by 2 or 3 by 3 array")
+    if positions.ndim != 2 or positions.shape[1] != dimensions:
+        raise ValueError(
+            f"positions must be an N by {dimensions} array, as the lattice "
+            "vectors"
+        )
+    if not r_max > 0:
+        raise ValueError("r_max must be positive")
+
+    inverse = np.linalg.inv(lattice_vectors)
+    if not fractional:
+        positions = positions.dot(inverse)
+    positions = data.wrap(positions - np.floor(positions))
+    n_particles = len(positions)
+    n_bins, reach = _get_bins(inverse, r_max, n_particles)
+
+    bins = np.minimum((positions * n_bins).astype(np.intp), n_bins - 1)
+    bin_ids = np.ravel_multi_index(bins.T, n_bins)
+    order = np.argsort(bin_ids, kind="stable")
+    counts = np.bincount(bin_ids, minlength=int(np.prod(n_bins)))
+    starts = np.cumsum(counts) - counts
+    # the particles sorted by bin, so that the candidates of a particle in a
+    # bin are consecutive, with one contiguous array per Cartesian coordinate
+    bin_ids = bin_ids[order]
+    coordinates = np.ascontiguousarray(positions[order].dot(lattice_vectors).T)
+    all_bins = np.indices(n_bins).reshape(dimensions, -1).T
+    offsets = np.array(
+        list(itertools.product(*[range(-r, r + 1) for r in reach])),
+        dtype=np.intp,
+    )
+    if not full:
+        # each pair is found once, from the bin of its first particle
+        offsets = offsets[len(offsets) // 2 :]
+
+    pairs = []
+    for offset in offsets:
+        # the neighboring bin of every bin, and the lattice translation of
+        # its image
+        shifts, neighbor_bins = np.divmod(all_bins + offset, n_bins)
+        neighbor_bins = np.ravel_multi_index(neighbor_bins.T, n_bins)
+        shifts = shifts.dot(lattice_vectors)
+        for begin in range(0, n_particles, chunk_size):
+            query = np.arange(begin, min(begin + chunk_size, n_particles))
+            neighbor_ids = neighbor_bins[bin_ids[query]]
+            n_candidates = counts[neighbor_ids]
+            total = int(n_candidates.sum())
+            if not total:
+                continue
+            first = starts[neighbor_ids] - np.cumsum(n_candidates)
+            first += n_candidates
+            j = np.repeat(first, n_candidates) + np.arange(total)
+            origins = coordinates[:, query] - shifts[bin_ids[query]].T
+            vectors = [
+                coordinates[k, j] - np.repeat(origins[k], n_candidates)
+                for k in range(dimensions)
+            ]
+            squared = sum(vector * vector for vector in vectors)
+            keep = squared < r_max * r_max
+            i = np.repeat(query, n_candidates)
+            if not offset.any():
+                # a particle and its neighbors in the same bin are not shifted
+                keep &= (i != j) if full else (i < j)
+            i, j = order[i[keep]], order[j[keep]]
+            vectors = np.stack([vector[keep] for vector in vectors], axis=-1)
+            if not full:
+                swap = i > j
+                i[swap], j[swap] = j[swap], i[swap]
+                vectors[swap] *= -1
+            pairs.append((i, j, np.sqrt(squared[keep]), vectors))
+
+    if not pairs:
+        return NeighborList(
+            np.zeros(0, dtype=np.intp),
+            np.zeros(0, dtype=np.intp),
+            np.zeros(0),
+            np.zeros((0, dimensions)),
+        )
+    i, j, distances, vectors = [np.concatenate(x) for x in zip(*pairs)]
+    order = np.argsort(i * n_particles + j)
+    return NeighborList(i[order], j[order], distances[order], vectors[order])
+
+
+def get_min_distances(
+    basis_vectors, lattice_vectors, radii=None, chunk_size=2**20
+):
+    """Get the minimum distance between the particles of periodic structures.
+
+    The distance between every pair of particles, including a particle and
+    its own periodic images, is computed for the periodic images within a
+    bound given by the closest images in the unit cell, so that the minimum
+    is exact for any lattice. With radii, the minimum surface distance
+    ``distance - radii[i] - radii[j]`` is returned instead, which is negative
+    for overlapping particles.
+
+    :param basis_vectors:
+        M by N by D fractional coordinates of M structures, or N by D for one
+        structure
+    :type basis_vectors:
+        np.ndarray
+    :param lattice_vectors:
+        M by D by D lattice vectors, or D by D for all structures
+    :type lattice_vectors:
+        np.ndarray
+    :param radii:
+        N radii of the particles, default 0
+    :type radii:
+        np.ndarray
+    :param chunk_size:
+        maximum number of pair images computed at once, which bounds the
+        memory
+    :type chunk_size:
+        int
+    :return:
+        the minimum distance of each structure
+    :rtype:
+        np.ndarray
+    """
+    basis_vectors = np.asarray(basis_vectors, dtype=float)
+    single = basis_vectors.ndim == 2
+    if single:
+        basis_vectors = basis_vectors[np.newaxis]
+    n_structures, n_particles, dimensions = basis_vectors.shape
+    lattice_vectors = np.broadcast_to(
+        np.asarray(lattice_vectors, dtype=float),
+        (n_structures, dimensions, dimensions),
+    )
+    if radii is None:
+        radii = np.zeros(n_particles)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float), (n_particles,))
+
+    i, j = np.triu_indices(n_particles)
+    same = i == j
+    contact = radii[i] + radii[j]
+    n_pairs = len(i)
+    pair_step = max(1, min(n_pairs, chunk_size))
+
+    def _get_vectors(structures, pairs):
+        delta = basis_vectors[structures][:, j[pairs]]
+        delta -= basis_vectors[structures][:, i[pairs]]
+        delta -= np.rint(delta)
+        return np.einsum("mpd,mde->mpe", delta, lattice_vectors[structures])
+
+    # an upper bound of the minimum from the closest images in the unit cell,
+    # the images of a particle itself are one lattice vector away
+    bound = np.linalg.norm(lattice_vectors, axis=-1).min(axis=-1)
+    bound = bound - 2 * radii.max(initial=0)
+    step = max(1, chunk_size // pair_step)
+    for begin in range(0, n_structures, step):
+        structures = slice(begin, begin + step)
+        for pair_begin in range(0, n_pairs, pair_step):
+            pairs = slice(pair_begin, pair_begin + pair_step)
+            distances = np.linalg.norm(_get_vectors(structures, pairs), axis=-1)
+            distances -= contact[pairs]
+            distances[:, same[pairs]] = np.inf
+            np.minimum(
+                bound[structures],
+                distances.min(axis=-1),
+                out=bound[structures],
+            )
+    bound += contact.max()
+    # the images closer than the bound are at most that far in fractional
+    # coordinates along each lattice vector, the structures of the same reach
+    # are processed together
+    extent = bound[:, np.newaxis] * np.linalg.norm(
+        np.linalg.inv(lattice_vectors), axis=-2
+    )
+    reach = np.floor(extent + 0.5).astype(np.intp)
+    reaches, groups = np.unique(reach, axis=0, return_inverse=True)
+    groups = groups.reshape(-1)
+
+    result = np.full(n_structures, np.inf)
+    for group, group_reach in enumerate(reaches):
+        members = np.flatnonzero(groups == group)
+        widths = 2 * group_reach + 1
+        n_shifts = int(np.prod(widths))
+        # the shifts are generated block by block, so that a single structure
+        # with many images is also split
+        shift_step = max(1, min(n_shifts, chunk_size // pair_step))
+        step = max(1, chunk_size // (pair_step * shift_step))
+        for begin in range(0, len(members), step):
+            structures = members[begin : begin + step]
+            for pair_begin in range(0, n_pairs, pair_step):
+                pairs = slice(pair_begin, pair_begin + pair_step)
+                vectors = _get_vectors(structures, pairs)
+                for shift_begin in range(0, n_shifts, shift_step):
+                    shifts = np.arange(
+                        shift_begin, min(shift_begin + shift_step, n_shifts)
+                    )
+                    shifts = np.stack(np.unravel_index(shifts, widths), -1)
+                    shifts -= group_reach
+                    # a particle is not its own image without a shift
+                    excluded = same[pairs, np.newaxis] & ~shifts.any(axis=1)
+                    shifts = np.einsum(
+                        "sd,mde->mse",
+                        shifts.astype(float),
+                        lattice_vectors[structures],
+                    )
+                    images = vectors[:, :, np.newaxis] + shifts[:, np.newaxis]
+                    gaps = np.sqrt(np.einsum("mpse,mpse->mps", images, images))
+                    gaps -= contact[pairs, np.newaxis]
+                    gaps[:, excluded] = np.inf
+                    result[structures] = np.minimum(
+                        result[structures],
+                        gaps.reshape(len(gaps), -1).min(axis=-1),
+                    )
+    return result[0] if single else result
@@ -0,0 +1,395 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import collections
+import concurrent.futures
+
+import numpy as np
+
+from . import generate, lattice, neighbors
+
+PackingResult = collections.namedtuple(
+    "PackingResult",
+    ["packing_fraction", "basis_params", "lattice_params", "n_iterations"],
+)
+PackingResult.__doc__ = """Densest packing found by :func:`maximize_packing`.
+
+:param packing_fraction:
+    volume fraction of the spheres
+:param basis_params:
+    basis parameters of the packing
+:param lattice_params:
+    lattice parameters of the packing
+:param n_iterations:
+    number of outer iterations
+"""
+
+_LENGTHS = ("a", "b", "c")
+# the cell parameters a, b, c, alpha, beta, gamma of each lattice class, as
+# the name of a lattice parameter or a constant
+_RIGHT = np.pi / 2
+_CELL_PARAMS = {
+    lattice.Triclinic: ("a", "b", "c", "alpha", "beta", "gamma"),
+    lattice.Monoclinic: ("a", "b", "c", _RIGHT, "beta", _RIGHT),
+    lattice.Orthorhombic: ("a", "b", "c", _RIGHT, _RIGHT, _RIGHT),
+    lattice.Tetragonal: ("a", "a", "c", _RIGHT, _RIGHT, _RIGHT),
+    lattice.Hexagonal: ("a", "a", "c", _RIGHT, _RIGHT, 2 * np.pi / 3),
+    lattice.Rhombohedral: ("a", "a", "a", "alpha", "alpha", "alpha"),
+    lattice.Cubic: ("a", "a", "a", _RIGHT, _RIGHT, _RIGHT),
+}
+
+
+def _get_cell_derivatives(a, b, c, alpha, beta, gamma):
+    """Differentiate :func:`fedorov.data.translate_to_vector`.
+
+    :return:
+        6 by 3 by 3 array of the derivatives of the lattice vectors with
+        respect to a, b, c, alpha, beta and gamma
+    :rtype:
+        np.ndarray
+    """
+    ca, cb, cg = np.cos([alpha, beta, gamma])
+    sa, sb, sg = np.sin([alpha, beta, gamma])
+    cy = (ca - cb * cg) / sg
+    root = np.sqrt(1 - ca * ca - cb * cb - cg * cg + 2 * ca * cb * cg)
+    cz = root / sg
+    derivatives = np.zeros((6, 3, 3))
+    derivatives[0, 0] = [1, 0, 0]
+    derivatives[1, 1] = [cg, sg, 0]
+    derivatives[2, 2] = [cb, cy, cz]
+    derivatives[3, 2] = c * np.array(
+        [0, -sa / sg, sa * (ca - cb * cg) / (root * sg)]
+    )
+    derivatives[4, 2] = c * np.array(
+        [-sb, sb * cg / sg, sb * (cb - ca * cg) / (root * sg)]
+    )
+    derivatives[5, 1] = b * np.array([-sg, cg, 0])
+    derivatives[5, 2] = c * np.array(
+        [
+            0,
+            (cb - ca * cg) / sg**2,
+            (cg - ca * cb) / root - root * cg / sg**2,
+        ]
+    )
+    return derivatives
+
+
+class _PackingProblem:
+    """Volume and contact constraints of a prototype of spheres.
+
+    The variables are the values of the basis parameters, followed by the
+    values of the lattice parameters, of the prototype. The fractional
+    coordinates of the particles are the affine map of the basis parameters
+    compiled by the prototype, so that the gradients of the contact distances
+    with respect to the basis parameters are exact. The lattice vectors are
+    differentiated analytically with respect to the cell parameters of
+    :func:`fedorov.data.translate_to_vector`, which are lattice parameters or
+    constants for each lattice class.
+    """
+
+    def __init__(self, prototype, radii):
+        n_particles = len(prototype._basis_site)
+        self.matrix = prototype._basis_matrix.reshape(n_particles, 3, -1)
+        self.offset = prototype._basis_offset.reshape(n_particles, 3)
+        self.basis_names = list(prototype.basis_params)
+        self.lattice_names = list(prototype.lattice_params)
+        self.lattice = prototype.space_group.lattice
+        cell_params = _CELL_PARAMS[self.lattice]
+        # the cell parameters as a linear map of the lattice parameters
+        self.cell_matrix = np.array(
+            [
+                [float(param == name) for name in self.lattice_names]
+                for param in cell_params
+            ]
+        )
+        self.cell_offset = np.array(
+            [0.0 if isinstance(param, str) else param for param in cell_params]
+        )
+        type_list = [prototype.type_by_site[i] for i in prototype._basis_site]
+        if isinstance(radii, dict):
+            radii = [radii[name] for name in type_list]
+        self.radii = np.broadcast_to(
+            np.asarray(radii, dtype=float), (n_particles,)
+        )
+        if not self.radii.any():
+            raise ValueError("at least one radius must be positive")
+        self.sphere_volume = 4 / 3 * np.pi * np.sum(self.radii**3)
+        self.is_length = np.array(
+            [False] * len(self.basis_names)
+            + [name in _LENGTHS for name in self.lattice_names]
+        )
+        self.contacts = None
+        self._cache = (None, None)
+
+    def split(self, theta):
+        n_basis = len(self.basis_names)
+        return theta[:n_basis], theta[n_basis:]
+
+    def get_fractional(self, theta):
+        return self.matrix.dot(self.split(theta)[0]) + self.offset
+
+    def get_lattice(self, theta):
+        """Get the lattice vectors and their derivatives w.r.t. the params."""
+        if self._cache[0] is not None and np.array_equal(self._cache[0], theta):
+            return self._cache[1]
+        values = self.split(theta)[1]
+        lattice_vectors = self.lattice.get_lattice_vectors(
+            **dict(zip(self.lattice_names, values))
+        )
+        cell = self.cell_matrix.dot(values) + self.cell_offset
+        derivatives = np.einsum(
+            "kq,kij->qij", self.cell_matrix, _get_cell_derivatives(*cell)
+        )
+        result = (lattice_vectors, derivatives)
+        self._cache = (theta.copy(), result)
+        return result
+
+    def get_pairs(self, theta, factor):
+        """Find the pairs of particles closer than factor times contact.
+
+        :return:
+            the indices of the particles, the lattice shifts of the image of
+            the second particle with respect to the unwrapped fractional
+            coordinates, and the ratios of the distances to the contact
+            distances
+        :rtype:
+            tuple
+        """
+        fractional = self.get_fractional(theta)
+        lattice_vectors, _ = self.get_lattice(theta)
+        pairs = neighbors.find_neighbors(
+            fractional,
+            lattice_vectors,
+            factor * 2 * self.radii.max(),
+            fractional=True,
+        )
+        contact = self.radii[pairs.i] + self.radii[pairs.j]
+        ratios = np.full(len(contact), np.inf)
+        np.divide(pairs.distances, contact, out=ratios, where=contact > 0)
+        close = ratios < factor
+        i, j = pairs.i[close], pairs.j[close]
+        shifts = np.rint(
+            pairs.vectors[close].dot(np.linalg.inv(lattice_vectors))
+            - (fractional[j] - fractional[i])
+        )
+        return i, j, shifts, ratios[close]
+
+    def get_min_ratio(self, theta):
+        """Get the minimum ratio of the distances to the contact distances."""
+        factor = 2.0
+        while True:
+            ratios = self.get_pairs(theta, factor)[3]
+            if len(ratios):
+                return ratios.min()
+            factor *= 2
+
+    def objective(self, theta):
+        """Get the logarithm of the volume of the unit cell and its gradient."""
+        lattice_vectors, derivatives = self.get_lattice(theta)
+        inverse = np.linalg.inv(lattice_vectors)
+        gradient = np.zeros(len(theta))
+        gradient[len(self.basis_names) :] = np.einsum(
+            "ij,qji->q", inverse, derivatives
+        )
+        return np.log(abs(np.linalg.det(lattice_vectors))), gradient
+
+    def constraints(self, theta):
+        """Get the squared distances over the squared contact distances - 1."""
+        i, j, shifts = self.contacts
+        lattice_vectors, derivatives = self.get_lattice(theta)
+        fractional = self.get_fractional(theta)
+        delta = fractional[j] - fractional[i] + shifts
+        vectors = delta.dot(lattice_vectors)
+        contact = (self.radii[i] + self.radii[j]) ** 2
+        values = np.einsum("pk,pk->p", vectors, vectors) / contact - 1
+        # the derivatives w.r.t. the fractional coordinates and the lattice
+        d_delta = 2 * vectors.dot(lattice_vectors.T) / contact[:, np.newaxis]
+        jacobian = np.empty((len(i), len(theta)))
+        jacobian[:, : len(self.basis_names)] = np.einsum(
+            "pk,pkx->px", d_delta, self.matrix[j] - self.matrix[i]
+        )
+        jacobian[:, len(self.basis_names) :] = np.einsum(
+            "pk,qkl,pl->pq",
+            2 * delta / contact[:, np.newaxis],
+            derivatives,
+            vectors,
+        )
+        return values, jacobian
+
+    def scale(self, theta, factor):
+        """Scale the lattice lengths by factor."""
+        theta = theta.copy()
+        theta[self.is_length] *= factor
+        return theta
+
+
+def maximize_packing(
+    prototype,
+    radii,
+    basis_params=None,
+    lattice_params=None,
+    margin=0.2,
+    max_iterations=200,
+    tol=1e-9,
+):
+    """Maximize the packing fraction of spheres in a prototype.
+
+    The free basis and lattice parameters of the prototype are optimized to
+    minimize the volume of the unit cell while the spheres centered on the
+    particles do not overlap. The starting structure is first scaled until the
+    spheres touch. Each outer iteration then finds the pairs of particles
+    closer than ``1 + margin`` times their contact distance, and solves the
+    problem with these contact constraints and a trust region on the
+    parameters with SLSQP, using exact gradients of the contact distances.
+    The step is rejected and the trust region shrunk if it makes spheres
+    overlap that were not constrained, and the accepted structure is scaled
+    until the spheres exactly touch.
+
+    The optimization is local: the densest packing found depends on the
+    starting parameters. Requires ``scipy``.
+
+    :param prototype:
+        the prototype
+    :type prototype:
+        :class:`fedorov.Prototype`
+    :param radii:
+        radius of the particles of each type name, or of all particles
+    :type radii:
+        dict or float
+    :param basis_params:
+        starting basis parameters, by default those of the prototype
+    :type basis_params:
+        dict
+    :param lattice_params:
+        starting lattice parameters, by default those of the prototype
+    :type lattice_params:
+        dict
+    :param margin:
+        relative distance under which pairs of particles are constrained in
+        an outer iteration
+    :type margin:
+        float
+    :param max_iterations:
+        maximum number of outer iterations
+    :type max_iterations:
+        int
+    :param tol:
+        relative change of the volume under which the optimization stops
+    :type tol:
+        float
+    :return:
+        the densest packing found
+    :rtype:
+        :class:`PackingResult`
+    """
+    from scipy import optimize
+
+    problem = _PackingProblem(prototype, radii)
+    basis_params = prototype.update_basis_params(basis_params or {})
+    lattice_params = prototype.update_lattice_params(lattice_params or {})
+    theta = np.array(
+        [*basis_params.values(), *lattice_params.values()], dtype=float
+    )
+    theta = problem.scale(theta, 1 / problem.get_min_ratio(theta))
+    volume, _ = problem.objective(theta)
+
+    step = margin / 4
+    iteration = 0
+    while iteration < max_iterations and step > tol:
+        iteration += 1
+        problem.contacts = problem.get_pairs(theta, 1 + margin)[:3]
+        # trust region: relative on the lengths, absolute on the fractional
+        # coordinates and angles, both small enough for the contacts to stay
+        # within the margin
+        lattice_vectors, _ = problem.get_lattice(theta)
+        lengths = np.linalg.norm(lattice_vectors, axis=1)
+        width = np.where(
+            problem.is_length,
+            step * np.abs(theta),
+            step * 2 * problem.radii.max() / lengths.max(),
+        )
+        try:
+            result = optimize.minimize(
+                problem.objective,
+                theta,
+                jac=True,
+                method="SLSQP",
+                bounds=list(zip(theta - width, theta + width)),
+                constraints={
+                    "type": "ineq",
+                    "fun": lambda x: problem.constraints(x)[0],
+                    "jac": lambda x: problem.constraints(x)[1],
+                },
+                options={"maxiter": 100, "ftol": tol},
+            )
+            candidate = result.x
+            ratio = problem.get_min_ratio(candidate)
+        except (ValueError, np.linalg.LinAlgError):
+            # the step left the feasible lattice parameters
+            ratio = 0
+        if ratio < 1 - margin / 2:
+            step /= 2
+            continue
+        candidate = problem.scale(candidate, 1 / ratio)
+        candidate_volume, _ = problem.objective(candidate)
+        if candidate_volume > volume + tol:
+            step /= 2
+            continue
+        if candidate_volume > volume - tol:
+            break
+        theta, volume = candidate, candidate_volume
+
+    basis_values, lattice_values = problem.split(theta)
+    return PackingResult(
+        problem.sphere_volume / np.exp(volume),
+        dict(zip(problem.basis_names, basis_values.tolist())),
+        dict(zip(problem.lattice_names, lattice_values.tolist())),
+        iteration,
+    )
+
+
+def _maximize_spec(args):
+    spec, radii, options = args
+    key, basis_params, lattice_params = spec
+    return maximize_packing(
+        generate._get_prototype(tuple(key)),
+        radii,
+        basis_params,
+        lattice_params,
+        **options,
+    )
+
+
+def maximize_packing_many(specs, radii, processes=None, **options):
+    """Maximize the packing fraction of many prototypes in parallel.
+
+    Each structure spec is a prototype and its starting parameters as
+    accepted by :func:`fedorov.generate.generate_many`, and is optimized by
+    :func:`maximize_packing` in a pool of worker processes.
+
+    :param specs:
+        structure specs
+    :type specs:
+        list
+    :param radii:
+        radius of the particles of each type name, or of all particles
+    :type radii:
+        dict or float
+    :param processes:
+        number of worker processes, default the number of CPUs, 1 to optimize
+        the structures in the calling process
+    :type processes:
+        int
+    :param options:
+        options of :func:`maximize_packing`
+    :return:
+        the densest packing found for each spec, in order
+    :rtype:
+        list
+    """
+    tasks = [(generate._normalize_spec(spec), radii, options) for spec in specs]
+    if processes == 1:
+        return list(map(_maximize_spec, tasks))
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(_maximize_spec, tasks))
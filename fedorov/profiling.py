@@ -0,0 +1,287 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# number of active enable() calls, the phases only record when it is nonzero
+_enabled = 0
+_memory = 0
+_started_tracemalloc = False
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+_FIELDS = ("calls", "time", "self_time", "bytes")
+
+
+class _Phase:
+    """Context manager recording one call of a phase."""
+
+    __slots__ = ("name", "start", "children", "traced")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        try:
+            stack = _local.stack
+        except AttributeError:
+            stack = _local.stack = []
+        stack.append(self)
+        self.children = 0.0
+        self.traced = (
+            tracemalloc.get_traced_memory()[0]
+            if _memory and tracemalloc.is_tracing()
+            else None
+        )
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        allocated = 0
+        if self.traced is not None and tracemalloc.is_tracing():
+            allocated = tracemalloc.get_traced_memory()[0] - self.traced
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+        with _lock:
+            stats = _stats.get(self.name)
+            if stats is None:
+                stats = _stats[self.name] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += elapsed - self.children
+            stats[3] += allocated
+        return False
+
+
+class _NullPhase:
+    """Context manager of the phases when the instrumentation is disabled.
+
+    It does nothing, as ``contextlib.nullcontext``, which requires Python 3.7.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def _phase(name):
+    """Get a context manager recording a call of phase ``name``."""
+    if not _enabled:
+        return _NULL_PHASE
+    return _Phase(name)
+
+
+def _instrument(name):
+    """Record the calls of the decorated function as calls of phase ``name``."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable(memory=False):
+    """Enable the instrumentation until the matching :func:`disable`.
+
+    :param memory:
+        also measure the net bytes allocated by each phase with tracemalloc,
+        which slows down all allocations
+    :type memory:
+        bool
+    """
+    global _enabled, _memory, _started_tracemalloc
+    with _lock:
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracemalloc = True
+            _memory += 1
+        _enabled += 1
+
+
+def disable(memory=False):
+    """Undo one call to :func:`enable`.
+
+    :param memory:
+        the ``memory`` argument of the matching call to :func:`enable`
+    :type memory:
+        bool
+    """
+    global _enabled, _memory, _started_tracemalloc
+    with _lock:
+        if not _enabled:
+            raise ValueError("the instrumentation is not enabled")
+        _enabled -= 1
+        if memory:
+            _memory -= 1
+            if not _memory and _started_tracemalloc:
+                tracemalloc.stop()
+                _started_tracemalloc = False
+
+
+def is_enabled():
+    """Check whether the instrumentation is enabled.
+
+    :return:
+        whether the phases record their calls
+    :rtype:
+        bool
+    """
+    return bool(_enabled)
+
+
+def reset():
+    """Clear all the recorded statistics."""
+    with _lock:
+        _stats.clear()
+
+
+def get_report():
+    """Get the statistics recorded since the last :func:`reset`.
+
+    :return:
+        mapping of the phase names, by decreasing cumulative time, to
+        dictionaries of the number of ``calls``, the cumulative wall ``time``
+        and ``self_time`` outside of nested phases in seconds, and the net
+        ``bytes`` allocated (0 unless measured)
+    :rtype:
+        dict
+    """
+    with _lock:
+        stats = {name: list(values) for name, values in _stats.items()}
+    return {
+        name: dict(zip(_FIELDS, values))
+        for name, values in sorted(stats.items(), key=lambda x: -x[1][1])
+    }
+
+
+def format_report(report=None):
+    """Format a report as a table.
+
+    :param report:
+        report as returned by :func:`get_report`, by default the current one
+    :type report:
+        dict
+    :return:
+        one line per phase
+    :rtype:
+        str
+    """
+    if report is None:
+        report = get_report()
+    width = max([len(name) for name in report] + [5])
+    lines = [
+        f"{'phase':<{width}} {'calls':>9} {'time (s)':>11} "
+        f"{'self (s)':>11} {'bytes':>12}"
+    ]
+    for name, stats in report.items():
+        lines.append(
+            f"{name:<{width}} {stats['calls']:>9} {stats['time']:>11.6f} "
+            f"{stats['self_time']:>11.6f} {stats['bytes']:>12}"
+        )
+    return "\n".join(lines)
+
+
+def write_report(filename, report=None):
+    """Write a report to a JSON file.
+
+    :param filename:
+        path of the file
+    :type filename:
+        str
+    :param report:
+        report as returned by :func:`get_report`, by default the current one
+    :type report:
+        dict
+    """
+    if report is None:
+        report = get_report()
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+@contextlib.contextmanager
+def profile(memory=False):
+    """Enable the instrumentation within a ``with`` block.
+
+    The instrumented phases of fedorov, e.g. ``data.load.<table>``,
+    ``wyckoff.evaluate``, ``space_group.apply_symmetry``,
+    ``space_group.deduplicate`` or ``data.wrap``, record their number of
+    calls, their cumulative wall time, their wall time outside of nested
+    phases and optionally the net bytes they allocated. When the
+    instrumentation is disabled, a phase only costs the check of a flag.
+
+    The context manager returns a dictionary that is filled with the report
+    of the calls made in the block (by all threads) when the block exits::
+
+        with fedorov.profiling.profile() as report:
+            fedorov.AflowPrototype(10).get_basis_vectors()
+        print(fedorov.profiling.format_report(report))
+
+    The instrumentation is enabled for the whole process by the environment
+    variable ``FEDOROV_PROFILE`` set to ``1``, or ``memory`` to also measure
+    the allocations. The report is then written at exit to the JSON file
+    given by ``FEDOROV_PROFILE_REPORT``, or printed to the standard error.
+
+    :param memory:
+        also measure the net bytes allocated by each phase with tracemalloc
+    :type memory:
+        bool
+    """
+    before = get_report()
+    report = {}
+    enable(memory)
+    try:
+        yield report
+    finally:
+        disable(memory)
+        for name, stats in get_report().items():
+            previous = before.get(name)
+            if previous is not None:
+                stats = {
+                    field: stats[field] - previous[field] for field in _FIELDS
+                }
+                if not stats["calls"]:
+                    continue
+            report[name] = stats
+
+
+def _report_at_exit():
+    filename = os.environ.get("FEDOROV_PROFILE_REPORT")
+    if filename:
+        write_report(filename)
+    else:
+        print(format_report(), file=sys.stderr)
+
+
+_mode = os.environ.get("FEDOROV_PROFILE", "").lower()
+if _mode not in ("", "0"):
+    enable(memory=_mode == "memory")
+    atexit.register(_report_at_exit)
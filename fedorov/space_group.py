@@ -2,17 +2,438 @@
 # This file is part of the fedorov project, released under the BSD 3-Clause
 # License.
 
-import copy
-import json
-import os
-import pickle
+import concurrent.futures
+import functools
+import itertools
 import warnings
 
 import numpy as np
-import rowan
-import spglib as spg
 
-from . import data, lattice, util
+from . import data, lattice, profiling
+
+# point groups of the trigonal and hexagonal crystal systems
+_HEXAGONAL_POINT_GROUPS = range(16, 28)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_symmetry_operations(space_group_number):
+    """Get the shared symmetry operations of a space group.
+
+    All :class:`SpaceGroup` instances with the same space group number share
+    the same read-only arrays, which are views into the precomputed symmetry
+    operations of all space groups.
+
+    :param space_group_number:
+        space group number between 1 and 230
+    :type space_group_number:
+        int
+    :return:
+        M by 3 by 3 array of rotation matrices and M by 3 array of translations
+    :rtype:
+        tuple
+    """
+    offsets, rotations, translations = data._load_data(
+        "space_group_symmetry_operations"
+    )
+    operations = slice(
+        offsets[space_group_number], offsets[space_group_number + 1]
+    )
+    return (
+        np.asarray(rotations[operations]),
+        np.asarray(translations[operations]),
+    )
+
+
+def _get_cartesian_quaternions(rotations, lattice_vectors):
+    """Get the quaternions of symmetry operations of a lattice.
+
+    The rotation matrices R of the operations act on fractional coordinates,
+    and are converted to the Cartesian rotation matrices A^T R A^-T, where
+    the rows of A are the lattice vectors.
+
+    :param rotations:
+        M by 3 by 3 array of rotation matrices in the basis of the lattice
+        vectors
+    :type rotations:
+        np.ndarray
+    :param lattice_vectors:
+        3 by 3 array of lattice vectors
+    :type lattice_vectors:
+        np.ndarray
+    :return:
+        M by 4 array of quaternions of the proper rotations R, or of -R for
+        the improper operations, and M array of improper flags
+    :rtype:
+        tuple
+    """
+    import rowan
+
+    lattice_vectors = np.asarray(lattice_vectors, dtype=float)
+    rotations = np.einsum(
+        "ji,ojk,lk->oil",
+        lattice_vectors,
+        np.asarray(rotations, dtype=float),
+        np.linalg.inv(lattice_vectors),
+    )
+    improper = np.linalg.det(rotations) < 0
+    rotations[improper] *= -1
+    quaternions = rowan.from_matrix(rotations, require_orthogonal=False)
+    return np.ascontiguousarray(quaternions, dtype=np.float64), improper
+
+
+@functools.lru_cache(maxsize=None)
+def _get_operation_quaternions(group_number, dimensions=3):
+    """Get the shared quaternions of the symmetry operations of a group.
+
+    The quaternion of a proper operation is the quaternion of its rotation in
+    Cartesian coordinates, and the quaternion of an improper operation is the
+    quaternion of the rotation that gives the operation when composed with the
+    inversion. The plane group operations are rotations of the xy plane. The
+    quaternions of the rhombohedral space groups depend on the angle of the
+    lattice, and are those of the default lattice parameters.
+
+    :param group_number:
+        space group number between 1 and 230, or plane group number between 1
+        and 17
+    :type group_number:
+        int
+    :param dimensions:
+        3 for a space group, 2 for a plane group
+    :type dimensions:
+        int
+    :return:
+        M by 4 array of quaternions and M array of improper flags, in the
+        order of the symmetry operations of the group
+    :rtype:
+        tuple
+    """
+    (
+        space_quaternions,
+        space_improper,
+        plane_offsets,
+        plane_quaternions,
+        plane_improper,
+    ) = data._load_data("symmetry_operation_quaternions")
+    if dimensions == 3:
+        offsets = data._load_data("space_group_symmetry_operations")[0]
+        quaternions, improper = space_quaternions, space_improper
+    else:
+        offsets = plane_offsets
+        quaternions, improper = plane_quaternions, plane_improper
+    operations = slice(offsets[group_number], offsets[group_number + 1])
+    return (
+        np.asarray(quaternions[operations]),
+        np.asarray(improper[operations]),
+    )
+
+
+def _multiply_quaternions(q1, q2):
+    """Multiply quaternions elementwise, with broadcasting.
+
+    :param q1:
+        array of quaternions (w, x, y, z) of shape (..., 4)
+    :type q1:
+        np.ndarray
+    :param q2:
+        array of quaternions of shape (..., 4)
+    :type q2:
+        np.ndarray
+    :return:
+        the products q1 q2
+    :rtype:
+        np.ndarray
+    """
+    w1, x1, y1, z1 = np.moveaxis(np.asarray(q1, dtype=float), -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(np.asarray(q2, dtype=float), -1, 0)
+    return np.stack(
+        [
+            w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+            w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+            w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+            w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+        ],
+        axis=-1,
+    )
+
+
+def _apply_orientations(
+    quaternions, improper, operation, site, base_quaternions, policy
+):
+    """Orient the images of the base orientations under their operations.
+
+    :param quaternions:
+        M by 4 array of the quaternions of the symmetry operations
+    :type quaternions:
+        np.ndarray
+    :param improper:
+        M array of the improper flags of the symmetry operations
+    :type improper:
+        np.ndarray
+    :param operation:
+        index of the operation that generated each position
+    :type operation:
+        np.ndarray
+    :param site:
+        index of the base position that generated each position
+    :type site:
+        np.ndarray
+    :param base_quaternions:
+        N by 4 array of the orientations of the base positions
+    :type base_quaternions:
+        np.ndarray
+    :param policy:
+        "ignore", "error" or the particle symmetry quaternion, see
+        :meth:`SpaceGroup.get_basis_vectors`
+    :type policy:
+        str or np.ndarray
+    :return:
+        the orientation of each position
+    :rtype:
+        np.ndarray
+    """
+    is_improper = improper[operation]
+    if isinstance(policy, str):
+        if policy not in ("ignore", "error"):
+            raise ValueError(
+                "improper must be 'ignore', 'error' or a quaternion"
+            )
+        if is_improper.any():
+            if policy == "error":
+                raise ValueError(
+                    "improper symmetry operations are included in this group, "
+                    "pass the particle symmetry quaternion as improper to "
+                    "orient the particles"
+                )
+            warnings.warn(
+                "Reflection operation is included in this group, and is "
+                "ignored for quaternion calculation."
+            )
+            quaternions = quaternions.copy()
+            quaternions[improper] = [1.0, 0.0, 0.0, 0.0]
+    with profiling._phase("space_group.apply_orientation"):
+        result = _multiply_quaternions(
+            quaternions[operation], base_quaternions[site]
+        )
+        if not isinstance(policy, str) and is_improper.any():
+            policy = np.asarray(policy, dtype=float)
+            if policy.shape != (4,):
+                raise ValueError("improper must be a quaternion of shape 4")
+            result[is_improper] = _multiply_quaternions(
+                result[is_improper], policy
+            )
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _get_point_group_quaternions(point_group_number):
+    """Get the shared quaternions of the operations of a point group.
+
+    The quaternions are computed from the rotation matrices of the point
+    group, which are given in the hexagonal axes for the trigonal and
+    hexagonal point groups and are first converted to Cartesian coordinates.
+    As for the space groups, the quaternion of an improper operation is the
+    quaternion of the rotation that gives the operation when composed with
+    the inversion.
+
+    :param point_group_number:
+        point group number between 1 and 32
+    :type point_group_number:
+        int
+    :return:
+        read-only M by 4 contiguous array of quaternions and M array of
+        improper flags, in the order of the operations of the point group
+    :rtype:
+        tuple
+    """
+    rotations = data._load_data("point_group_rotation_matrix")[
+        point_group_number
+    ]["rotations"]
+    if point_group_number in _HEXAGONAL_POINT_GROUPS:
+        axes = lattice.Hexagonal.get_lattice_vectors(a=1, c=1)
+    else:
+        axes = np.identity(3)
+    quaternions, improper = _get_cartesian_quaternions(rotations, axes)
+    quaternions[quaternions[:, 0] < 0] *= -1
+    quaternions.flags.writeable = False
+    improper.flags.writeable = False
+    return quaternions, improper
+
+
+@functools.lru_cache(maxsize=None)
+def _get_fundamental_zone_tables(point_group_number):
+    """Get the rotation tables used to reduce orientations by a point group.
+
+    The rotations g of the point group are listed with their opposites -g, so
+    that the orientation q g with the largest real part has a nonnegative real
+    part.
+
+    :param point_group_number:
+        point group number between 1 and 32
+    :type point_group_number:
+        int
+    :return:
+        4 by 2R array of the conjugates of the 2R signed rotations, whose
+        product with q gives the real parts of the q g, 2R by 4 by 4 array of
+        the matrices of the products on the right by the signed rotations, and
+        2R array of the indices of their operations in the point group
+    :rtype:
+        tuple
+    """
+    quaternions, improper = _get_point_group_quaternions(point_group_number)
+    operations = np.flatnonzero(~improper)
+    rotations = quaternions[operations]
+    rotations = np.concatenate([rotations, -rotations])
+    w, x, y, z = rotations.T
+    # q g is the row vector q times this matrix
+    products = np.stack(
+        [
+            np.stack([w, x, y, z], axis=-1),
+            np.stack([-x, w, -z, y], axis=-1),
+            np.stack([-y, z, w, -x], axis=-1),
+            np.stack([-z, -y, x, w], axis=-1),
+        ],
+        axis=-2,
+    )
+    conjugates = np.ascontiguousarray(products[:, :, 0].T)
+    operations = np.concatenate([operations, operations])
+    for array in (conjugates, products, operations):
+        array.flags.writeable = False
+    return conjugates, products, operations
+
+
+def _map_blocks(function, blocks, threads):
+    """Call function on each block, in a pool of threads unless threads is 1.
+
+    The numpy kernels of the blocks release the GIL, so that the blocks are
+    processed in parallel.
+    """
+    if threads == 1:
+        for block in blocks:
+            function(*block)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            for _ in executor.map(lambda block: function(*block), blocks):
+                pass
+
+
+def _check_quaternions(quaternions, name="quaternions"):
+    quaternions = np.asarray(quaternions, dtype=float)
+    if quaternions.ndim != 2 or quaternions.shape[1] != 4:
+        raise ValueError(f"{name} must be an numpy array of shape Nx4")
+    return quaternions
+
+
+def _find_duplicates(positions, threshold):
+    """Find the positions lying within ``threshold`` of an earlier position.
+
+    The positions are hashed on a periodic grid of cells at least twice as
+    wide as ``threshold``. A position is compared with the positions in its
+    own cell and, when it lies within ``threshold`` of a cell face, in the
+    neighbouring cells, using the minimum image distance.
+
+    :param positions:
+        N by D array of fractional coordinates
+    :type positions:
+        np.ndarray
+    :param threshold:
+        distance up to which two positions are considered the same
+    :type threshold:
+        float
+    :return:
+        N booleans, true for the positions close to an earlier position
+    :rtype:
+        np.ndarray
+    """
+    n_positions, dimensions = positions.shape
+    n_cells = max(1, min(4096, int(1 / (2 * threshold))))
+    grid = (n_cells,) * dimensions
+    lower = np.floor((positions - threshold) * n_cells).astype(np.int64)
+    upper = np.floor((positions + threshold) * n_cells).astype(np.int64)
+    keys = np.ravel_multi_index(
+        np.floor(positions * n_cells).astype(np.int64).T, grid, mode="wrap"
+    )
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    straddles = upper != lower
+    duplicate = np.zeros(n_positions, dtype=bool)
+    # each choice of the lower or upper cell along every axis, visiting every
+    # cell within the threshold of a position once
+    for use_upper in itertools.product((False, True), repeat=dimensions):
+        use_upper = np.array(use_upper)
+        i = np.flatnonzero(np.all(straddles[:, use_upper], axis=1))
+        cells = np.where(use_upper, upper[i], lower[i])
+        cell_keys = np.ravel_multi_index(cells.T, grid, mode="wrap")
+        start = np.searchsorted(sorted_keys, cell_keys, side="left")
+        counts = np.searchsorted(sorted_keys, cell_keys, side="right")
+        counts -= start
+        # pair the positions with all positions in the cell
+        first = np.cumsum(counts) - counts
+        i = np.repeat(i, counts)
+        j = order[np.arange(len(i)) - np.repeat(first - start, counts)]
+        earlier = j < i
+        i, j = i[earlier], j[earlier]
+        delta = positions[i] - positions[j]
+        delta -= np.rint(delta)
+        close = np.einsum("ij,ij->i", delta, delta) <= threshold**2
+        duplicate[i[close]] = True
+    return duplicate
+
+
+def _expand_orbits(
+    rotations, translations, base_positions, ordering, threshold=1e-6
+):
+    """Apply all symmetry operations to the base positions at once.
+
+    An image of a base position is dropped when it lies within a periodic
+    distance ``threshold`` of an earlier image, see :func:`_find_duplicates`.
+
+    :param rotations:
+        M by D by D array of rotation matrices
+    :type rotations:
+        np.ndarray
+    :param translations:
+        M by D array of translations
+    :type translations:
+        np.ndarray
+    :param base_positions:
+        N by D array of base positions
+    :type base_positions:
+        np.ndarray
+    :param ordering:
+        "operation" to list the images of all base positions under each
+        operation in turn, "site" to list the orbit of each base position in
+        turn
+    :type ordering:
+        str
+    :param threshold:
+        distance up to which two images are considered the same
+    :type threshold:
+        float
+    :return:
+        the unique positions, and the indices of the operation and of the base
+        position that generated each of them
+    :rtype:
+        tuple
+    """
+    n_sites = base_positions.shape[0]
+    n_operations = len(rotations)
+    if ordering == "operation":
+        operation, site = np.divmod(np.arange(n_operations * n_sites), n_sites)
+    elif ordering == "site":
+        site, operation = np.divmod(
+            np.arange(n_operations * n_sites), n_operations
+        )
+    else:
+        raise ValueError("ordering must be either 'operation' or 'site'")
+
+    with profiling._phase("space_group.apply_symmetry"):
+        positions = np.einsum("oij,nj->oni", rotations, base_positions)
+        positions = data.wrap(positions + translations[:, np.newaxis, :])
+        positions = positions[operation, site]
+
+    with profiling._phase("space_group.deduplicate"):
+        first = np.flatnonzero(~_find_duplicates(positions, threshold))
+    return positions[first], operation[first], site[first]
 
 
 class PlaneGroup:
@@ -27,19 +448,10 @@ class PlaneGroup:
         int
     """
 
-    plane_group_info_dir = os.path.join(
-        data._DATA_PATH, "plane_group_info.pickle"
-    )
-    with open(plane_group_info_dir, "rb") as f:
-        plane_group_info_dict = pickle.load(f)
-    plane_group_lattice_mapping_dir = os.path.join(
-        data._DATA_PATH, "plane_group_lattice_mapping.json"
-    )
-    with open(plane_group_lattice_mapping_dir, "r") as f:
-        plane_group_lattice_mapping = json.load(
-            f, object_hook=util.json_key_to_int
-        )
+    plane_group_info_dict = data._LazyData("plane_group_info")
+    plane_group_lattice_mapping = data._LazyData("plane_group_lattice_mapping")
 
+    @profiling._instrument("plane_group.init")
     def __init__(self, plane_group_number=1):
         if plane_group_number <= 0 or plane_group_number > 17:
             raise ValueError(
@@ -62,6 +474,7 @@ class PlaneGroup:
             f"Default parameters for lattice: {self.lattice.lattice_params}"
         )
 
+    @profiling._instrument("plane_group.get_basis_vectors")
     def get_basis_vectors(
         self,
         base_positions,
@@ -69,6 +482,8 @@ class PlaneGroup:
         base_quaternions=None,
         is_complete=False,
         apply_orientation=False,
+        ordering="operation",
+        improper="ignore",
     ):
         """Get the basis vectors for the defined crystall structure.
 
@@ -94,6 +509,24 @@ class PlaneGroup:
             to orientation
         :type apply_orientations:
             bool
+        :param ordering:
+            "operation" (default) to list the positions generated by each
+            symmetry operation in turn, "site" to list the full orbit of each
+            base position in turn
+        :type ordering:
+            str
+        :param improper:
+            how the improper symmetry operations (inversions, reflections,
+            roto-inversions) orient the particles: "ignore" (default) to leave
+            the orientations unchanged, with a warning, "error" to raise a
+            ValueError, or the quaternion q_s of the particle symmetry such
+            that inverting the particle is the same as rotating it by q_s,
+            i.e. the identity quaternion for centrosymmetric particles and the
+            half turn about the normal of a mirror plane of the particle. An
+            improper operation, the inversion composed with a rotation q,
+            then maps the orientation q_0 to q q_0 q_s
+        :type improper:
+            str or np.ndarray
         :return:
             basis_vectors
         :rtype:
@@ -131,53 +564,26 @@ class PlaneGroup:
         else:
             base_type = ["A"] * base_positions.shape[0]
 
-        def _expand2d(matrix2d):
-            matrix3d = np.identity(3)
-            matrix3d[0:2, 0:2] = matrix2d
-            return matrix3d
-
-        threshold = 1e-6
-        reflection_exist = False
-        for i in range(0, len(self.rotations)):
-            # Generate the new set of positions from the base
-            pos = data.wrap(
-                self.rotations[i].dot(base_positions.T).T + self.translations[i]
-            )
-            if apply_orientation:
-                if np.linalg.det(self.rotations[i]) == 1:
-                    quat_rotate = rowan.from_matrix(
-                        _expand2d(self.rotations[i]), require_orthogonal=False
-                    )
-                    quat = rowan.multiply(quat_rotate, base_quaternions)
-                else:
-                    quat = base_quaternions
-                    reflection_exist = True
-
-            if i == 0:
-                positions = pos
-                type_list = copy.deepcopy(base_type)
-                if apply_orientation:
-                    quaternions = quat
-            else:
-                pos_comparisons = pos - positions[:, np.newaxis, :]
-                norms = np.linalg.norm(pos_comparisons, axis=2)
-                comps = np.all(norms > threshold, axis=0)
-                positions = np.append(positions, pos[comps], axis=0)
-                type_list += [x for x, y in zip(base_type, comps) if y]
-                if apply_orientation:
-                    quaternions = np.append(quaternions, quat[comps], axis=0)
-                    if norms.min() < threshold:
-                        warnings.warn(
-                            "Orientation quaterions may have multiple values "
-                            "for the same particle postion under the symmetry "
-                            "operation for this space group and is not well "
-                            "defined, only the first occurance is used."
-                        )
-        if reflection_exist:
-            warnings.warn(
-                "Reflection operation is included in this space "
-                "group, and is ignored for quaternion calculation."
+        positions, operation, site = _expand_orbits(
+            self.rotations, self.translations, base_positions, ordering
+        )
+        type_list = [base_type[i] for i in site]
+
+        if apply_orientation:
+            quaternions = _apply_orientations(
+                *_get_operation_quaternions(self.plane_group_number, 2),
+                operation,
+                site,
+                base_quaternions,
+                improper,
             )
+            if len(positions) < len(self.rotations) * len(base_positions):
+                warnings.warn(
+                    "Orientation quaterions may have multiple values "
+                    "for the same particle postion under the symmetry "
+                    "operation for this space group and is not well "
+                    "defined, only the first occurance is used."
+                )
 
         if is_complete and len(positions) != len(base_positions):
             raise ValueError(
@@ -216,21 +622,10 @@ class SpaceGroup:
         int
     """
 
-    space_group_hall_mapping_dir = os.path.join(
-        data._DATA_PATH, "space_group_hall_mapping.json"
-    )
-    with open(space_group_hall_mapping_dir, "r") as f:
-        space_group_hall_mapping = json.load(
-            f, object_hook=util.json_key_to_int
-        )
-    space_group_lattice_mapping_dir = os.path.join(
-        data._DATA_PATH, "space_group_lattice_mapping.json"
-    )
-    with open(space_group_lattice_mapping_dir, "r") as f:
-        space_group_lattice_mapping = json.load(
-            f, object_hook=util.json_key_to_int
-        )
+    space_group_hall_mapping = data._LazyData("space_group_hall_mapping")
+    space_group_lattice_mapping = data._LazyData("space_group_lattice_mapping")
 
+    @profiling._instrument("space_group.init")
     def __init__(self, space_group_number=1):
         if space_group_number <= 0 or space_group_number > 230:
             raise ValueError(
@@ -242,11 +637,9 @@ class SpaceGroup:
             self.space_group_number
         ]
         self.lattice = lattice.lattice_system_dict_3D[self.lattice_type]
-        info = spg.get_symmetry_from_database(
-            self.space_group_hall_mapping[space_group_number]
+        self.rotations, self.translations = _get_symmetry_operations(
+            space_group_number
         )
-        self.translations = info["translations"]
-        self.rotations = info["rotations"]
 
     def print_info(self):
         print(
@@ -255,6 +648,7 @@ class SpaceGroup:
             f"Default parameters for lattice: {self.lattice.lattice_params}"
         )
 
+    @profiling._instrument("space_group.get_basis_vectors")
     def get_basis_vectors(
         self,
         base_positions,
@@ -262,6 +656,9 @@ class SpaceGroup:
         base_quaternions=None,
         is_complete=False,
         apply_orientation=False,
+        ordering="operation",
+        improper="ignore",
+        lattice_vectors=None,
     ):
         """Get the basis vectors for the defined crystall structure.
 
@@ -287,6 +684,31 @@ class SpaceGroup:
             to orientatioin
         :type apply_orientations:
             bool
+        :param ordering:
+            "operation" (default) to list the positions generated by each
+            symmetry operation in turn, "site" to list the full orbit of each
+            base position in turn
+        :type ordering:
+            str
+        :param improper:
+            how the improper symmetry operations (inversions, reflections,
+            roto-inversions) orient the particles: "ignore" (default) to leave
+            the orientations unchanged, with a warning, "error" to raise a
+            ValueError, or the quaternion q_s of the particle symmetry such
+            that inverting the particle is the same as rotating it by q_s,
+            i.e. the identity quaternion for centrosymmetric particles and the
+            half turn about the normal of a mirror plane of the particle. An
+            improper operation, the inversion composed with a rotation q,
+            then maps the orientation q_0 to q q_0 q_s
+        :type improper:
+            str or np.ndarray
+        :param lattice_vectors:
+            lattice vectors of the unit cell, used to orient the particles of
+            the rhombohedral space groups, whose Cartesian symmetry operations
+            depend on the angle of the lattice, default the lattice vectors of
+            the default lattice parameters
+        :type lattice_vectors:
+            np.ndarray
         :return:
             basis_vectors
         :rtype:
@@ -324,48 +746,34 @@ class SpaceGroup:
         else:
             base_type = ["A"] * base_positions.shape[0]
 
-        threshold = 1e-6
-        reflection_exist = False
-        for i in range(0, len(self.rotations)):
-            # Generate the new set of positions from the base
-            pos = data.wrap(
-                self.rotations[i].dot(base_positions.T).T + self.translations[i]
-            )
-            if apply_orientation:
-                if np.linalg.det(self.rotations[i]) == 1:
-                    quat_rotate = rowan.from_matrix(
-                        self.rotations[i], require_orthogonal=False
-                    )
-                    quat = rowan.multiply(quat_rotate, base_quaternions)
-                else:
-                    quat = base_quaternions
-                    reflection_exist = True
-
-            if i == 0:
-                positions = pos
-                type_list = copy.deepcopy(base_type)
-                if apply_orientation:
-                    quaternions = quat
+        positions, operation, site = _expand_orbits(
+            self.rotations, self.translations, base_positions, ordering
+        )
+        type_list = [base_type[i] for i in site]
+
+        if apply_orientation:
+            if self.lattice is lattice.Rhombohedral:
+                if lattice_vectors is None:
+                    lattice_vectors = self.get_lattice_vectors()
+                operations = _get_cartesian_quaternions(
+                    self.rotations, lattice_vectors
+                )
             else:
-                pos_comparisons = pos - positions[:, np.newaxis, :]
-                norms = np.linalg.norm(pos_comparisons, axis=2)
-                comps = np.all(norms > threshold, axis=0)
-                positions = np.append(positions, pos[comps], axis=0)
-                type_list += [x for x, y in zip(base_type, comps) if y]
-                if apply_orientation:
-                    quaternions = np.append(quaternions, quat[comps], axis=0)
-                    if norms.min() < threshold:
-                        print(
-                            "Orientation quaterions may have multiple values "
-                            "for the same particle postion under the symmetry "
-                            "operation for this space group and is not well "
-                            "defined, only the first occurance is used."
-                        )
-        if reflection_exist:
-            print(
-                "Warning: reflection operation is included in this "
-                "space group, and is ignored for quaternion calculation."
+                operations = _get_operation_quaternions(self.space_group_number)
+            quaternions = _apply_orientations(
+                *operations,
+                operation,
+                site,
+                base_quaternions,
+                improper,
             )
+            if len(positions) < len(self.rotations) * len(base_positions):
+                warnings.warn(
+                    "Orientation quaterions may have multiple values "
+                    "for the same particle postion under the symmetry "
+                    "operation for this space group and is not well "
+                    "defined, only the first occurance is used."
+                )
 
         if is_complete and len(positions) != len(base_positions):
             raise ValueError(
@@ -405,25 +813,11 @@ class PointGroup:
         int
     """
 
-    point_group_rotation_matrix_dir = os.path.join(
-        data._DATA_PATH, "point_group_rotation_matrix_dict.pickle"
-    )
-    with open(point_group_rotation_matrix_dir, "rb") as f:
-        point_group_rotation_matrix_dict = pickle.load(f)
-
-    point_group_quat_dir = os.path.join(
-        data._DATA_PATH, "point_group_quat_dict.json"
+    point_group_rotation_matrix_dict = data._LazyData(
+        "point_group_rotation_matrix"
     )
-    with open(point_group_quat_dir, "r") as f:
-        point_group_quat_dict = json.load(f, object_hook=util.json_key_to_int)
-
-    point_group_name_mapping_dir = os.path.join(
-        data._DATA_PATH, "point_group_name_mapping.json"
-    )
-    with open(point_group_name_mapping_dir, "r") as f:
-        point_group_name_mapping = json.load(
-            f, object_hook=util.json_key_to_int
-        )
+    point_group_quat_dict = data._LazyData("point_group_quat")
+    point_group_name_mapping = data._LazyData("point_group_name_mapping")
 
     def __init__(self, point_group_number=1):
         if point_group_number <= 0 or point_group_number > 32:
@@ -438,7 +832,9 @@ class PointGroup:
         self.rotation_matrix = self.point_group_rotation_matrix_dict[
             point_group_number
         ]["rotations"]
-        self.quaternion = self.point_group_quat_dict[point_group_number]
+        self.quaternion = _get_point_group_quaternions(point_group_number)[
+            0
+        ].tolist()
 
     def print_info(self):
         print(
@@ -449,6 +845,10 @@ class PointGroup:
     def get_quaternion(self):
         """Get the quaternions for the point group symmetry.
 
+        The quaternions are those used by :meth:`to_fundamental_zone`, see
+        :func:`_get_point_group_quaternions`: the quaternion of an improper
+        operation is that of its composition with the inversion.
+
         :return:
             list of quaternions
         :rtype:
@@ -467,3 +867,213 @@ class PointGroup:
         """
 
         return self.rotation_matrix
+
+    @profiling._instrument("point_group.to_fundamental_zone")
+    def to_fundamental_zone(
+        self, quaternions, chunk_size=2**12, threads=1, return_index=False
+    ):
+        """Reduce orientations into the fundamental zone of the point group.
+
+        The orientations q of particles whose symmetry is the point group are
+        equivalent to the orientations q g for all the rotations g of the point
+        group. The equivalent orientation with the smallest rotation angle,
+        i.e. the largest absolute real part, is returned with a nonnegative
+        real part. The real parts of all the equivalent orientations of
+        ``chunk_size`` orientations at a time are obtained with one matrix
+        product. The improper operations of the point group do not relate
+        orientations and are skipped.
+
+        :param quaternions:
+            N by 4 array of unit quaternions
+        :type quaternions:
+            np.ndarray
+        :param chunk_size:
+            number of orientations reduced at once
+        :type chunk_size:
+            int
+        :param threads:
+            number of threads reducing the chunks, default 1 to reduce them in
+            the calling thread, None for the default of
+            :class:`concurrent.futures.ThreadPoolExecutor`
+        :type threads:
+            int
+        :param return_index:
+            also return the index of the operation g of each orientation, in
+            the order of :meth:`get_rotation_matrix`
+        :type return_index:
+            bool
+        :return:
+            N by 4 array of the reduced orientations, and the N indices of the
+            operations if ``return_index``
+        :rtype:
+            np.ndarray or tuple
+        """
+        quaternions = _check_quaternions(quaternions)
+        conjugates, products, operations = _get_fundamental_zone_tables(
+            self.point_group_number
+        )
+        result = np.empty_like(quaternions)
+        index = np.empty(len(quaternions), dtype=np.intp)
+
+        def _reduce(begin, end):
+            chunk = quaternions[begin:end]
+            best = chunk.dot(conjugates).argmax(axis=1)
+            np.einsum(
+                "ni,nij->nj",
+                chunk,
+                products.take(best, axis=0),
+                out=result[begin:end],
+            )
+            index[begin:end] = best
+
+        _map_blocks(
+            _reduce,
+            [
+                (begin, begin + chunk_size)
+                for begin in range(0, len(quaternions), chunk_size)
+            ],
+            threads,
+        )
+        if return_index:
+            return result, operations.take(index)
+        return result
+
+    @profiling._instrument("point_group.get_misorientations")
+    def get_misorientations(
+        self,
+        orientations1,
+        orientations2,
+        pairwise=True,
+        block_size=2**20,
+        threads=1,
+        return_index=False,
+    ):
+        """Get the misorientation angles between orientations of particles.
+
+        The particles have the symmetry of the point group, so that the
+        rotation from the orientation a to the orientation b is equivalent to
+        the rotations from a g1 to b g2 for all the rotations g1 and g2 of the
+        point group. The misorientation angle is the smallest angle of these
+        rotations, which is the smallest angle of the rotations from a to b g
+        for the rotations g of the point group. The cosine of half this angle
+        is the absolute dot product of a and b g, so that the misorientations
+        of blocks of orientations are obtained with one matrix product per
+        block, without building the rotations. The blocks hold at most
+        ``block_size`` dot products, which bounds the memory of the pairwise
+        misorientations of large sets.
+
+        :param orientations1:
+            N by 4 array of unit quaternions
+        :type orientations1:
+            np.ndarray
+        :param orientations2:
+            M by 4 array of unit quaternions, with M = N unless ``pairwise``
+        :type orientations2:
+            np.ndarray
+        :param pairwise:
+            get the misorientations of all pairs of orientations of the two
+            sets, otherwise of the orientations of the same index
+        :type pairwise:
+            bool
+        :param block_size:
+            maximum number of dot products computed at once
+        :type block_size:
+            int
+        :param threads:
+            number of threads processing the blocks, default 1 to process them
+            in the calling thread, None for the default of
+            :class:`concurrent.futures.ThreadPoolExecutor`
+        :type threads:
+            int
+        :param return_index:
+            also return the index of the operation g of each misorientation,
+            in the order of :meth:`get_rotation_matrix`, such that b g is the
+            equivalent orientation of b closest to a
+        :type return_index:
+            bool
+        :return:
+            N by M (pairwise) or N misorientation angles in radians, and the
+            indices of the operations if ``return_index``
+        :rtype:
+            np.ndarray or tuple
+        """
+        orientations1 = _check_quaternions(orientations1, "orientations1")
+        orientations2 = _check_quaternions(orientations2, "orientations2")
+        if not pairwise and len(orientations1) != len(orientations2):
+            raise ValueError(
+                "orientations1 and orientations2 must have the same length "
+                "unless pairwise"
+            )
+        _, products, operations = _get_fundamental_zone_tables(
+            self.point_group_number
+        )
+        # the rotations without their opposites
+        n_rotations = len(products) // 2
+        products = products[:n_rotations]
+        operations = operations[:n_rotations]
+        n_orientations1 = len(orientations1)
+        n_orientations2 = len(orientations2)
+
+        if pairwise:
+            shape = (n_orientations1, n_orientations2)
+            # square tiles of at most block_size dot products, widened when
+            # orientations2 is small
+            edge = max(1, int(np.sqrt(block_size / n_rotations)))
+            columns = max(1, min(n_orientations2, edge))
+            rows = max(1, block_size // (n_rotations * columns))
+            blocks = [
+                (row, column)
+                for row in range(0, n_orientations1, rows)
+                for column in range(0, n_orientations2, columns)
+            ]
+        else:
+            shape = (n_orientations1,)
+            rows = max(1, block_size // n_rotations)
+            blocks = [(row, None) for row in range(0, n_orientations1, rows)]
+            # a.(b g) is the product of the outer product of b and a with the
+            # flattened matrix of the product by g
+            matrices = np.ascontiguousarray(products.reshape(n_rotations, 16).T)
+        cosines = np.empty(shape)
+        index = np.empty(shape, dtype=np.intp) if return_index else None
+
+        def _misorient(row, column):
+            # the rotations are along the last axis of the dot products for
+            # argmax, and along the second to last axis otherwise, where the
+            # reduction is vectorized over the orientations
+            a = orientations1[row : row + rows]
+            if column is None:
+                b = orientations2[row : row + rows]
+                target = np.s_[row : row + rows]
+                if return_index:
+                    outer = np.einsum("nj,nk->njk", b, a)
+                    dots = outer.reshape(len(a), 16).dot(matrices)
+                else:
+                    outer = np.einsum("jn,kn->jkn", b.T, a.T)
+                    dots = matrices.T.dot(outer.reshape(16, len(a)))
+            else:
+                b = orientations2[column : column + columns]
+                target = np.s_[row : row + rows, column : column + columns]
+                layout = "mj,gjk->mgk" if return_index else "mj,gjk->gmk"
+                equivalents = np.einsum(layout, b, products).reshape(-1, 4)
+                dots = a.dot(equivalents.T)
+                if return_index:
+                    dots = dots.reshape(len(a), len(b), n_rotations)
+                else:
+                    dots = dots.reshape(len(a), n_rotations, len(b))
+            np.abs(dots, out=dots)
+            if return_index:
+                best = dots.argmax(axis=-1)
+                index[target] = best
+                cosines[target] = np.take_along_axis(
+                    dots, best[..., np.newaxis], axis=-1
+                )[..., 0]
+            else:
+                dots.max(axis=-2, out=cosines[target])
+
+        _map_blocks(_misorient, blocks, threads)
+        np.minimum(cosines, 1, out=cosines)
+        angles = np.arccos(cosines, out=cosines)
+        angles *= 2
+        if return_index:
+            return angles, operations.take(index)
+        return angles
@@ -0,0 +1,352 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import collections
+
+import numpy as np
+
+Supercell = collections.namedtuple(
+    "Supercell",
+    ["positions", "typeid", "types", "lattice_vectors", "orientations"],
+)
+Supercell.__doc__ = """Particles of a supercell in Cartesian coordinates.
+
+:param positions:
+    N by D array of Cartesian particle positions
+:param typeid:
+    type id of each particle, indexing ``types``
+:param types:
+    list of the type names
+:param lattice_vectors:
+    D by D array of the supercell lattice vectors
+:param orientations:
+    N by 4 array of particle quaternions, or None
+"""
+
+
+def _get_replicas(replicas, dimensions):
+    replicas = np.broadcast_to(np.asarray(replicas, dtype=int), (dimensions,))
+    if np.any(replicas < 1):
+        raise ValueError("replicas must be positive integers")
+    return replicas
+
+
+def _get_typeid(type_list, n_basis):
+    if type_list is None:
+        type_list = ["A"] * n_basis
+    elif len(type_list) != n_basis:
+        raise ValueError(
+            "type_list must contain one type name per basis vector"
+        )
+    types = sorted(set(type_list))
+    typeid = np.searchsorted(types, type_list).astype(np.int32)
+    return typeid, types
+
+
+def _replicate(basis_positions, lattice_vectors, replicas, out, start=0):
+    """Write the particles of the replicated unit cells into ``out``.
+
+    The cells are ordered with the index along the last lattice vector varying
+    slowest, so that the layers of cells along that vector are contiguous.
+    Only the layers ``start:start + n`` that fit in ``out`` are written. The
+    particles are computed as the sum of the offsets of the cells along the
+    first lattice vector plus the basis positions, and of the offsets along the
+    other lattice vectors, so that no temporary array of the size of the output
+    is needed.
+    """
+    n_basis, dimensions = basis_positions.shape
+    n_inner = replicas[0] * n_basis
+    stop = start + len(out) // (int(np.prod(replicas[:-1])) * n_basis)
+    inner = (
+        np.arange(replicas[0])[:, np.newaxis, np.newaxis] * lattice_vectors[0]
+        + basis_positions[np.newaxis]
+    ).reshape(n_inner, dimensions)
+    outer = np.zeros((1, dimensions))
+    for axis in range(1, dimensions):
+        if axis == dimensions - 1:
+            cells = np.arange(start, stop)
+        else:
+            cells = np.arange(replicas[axis])
+        outer = (
+            cells[:, np.newaxis, np.newaxis] * lattice_vectors[axis]
+            + outer[np.newaxis]
+        ).reshape(-1, dimensions)
+    np.add(
+        outer[:, np.newaxis, :],
+        inner[np.newaxis],
+        out=out.reshape(len(outer), -1, dimensions),
+    )
+    return out
+
+
+def _prepare(basis_vectors, lattice_vectors, replicas, type_list, orientations):
+    """Check the unit cell and return its Cartesian basis and type ids."""
+    basis_vectors = np.asarray(basis_vectors, dtype=float)
+    lattice_vectors = np.asarray(lattice_vectors, dtype=float)
+    n_basis, dimensions = basis_vectors.shape
+    if lattice_vectors.shape != (dimensions, dimensions):
+        raise ValueError(
+            "lattice_vectors must be a D by D array for D dimensional "
+            "basis_vectors"
+        )
+    if orientations is not None:
+        orientations = np.asarray(orientations)
+        if orientations.shape != (n_basis, 4):
+            raise ValueError("orientations must be an N by 4 array")
+    replicas = _get_replicas(replicas, dimensions)
+    typeid, types = _get_typeid(type_list, n_basis)
+    return (
+        basis_vectors.dot(lattice_vectors),
+        lattice_vectors,
+        replicas,
+        typeid,
+        types,
+        orientations,
+    )
+
+
+def build_supercell(
+    basis_vectors,
+    lattice_vectors,
+    replicas,
+    type_list=None,
+    orientations=None,
+    dtype=np.float64,
+):
+    """Replicate a unit cell into a supercell in Cartesian coordinates.
+
+    The unit cell can be any output of ``get_basis_vectors`` and
+    ``get_lattice_vectors`` of :class:`Prototype`, :class:`AflowPrototype`,
+    :class:`SpaceGroup` or :class:`PlaneGroup`. All particles are generated in
+    one broadcasted operation into preallocated arrays. The particles of cell
+    ``(i, j, k)`` are at ``(basis_vectors + (i, j, k)).dot(lattice_vectors)``,
+    with the cells ordered by ``k``, then ``j``, then ``i``.
+
+    :param basis_vectors:
+        N by D array of fractional coordinates in the unit cell
+    :type basis_vectors:
+        np.ndarray
+    :param lattice_vectors:
+        D by D array of lattice vectors
+    :type lattice_vectors:
+        np.ndarray
+    :param replicas:
+        number of unit cells along each lattice vector
+    :type replicas:
+        int or list
+    :param type_list:
+        type name of each basis vector, default all "A"
+    :type type_list:
+        list
+    :param orientations:
+        N by 4 array of quaternions of the basis particles, default None
+    :type orientations:
+        np.ndarray
+    :param dtype:
+        floating point type of the positions and orientations
+    :type dtype:
+        np.dtype
+    :return:
+        the particles of the supercell
+    :rtype:
+        :class:`Supercell`
+    """
+    return next(
+        iter_supercell(
+            basis_vectors,
+            lattice_vectors,
+            replicas,
+            type_list=type_list,
+            orientations=orientations,
+            dtype=dtype,
+            chunk_size=None,
+        )
+    )
+
+
+def iter_supercell(
+    basis_vectors,
+    lattice_vectors,
+    replicas,
+    type_list=None,
+    orientations=None,
+    dtype=np.float64,
+    chunk_size=2**20,
+):
+    """Generate a supercell chunk by chunk.
+
+    The supercell is generated by slabs of whole layers of unit cells along
+    the last lattice vector, each slab containing at most ``chunk_size``
+    particles (but at least one layer). The concatenation of all the chunks is
+    identical to the output of :func:`build_supercell`.
+
+    :param basis_vectors:
+        N by D array of fractional coordinates in the unit cell
+    :type basis_vectors:
+        np.ndarray
+    :param lattice_vectors:
+        D by D array of lattice vectors
+    :type lattice_vectors:
+        np.ndarray
+    :param replicas:
+        number of unit cells along each lattice vector
+    :type replicas:
+        int or list
+    :param type_list:
+        type name of each basis vector, default all "A"
+    :type type_list:
+        list
+    :param orientations:
+        N by 4 array of quaternions of the basis particles, default None
+    :type orientations:
+        np.ndarray
+    :param dtype:
+        floating point type of the positions and orientations
+    :type dtype:
+        np.dtype
+    :param chunk_size:
+        maximum number of particles per chunk, None for a single chunk
+    :type chunk_size:
+        int
+    :return:
+        generator of the chunks of the supercell, all with the lattice
+        vectors and type names of the whole supercell
+    :rtype:
+        generator
+    """
+    (
+        basis_positions,
+        lattice_vectors,
+        replicas,
+        typeid,
+        types,
+        orientations,
+    ) = _prepare(
+        basis_vectors, lattice_vectors, replicas, type_list, orientations
+    )
+    supercell_lattice_vectors = replicas[:, np.newaxis] * lattice_vectors
+    for start, stop in _get_layers(len(typeid), replicas, chunk_size):
+        n_cells = (stop - start) * int(np.prod(replicas[:-1]))
+        positions = np.empty(
+            (n_cells * len(typeid), len(replicas)), dtype=dtype
+        )
+        _replicate(basis_positions, lattice_vectors, replicas, positions, start)
+        yield Supercell(
+            positions,
+            np.tile(typeid, n_cells),
+            types,
+            supercell_lattice_vectors,
+            (
+                None
+                if orientations is None
+                else np.tile(orientations.astype(dtype), (n_cells, 1))
+            ),
+        )
+
+
+def _get_layers(n_basis, replicas, chunk_size):
+    """Split the layers of cells along the last lattice vector into slabs."""
+    if chunk_size is None:
+        layers = replicas[-1]
+    else:
+        layer_size = int(np.prod(replicas[:-1])) * n_basis
+        layers = max(1, chunk_size // layer_size)
+    for start in range(0, replicas[-1], layers):
+        yield start, min(start + layers, replicas[-1])
+
+
+def write_supercell(
+    filename,
+    basis_vectors,
+    lattice_vectors,
+    replicas,
+    type_list=None,
+    dtype=np.float64,
+    chunk_size=2**20,
+    typeid_filename=None,
+    progress=None,
+):
+    """Write the positions of a supercell directly into a memory-mapped file.
+
+    The positions are generated slab by slab as in :func:`iter_supercell`
+    straight into the memory map, so that the peak memory stays bounded by the
+    chunk size for supercells that do not fit in memory. The file holds the
+    same data as the positions of :func:`build_supercell`, as an npy file if
+    ``filename`` ends with ".npy" and as raw binary data otherwise.
+
+    :param filename:
+        path of the output file
+    :type filename:
+        str
+    :param basis_vectors:
+        N by D array of fractional coordinates in the unit cell
+    :type basis_vectors:
+        np.ndarray
+    :param lattice_vectors:
+        D by D array of lattice vectors
+    :type lattice_vectors:
+        np.ndarray
+    :param replicas:
+        number of unit cells along each lattice vector
+    :type replicas:
+        int or list
+    :param type_list:
+        type name of each basis vector, default all "A"
+    :type type_list:
+        list
+    :param dtype:
+        floating point type of the positions
+    :type dtype:
+        np.dtype
+    :param chunk_size:
+        maximum number of particles written at once
+    :type chunk_size:
+        int
+    :param typeid_filename:
+        path of an optional output file for the int32 type ids
+    :type typeid_filename:
+        str
+    :param progress:
+        function called as ``progress(n_written, n_total)`` after each chunk
+    :type progress:
+        callable
+    :return:
+        the memory-mapped positions and the type names
+    :rtype:
+        tuple
+    """
+    basis_positions, lattice_vectors, replicas, typeid, types, _ = _prepare(
+        basis_vectors, lattice_vectors, replicas, type_list, None
+    )
+    n_cells_per_layer = int(np.prod(replicas[:-1]))
+    n_particles = int(np.prod(replicas)) * len(typeid)
+    positions = _open_memmap(filename, dtype, (n_particles, len(replicas)))
+    if typeid_filename is not None:
+        typeids = _open_memmap(typeid_filename, np.int32, (n_particles,))
+
+    for start, stop in _get_layers(len(typeid), replicas, chunk_size):
+        begin = start * n_cells_per_layer * len(typeid)
+        end = stop * n_cells_per_layer * len(typeid)
+        _replicate(
+            basis_positions,
+            lattice_vectors,
+            replicas,
+            positions[begin:end],
+            start,
+        )
+        positions.flush()
+        if typeid_filename is not None:
+            typeids[begin:end].reshape(-1, len(typeid))[:] = typeid
+            typeids.flush()
+        if progress is not None:
+            progress(end, n_particles)
+    return positions, types
+
+
+def _open_memmap(filename, dtype, shape):
+    if str(filename).endswith(".npy"):
+        return np.lib.format.open_memmap(
+            filename, mode="w+", dtype=dtype, shape=shape
+        )
+    return np.memmap(filename, mode="w+", dtype=dtype, shape=shape)
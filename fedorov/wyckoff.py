@@ -0,0 +1,180 @@
+# Copyright (c) 2019-2020 The Regents of the University of Michigan
+# This file is part of the fedorov project, released under the BSD 3-Clause
+# License.
+
+import functools
+import re
+from collections.abc import Mapping
+from fractions import Fraction
+
+import numpy as np
+
+from . import data
+
+_TERM_REGEX = re.compile(
+    r"([+-]?)(?:(\d*)([xyz])|(\d+(?:\.\d*)?|\.\d+)(?:/(\d+))?)"
+)
+_EXPRESSION_REGEX = re.compile(
+    r"(?:[+-]?(?:\d*[xyz]|(?:\d+(?:\.\d*)?|\.\d+)(?:/\d+)?))+"
+)
+
+
+def compile_position(position):
+    """Compile a Wyckoff position into its affine form.
+
+    The Wyckoff position ``position`` is compiled into a matrix ``M`` and an
+    offset ``t`` so that the fractional coordinates of the site are
+    ``M.dot([x, y, z]) + t``.
+
+    :param position:
+        the three coordinate expressions of a Wyckoff position, e.g.
+        ``["x", "2x", "-y+1/4"]``, with fractional or decimal offsets
+    :type position:
+        list
+    :return:
+        3 by 3 matrix and offset vector of length 3
+    :rtype:
+        tuple
+    """
+    matrix = np.zeros((3, 3))
+    offset = np.zeros(3)
+    for i, expression in enumerate(position):
+        expression = expression.replace(" ", "")
+        if not _EXPRESSION_REGEX.fullmatch(expression):
+            raise ValueError(
+                f"'{expression}' is not a valid Wyckoff position coordinate"
+            )
+        for match in _TERM_REGEX.finditer(expression):
+            sign, coefficient, variable, numerator, denominator = match.groups()
+            sign = -1 if sign == "-" else 1
+            if variable:
+                matrix[i, "xyz".index(variable)] += sign * int(coefficient or 1)
+            else:
+                offset[i] += sign * float(
+                    Fraction(numerator) / int(denominator or 1)
+                )
+    return matrix, offset
+
+
+class WyckoffPositions(Mapping):
+    """Read-only mapping of Wyckoff letters to Wyckoff positions.
+
+    This class gives access to the Wyckoff positions of a space group stored in
+    the packed Wyckoff database. The site records are a zero-copy view into the
+    memory-mapped database, only the requested positions are decoded.
+
+    :param space_group_number:
+        space group number between 1 and 230
+    :type space_group_number:
+        int
+    """
+
+    def __init__(self, space_group_number):
+        if space_group_number <= 0 or space_group_number > 230:
+            raise ValueError(
+                "space_group_number must be an integer between 1 and 230"
+            )
+        offsets, sites = data._load_data("wyckoff_database")
+        self.space_group_number = space_group_number
+        self.sites = sites[
+            offsets[space_group_number] : offsets[space_group_number + 1]
+        ]
+        self._first_row = int(offsets[space_group_number])
+        self._index = {
+            letter.decode(): i for i, letter in enumerate(self.sites["letter"])
+        }
+        self._affine = {}
+
+    def __getitem__(self, letter):
+        """Get the Wyckoff position of a Wyckoff letter.
+
+        :param letter:
+            Wyckoff letter
+        :type letter:
+            str
+        :return:
+            the three coordinate expressions of the Wyckoff position, e.g.
+            ``["x", "2x", "1/4"]``
+        :rtype:
+            list
+        """
+        position = self.sites["position"][self._index[letter]]
+        return [item.decode() for item in position]
+
+    def get_affine(self, letter):
+        """Get the compiled affine form of a Wyckoff position.
+
+        The Wyckoff position is compiled once, later calls return the cached
+        read-only arrays. See :func:`compile_position`.
+
+        :param letter:
+            Wyckoff letter
+        :type letter:
+            str
+        :return:
+            3 by 3 matrix and offset vector of length 3
+        :rtype:
+            tuple
+        """
+        try:
+            return self._affine[letter]
+        except KeyError:
+            pass
+        matrix, offset = compile_position(self[letter])
+        matrix.flags.writeable = False
+        offset.flags.writeable = False
+        self._affine[letter] = matrix, offset
+        return matrix, offset
+
+    def get_orbit(self, letter):
+        """Get the precomputed orbit template of a Wyckoff position.
+
+        The orbit of a Wyckoff position is the list of the distinct affine maps
+        that generate its sites from the free parameters, so the fractional
+        coordinates of its K sites are
+        ``np.einsum("kij,j->ki", matrices, [x, y, z]) + translations``. K is
+        the exact multiplicity of the Wyckoff position. The returned arrays
+        are zero-copy views into the orbit template table.
+
+        :param letter:
+            Wyckoff letter
+        :type letter:
+            str
+        :return:
+            K by 3 by 3 matrices, K by 3 translations and the index of the
+            first symmetry operation of the space group generating each site
+        :rtype:
+            tuple
+        """
+        offsets, matrices, translations, operations = data._load_data(
+            "wyckoff_orbit_templates"
+        )
+        row = self._first_row + self._index[letter]
+        orbit = slice(offsets[row], offsets[row + 1])
+        return (
+            np.asarray(matrices[orbit]),
+            np.asarray(translations[orbit]),
+            np.asarray(operations[orbit]),
+        )
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+@functools.lru_cache(maxsize=None)
+def get_wyckoff_positions(space_group_number):
+    """Get the shared Wyckoff positions of a space group.
+
+    :param space_group_number:
+        space group number between 1 and 230
+    :type space_group_number:
+        int
+    :return:
+        mapping of Wyckoff letters to Wyckoff positions
+    :rtype:
+        :class:`WyckoffPositions`
+    """
+    return WyckoffPositions(space_group_number)
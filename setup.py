@@ -16,6 +16,7 @@ setuptools.setup(
     packages=["fedorov"],
     package_data={
         "fedorov": [
+            "crystal_data/*.bin",
             "crystal_data/*.csv",
             "crystal_data/*.json",
             "crystal_data/*.pickle",
@@ -27,9 +28,7 @@ setuptools.setup(
         "Topic :: Scientific/Engineering",
     ],
     install_requires=[
-        "numpy>=1.10",
-        "spglib>=1.9.0",
-        "pandas>=0.20.0",
+        "numpy>=1.15",
         "rowan>=1.0.0",
     ],
     python_requires=">=3.3",
@@ -1,10 +1,13 @@
 # pytest
+import ast
+import csv
 import json
 import os
 import re
+import subprocess
+import sys
 
 import numpy as np
-import pandas as pd
 import pytest
 
 import fedorov
@@ -15,6 +18,7 @@ from fedorov import (
     Prototype,
     SpaceGroup,
 )
+from fedorov.catalog import get_aflow_catalog
 from fedorov.data import (
     _DATA_PATH,
     convert_to_box,
@@ -28,7 +32,8 @@ class TestAflowPrototype:
     @pytest.fixture(scope="module")
     def raw_data(self):
         fn = os.path.join(_DATA_PATH, "Aflow_raw_data.csv")
-        return pd.read_csv(fn, index_col=0)
+        with open(fn, newline="") as f:
+            return list(csv.DictReader(f))
 
     def test_construction(self, raw_data):
         """Test all available structures from Aflow database."""
@@ -37,7 +42,7 @@ class TestAflowPrototype:
             structure = AflowPrototype(i)
             basis_vectors, type_list = structure.get_basis_vectors()
             lattice_vectors = structure.get_lattice_vectors()
-            N = int(N_regex.findall(raw_data["Pearson Symbol"].iloc[i])[0])
+            N = int(N_regex.findall(raw_data[i]["Pearson Symbol"])[0])
             assert not np.isnan(lattice_vectors).any()
             assert len(basis_vectors) == N
             assert len(type_list) == N
@@ -217,6 +222,111 @@ def test_space_group():
     # TODO test quaternion accuracy
 
 
+def test_space_group_orientations():
+    import rowan
+
+    spg_test = SpaceGroup(221)
+    base_quaternions = rowan.normalize(np.array([[0.3, 0.2, -0.5, 0.7]]))
+    base_rotation = rowan.to_matrix(base_quaternions[0])
+    with pytest.warns(UserWarning):
+        spg_test.get_basis_vectors(
+            np.array([[0.1, 0.2, 0.3]]),
+            base_quaternions=base_quaternions,
+            apply_orientation=True,
+        )
+    with pytest.raises(ValueError):
+        spg_test.get_basis_vectors(
+            np.array([[0.1, 0.2, 0.3]]),
+            base_quaternions=base_quaternions,
+            apply_orientation=True,
+            improper="error",
+        )
+    # centrosymmetric particles, an improper operation R maps the particle
+    # rotation R0 onto -R R0
+    positions, _, quaternions = spg_test.get_basis_vectors(
+        np.array([[0.1, 0.2, 0.3]]),
+        base_quaternions=base_quaternions,
+        apply_orientation=True,
+        improper=[1, 0, 0, 0],
+    )
+    assert len(quaternions) == 48
+    operations = [
+        np.linalg.det(rotation) * rotation.dot(base_rotation)
+        for rotation in spg_test.rotations
+    ]
+    for rotation in rowan.to_matrix(quaternions):
+        assert any(np.allclose(rotation, expected) for expected in operations)
+
+    # the inversion maps a particle with the symmetry q_s onto q0 q_s
+    particle_symmetry = rowan.from_axis_angle([0, 0, 1], np.pi)
+    _, _, quaternions = SpaceGroup(2).get_basis_vectors(
+        np.array([[0.1, 0.2, 0.3]]),
+        base_quaternions=base_quaternions,
+        apply_orientation=True,
+        improper=particle_symmetry,
+    )
+    assert np.allclose(quaternions[0], base_quaternions[0])
+    assert np.allclose(
+        quaternions[1], rowan.multiply(base_quaternions[0], particle_symmetry)
+    )
+
+
+@pytest.mark.parametrize(
+    "space_group_number, lattice_params",
+    [(191, {}), (194, {"c": 1.7}), (166, {"alpha": 1.2}), (12, {"beta": 2})],
+)
+def test_cartesian_orientations(space_group_number, lattice_params):
+    import rowan
+
+    spg_test = SpaceGroup(space_group_number)
+    lattice_vectors = spg_test.get_lattice_vectors(**lattice_params)
+    base_quaternions = rowan.normalize(np.array([[0.3, 0.2, -0.5, 0.7]]))
+    base_rotation = rowan.to_matrix(base_quaternions[0])
+    _, _, quaternions = spg_test.get_basis_vectors(
+        np.array([[0.11, 0.23, 0.37]]),
+        base_quaternions=base_quaternions,
+        apply_orientation=True,
+        improper=[1, 0, 0, 0],
+        lattice_vectors=lattice_vectors,
+    )
+    assert len(quaternions) == len(spg_test.rotations)
+    # the symmetry operations in Cartesian coordinates, A^T R A^-T
+    rotations = np.einsum(
+        "ji,ojk,lk->oil",
+        lattice_vectors,
+        spg_test.rotations,
+        np.linalg.inv(lattice_vectors),
+    )
+    assert np.allclose(
+        np.einsum("oji,ojk->oik", rotations, rotations), np.identity(3)
+    )
+    operations = [
+        np.linalg.det(rotation) * rotation.dot(base_rotation)
+        for rotation in rotations
+    ]
+    for rotation in rowan.to_matrix(quaternions):
+        assert any(np.allclose(rotation, expected) for expected in operations)
+
+
+def test_plane_group_orientations():
+    import rowan
+
+    pg_test = PlaneGroup(16)
+    _, _, quaternions = pg_test.get_basis_vectors(
+        np.array([[0.1, 0.2]]),
+        base_quaternions=np.array([[1.0, 0, 0, 0]]),
+        apply_orientation=True,
+        improper="error",
+    )
+    # the six-fold rotations about z
+    angles = np.sort(
+        np.arctan2(quaternions[:, 3], quaternions[:, 0]) * 2 % (2 * np.pi)
+    )
+    assert np.allclose(angles, np.arange(6) * np.pi / 3)
+    assert np.allclose(quaternions[:, 1:3], 0)
+    assert np.allclose(rowan.norm(quaternions), 1)
+
+
 # test all values against structures_for_test.txt
 def test_prototype_accuracy():
     reference_file = os.path.join(
@@ -252,7 +362,7 @@ def test_prototype_accuracy():
 
 # test aflow_database parameter is complete
 def test_aflow_database_accuracy():
-    for i, name in AflowPrototype._Aflow_database["id"].iteritems():
+    for i, name in enumerate(get_aflow_catalog().id):
         cdbs = AflowPrototype(i)
         keys = set(cdbs.lattice_params.keys())
         if name.startswith("a"):  # triclinic
@@ -302,3 +412,286 @@ def test_point_group():
         point_group_test.get_rotation_matrix()[2],
         np.array([[-1, 0, 0], [0, 1, 0], [0, 0, -1]]),
     )
+
+
+# test that the quaternions of the hexagonal point groups are exact rotations
+@pytest.mark.parametrize("point_group_number", range(16, 28))
+def test_point_group_quaternions(point_group_number):
+    import rowan
+
+    from fedorov.space_group import _get_point_group_quaternions
+
+    point_group = PointGroup(point_group_number)
+    quaternions, improper = _get_point_group_quaternions(point_group_number)
+    assert np.array_equal(point_group.get_quaternion(), quaternions)
+    axes = fedorov.lattice.Hexagonal.get_lattice_vectors(a=1, c=1)
+    rotations = np.einsum(
+        "ji,mjk,kl->mil",
+        axes,
+        point_group.get_rotation_matrix(),
+        np.linalg.inv(axes).T,
+    )
+    rotations[improper] *= -1
+    assert np.allclose(rowan.to_matrix(quaternions), rotations)
+
+
+@pytest.mark.parametrize("point_group_number", [3, 21, 27, 32])
+def test_fundamental_zone(point_group_number):
+    import rowan
+
+    from fedorov.space_group import _get_point_group_quaternions
+
+    point_group = PointGroup(point_group_number)
+    operations, improper = _get_point_group_quaternions(point_group_number)
+    rotations = operations[~improper]
+    # the rotations of the point group form a group
+    products = rowan.multiply(rotations[:, np.newaxis], rotations).reshape(
+        -1, 4
+    )
+    assert np.all(np.isclose(np.abs(products.dot(rotations.T)), 1).sum(1) == 1)
+
+    quaternions = rowan.random.rand(1000)
+    reduced, index = point_group.to_fundamental_zone(
+        quaternions, chunk_size=300, return_index=True
+    )
+    # the reduced orientations are the equivalent orientations of smallest
+    # angle, with a nonnegative real part
+    equivalents = rowan.multiply(quaternions[:, np.newaxis], rotations)
+    assert np.allclose(reduced[:, 0], np.abs(equivalents[..., 0]).max(axis=1))
+    assert not improper[index].any()
+    assert np.allclose(
+        np.abs(reduced), np.abs(rowan.multiply(quaternions, operations[index]))
+    )
+    assert np.allclose(point_group.to_fundamental_zone(reduced), reduced)
+    assert np.allclose(
+        point_group.to_fundamental_zone(quaternions, threads=2), reduced
+    )
+
+
+@pytest.mark.parametrize("point_group_number", [1, 21, 32])
+def test_misorientations(point_group_number):
+    import rowan
+
+    from fedorov.space_group import _get_point_group_quaternions
+
+    point_group = PointGroup(point_group_number)
+    operations, improper = _get_point_group_quaternions(point_group_number)
+    orientations1 = rowan.random.rand(37)
+    orientations2 = rowan.random.rand(23)
+    # the smallest angle of the rotations from a g1 to b g2
+    rotations = operations[~improper]
+    differences = rowan.multiply(
+        rowan.conjugate(
+            rowan.multiply(orientations1[:, np.newaxis], rotations)
+        )[:, np.newaxis, :, np.newaxis],
+        rowan.multiply(orientations2[:, np.newaxis], rotations)[
+            np.newaxis, :, np.newaxis
+        ],
+    )
+    expected = 2 * np.arccos(np.clip(np.abs(differences[..., 0]), 0, 1))
+    expected = expected.min(axis=(2, 3))
+    for block_size, threads in [(2**20, 1), (100, 1), (100, 3)]:
+        angles, index = point_group.get_misorientations(
+            orientations1,
+            orientations2,
+            block_size=block_size,
+            threads=threads,
+            return_index=True,
+        )
+        assert np.allclose(angles, expected, atol=1e-6)
+        assert np.allclose(
+            point_group.get_misorientations(
+                orientations1, orientations2, block_size=block_size
+            ),
+            angles,
+        )
+        # b g is the equivalent orientation of b closest to a
+        closest = rowan.multiply(orientations2, operations[index])
+        assert np.allclose(
+            np.abs(np.einsum("nk,nmk->nm", orientations1, closest)),
+            np.cos(angles / 2),
+        )
+        angles, index = point_group.get_misorientations(
+            orientations1[:23],
+            orientations2,
+            pairwise=False,
+            block_size=block_size,
+            threads=threads,
+            return_index=True,
+        )
+        assert np.allclose(angles, np.diag(expected), atol=1e-6)
+        assert np.allclose(
+            point_group.get_misorientations(
+                orientations1[:23], orientations2, pairwise=False
+            ),
+            angles,
+        )
+    with pytest.raises(ValueError):
+        point_group.get_misorientations(
+            orientations1, orientations2, pairwise=False
+        )
+
+
+# test that heavy data and dependencies are only loaded on first use
+def test_lazy_import():
+    code = (
+        "import sys, fedorov; "
+        "print(*[m for m in ('pandas', 'spglib', 'rowan') if m in sys.modules])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert out.stdout.strip() == ""
+
+
+# test the packed Wyckoff database against the source json files
+def test_wyckoff_database():
+    for space_group_number in range(1, 231):
+        fn = os.path.join(
+            _DATA_PATH,
+            f"space_group_{space_group_number}_Wyckoff_site_data.json",
+        )
+        with open(fn, "r") as f:
+            reference = json.load(f)
+        positions = fedorov.wyckoff.get_wyckoff_positions(space_group_number)
+        assert dict(positions) == reference
+
+
+# test the packed AFLOW catalog against the source csv file
+def test_aflow_catalog():
+    fn = os.path.join(_DATA_PATH, "Aflow_processed_data.csv")
+    with open(fn, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 590
+    for i, row in enumerate(rows):
+        structure = AflowPrototype(i, set_type=True)
+        assert structure.id == row["id"]
+        assert structure.pearson_symbol == row["pearson_symbol"]
+        assert structure.prototype == row["prototype"]
+        assert structure.space_group_number == int(row["space_group"])
+        basis_params = dict(
+            zip(
+                ast.literal_eval(row["basis_params"]),
+                ast.literal_eval(row["basis_params_value"]),
+            )
+        )
+        assert structure.basis_params == basis_params
+        sites_by_type = ast.literal_eval(row["wyckoff_sites"])
+        assert structure.wyckoff_site_list == sorted("".join(sites_by_type))
+        for type_name, sites in zip("ABCDE", sites_by_type):
+            assert sorted(sites) == sorted(
+                site
+                for site, site_type in zip(
+                    structure.wyckoff_site_list, structure.type_by_site
+                )
+                if site_type == type_name
+            )
+        lattice_params = dict(
+            zip(
+                ast.literal_eval(row["lattice_params"]),
+                ast.literal_eval(row["lattice_params_value"]),
+            )
+        )
+        if structure.space_group.lattice_type == "rhombohedral":
+            # converted from hexagonal to rhombohedral axes
+            vectors = structure.get_lattice_vectors()
+            a = lattice_params["a"]
+            volume = a**3 * lattice_params["c/a"] * np.sqrt(3) / 2
+            assert np.isclose(np.linalg.det(vectors), volume / 3)
+        else:
+            for name, value in lattice_params.items():
+                if name in ("alpha", "beta", "gamma"):
+                    value = np.radians(value)
+                elif name in ("b/a", "c/a"):
+                    name, value = name[0], value * lattice_params["a"]
+                assert np.isclose(structure.lattice_params[name], value)
+
+
+# test compilation of Wyckoff positions into affine maps
+def test_compile_position():
+    matrix, offset = fedorov.wyckoff.compile_position(["-x+1/2", "2x", "z"])
+    assert np.allclose(matrix, [[-1, 0, 0], [2, 0, 0], [0, 0, 1]])
+    assert np.allclose(offset, [0.5, 0, 0])
+    point = np.array([0.1, 0.2, 0.3])
+    assert np.allclose(matrix.dot(point) + offset, [0.4, 0.2, 0.3])
+    with pytest.raises(ValueError):
+        fedorov.wyckoff.compile_position(["x*2", "0", "0"])
+
+
+# test the orbit ordering and the periodic deduplication of positions
+def test_space_group_ordering():
+    spg_test = SpaceGroup(225)
+    basis_positions = np.array([[0.11, 0.23, 0.37], [0, 0, 1 - 1e-12]])
+    by_operation, type_by_operation = spg_test.get_basis_vectors(
+        basis_positions, base_type=["A", "B"]
+    )
+    by_site, type_by_site = spg_test.get_basis_vectors(
+        basis_positions, base_type=["A", "B"], ordering="site"
+    )
+    assert len(by_operation) == len(by_site) == 196
+    assert type_by_site == ["A"] * 192 + ["B"] * 4
+    assert sorted(type_by_operation) == type_by_site
+    assert np.allclose(np.sort(by_operation, axis=0), np.sort(by_site, axis=0))
+
+    # images within the tolerance are merged across rounding boundaries and
+    # across the periodic boundary
+    for position in ([0.5e-6, 0.3, 0.3], [1 - 5e-7, 0.1, 0.1]):
+        basis_vectors, _ = SpaceGroup(1).get_basis_vectors(
+            np.array([position, np.array(position) + 2e-7])
+        )
+        assert len(basis_vectors) == 1
+
+
+# test the precomputed symmetry operations against spglib
+def test_space_group_symmetry_operations():
+    spg = pytest.importorskip("spglib")
+    for space_group_number in range(1, 231):
+        spg_test = SpaceGroup(space_group_number)
+        info = spg.get_symmetry_from_database(
+            SpaceGroup.space_group_hall_mapping[space_group_number]
+        )
+        assert np.array_equal(spg_test.rotations, info["rotations"])
+        assert np.array_equal(spg_test.translations, info["translations"])
+        assert spg_test.rotations is SpaceGroup(space_group_number).rotations
+        assert not spg_test.rotations.flags.writeable
+
+
+# test the exact multiplicity of Wyckoff sites expanded from orbit templates
+def test_wyckoff_orbit_multiplicity():
+    structure = Prototype(space_group_number=225, wyckoff_site="el")
+    basis_params = {"x1": 1e-7, "x2": 0.11, "y2": 0.23, "z2": 0.37}
+    basis_vectors, type_list = structure.get_basis_vectors(**basis_params)
+    assert len(basis_vectors) == 24 + 192
+    assert np.all((basis_vectors >= 0) & (basis_vectors < 1))
+    positions = fedorov.wyckoff.get_wyckoff_positions(225)
+    matrices, translations, operations = positions.get_orbit("e")
+    assert matrices.shape == (24, 3, 3)
+    assert translations.shape == (24, 3)
+    assert operations[0] == 0
+
+
+# test batched evaluation of a prototype over many parameter sets
+def test_prototype_batch():
+    structure = Prototype(space_group_number=166, wyckoff_site="ch")
+    x = np.linspace(0.1, 0.2, 4)
+    basis_params = {"x1": 0.3, "x2": x, "y2": 0.7 - x}
+    lattice_params = {"a": np.linspace(1, 2, 4), "alpha": 1.2}
+    basis_vectors, type_list, lattice_vectors = structure.get_vectors_batch(
+        basis_params, lattice_params
+    )
+    assert basis_vectors.shape == (4, 8, 3)
+    assert lattice_vectors.shape == (4, 3, 3)
+    for i in range(4):
+        point_basis_vectors, point_type_list = structure.get_basis_vectors(
+            x1=0.3, x2=x[i], y2=0.7 - x[i]
+        )
+        assert np.allclose(basis_vectors[i], point_basis_vectors)
+        assert type_list == point_type_list
+        assert np.allclose(
+            lattice_vectors[i],
+            structure.get_lattice_vectors(a=1 + i / 3, alpha=1.2),
+        )
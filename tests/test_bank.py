@@ -0,0 +1,67 @@
+# pytest
+import os
+
+import numpy as np
+import pytest
+
+from fedorov import AflowPrototype, bank, data
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEDOROV_CACHE_DIR", str(tmp_path))
+    data._TABLES.pop("aflow_structure_bank", None)
+    yield tmp_path
+    data._TABLES.pop("aflow_structure_bank", None)
+
+
+def test_default_structures(cache_dir):
+    for i in range(590):
+        basis_vectors, typeid, lattice_vectors = bank.get_default_structure(i)
+        structure = AflowPrototype(i, set_type=True)
+        reference_basis, type_list = structure.get_basis_vectors()
+        assert np.array_equal(basis_vectors, reference_basis)
+        assert [chr(ord("A") + t) for t in typeid] == type_list
+        assert np.array_equal(lattice_vectors, structure.get_lattice_vectors())
+        assert not basis_vectors.flags.writeable
+    assert len(os.listdir(cache_dir)) == 1
+    with pytest.raises(ValueError):
+        bank.get_default_structure(590)
+
+
+def test_bank_invalidation(cache_dir, tmp_path_factory, monkeypatch):
+    bank.get_default_structure(0)
+    (old_bank,) = os.listdir(cache_dir)
+
+    # the cached bank is reused
+    data._TABLES.pop("aflow_structure_bank")
+    bank.get_default_structure(0)
+    assert os.listdir(cache_dir) == [old_bank]
+
+    # a change of the source data replaces the bank
+    source = "space_group_lattice_mapping.json"
+    modified = tmp_path_factory.mktemp("source") / source
+    with open(os.path.join(data._DATA_PATH, source), "rb") as f:
+        modified.write_bytes(f.read() + b"\n")
+    monkeypatch.setattr(
+        bank,
+        "_SOURCES",
+        tuple(
+            str(modified) if filename == source else filename
+            for filename in bank._SOURCES
+        ),
+    )
+    data._TABLES.pop("aflow_structure_bank")
+    basis_vectors, _, _ = bank.get_default_structure(0)
+    (new_bank,) = os.listdir(cache_dir)
+    assert new_bank != old_bank
+    assert np.array_equal(
+        basis_vectors, AflowPrototype(0).get_basis_vectors()[0]
+    )
+
+    # banks of other bank versions are kept
+    monkeypatch.setattr(bank, "_BANK_VERSION", bank._BANK_VERSION + 1)
+    data._TABLES.pop("aflow_structure_bank")
+    bank.get_default_structure(0)
+    assert new_bank in os.listdir(cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
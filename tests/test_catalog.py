@@ -0,0 +1,104 @@
+# pytest
+import re
+
+import numpy as np
+import pytest
+
+from fedorov import AflowPrototype, AflowPrototypeSequence
+from fedorov.catalog import get_aflow_catalog
+
+
+@pytest.fixture
+def aflow_catalog():
+    return get_aflow_catalog()
+
+
+@pytest.mark.parametrize(
+    "criteria",
+    [
+        {},
+        {"pearson_symbol": "cP8"},
+        {"pearson_symbol": "cP8", "space_group": 198},
+        {"space_group": 230, "prototype": "Unknown"},
+        {"lattice_system": {"cubic", "hexagonal"}},
+        {"space_group": range(190, 231), "n_atoms": range(1, 9)},
+        {"space_group": range(1, 231, 2)},
+        {"prototype": re.compile("^Al"), "lattice_system": "cubic"},
+        {"id": ["hP4-C-194", "cP8-Cr3Si-223"]},
+        {"pearson_symbol": None, "n_atoms": 4},
+    ],
+)
+def test_query(aflow_catalog, criteria):
+    def match(column, value, row):
+        cell = getattr(aflow_catalog, column)[row]
+        if value is None:
+            return True
+        if isinstance(value, type(re.compile(""))):
+            return value.search(cell) is not None
+        if isinstance(value, (range, set, list)):
+            return cell in value
+        return cell == value
+
+    expected = [
+        row
+        for row in range(len(aflow_catalog))
+        if all(match(*criterion, row) for criterion in criteria.items())
+    ]
+    result = aflow_catalog.query(**criteria)
+    assert np.array_equal(result, expected)
+
+
+def test_query_columns(aflow_catalog):
+    assert aflow_catalog.n_atoms[aflow_catalog.query(id="cP8-Cr3Si-223")] == 8
+    with pytest.raises(ValueError):
+        aflow_catalog.query(formula="NaCl")
+
+
+def test_from_query_criteria():
+    structures = AflowPrototype.from_query(
+        lattice_system="cubic", n_atoms=range(1, 3)
+    )
+    assert len(structures) > 0
+    assert all(
+        structure.space_group.lattice_type == "cubic"
+        and int(structure.pearson_symbol[2:]) < 3
+        for structure in structures
+    )
+
+
+def test_lazy_query_result():
+    structures = AflowPrototype.from_query(lattice_system="cubic")
+    indices = get_aflow_catalog().query(lattice_system="cubic")
+    assert len(structures) == len(indices)
+    # nothing is created before it is accessed
+    assert structures._get.cache_info().currsize == 0
+    assert structures[-1].id == get_aflow_catalog().id[indices[-1]]
+    assert structures[-1] is structures[len(indices) - 1]
+    assert structures._get.cache_info().currsize == 1
+
+    head = structures[2:6]
+    assert len(head) == 4
+    assert head[0] is structures[2]
+    assert [structure.id for structure in head] == list(
+        get_aflow_catalog().id[indices[2:6]]
+    )
+
+    small = structures.filter(n_atoms=range(1, 5))
+    assert np.array_equal(
+        small.indices,
+        get_aflow_catalog().query(lattice_system="cubic", n_atoms=range(1, 5)),
+    )
+    elements = small.filter(
+        lambda structure: len(structure.wyckoff_site_list) == 1
+    )
+    assert 0 < len(elements) < len(small)
+    assert all(len(structure.wyckoff_site_list) == 1 for structure in elements)
+
+
+def test_lazy_query_cache_bound():
+    structures = AflowPrototypeSequence(range(10), maxsize=4)
+    for structure in structures:
+        pass
+    assert structures._get.cache_info().currsize == 4
+    assert structures[9] is structure
+    assert structures[0] is not AflowPrototypeSequence([0])[0]
@@ -0,0 +1,236 @@
+# pytest
+import numpy as np
+import pytest
+
+from fedorov import AflowPrototype
+from fedorov.cif import read_cif, read_cif_directory
+from fedorov.data import get_volume
+
+NACL = """# comment
+data_NaCl
+_symmetry_space_group_name_H-M   'F m -3 m'
+_symmetry_Int_Tables_number      225
+_cell_length_a                   5.6402(3)
+_cell_length_b                   5.6402(3)
+_cell_length_c                   5.6402(3)
+_cell_angle_alpha                90
+_cell_angle_beta                 90
+_cell_angle_gamma                90
+_publ_section_title
+;
+ A text field with 'quotes'
+;
+loop_
+_atom_site_label
+_atom_site_type_symbol
+_atom_site_Wyckoff_symbol
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+Na1 Na+ 4a 0 0 0
+Cl1 Cl- 4b 0.5 0.5 0.5
+data_second_block
+_cell_length_a 1
+"""
+
+BISMUTH = """data_Bi
+_space_group_IT_number 166
+_cell_length_a 4.546
+_cell_length_b 4.546
+_cell_length_c 11.862
+_cell_angle_alpha 90
+_cell_angle_beta 90
+_cell_angle_gamma 120
+loop_
+_atom_site_label
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+_atom_site_Wyckoff_symbol
+Bi1 0 0 0.2339 6c
+"""
+
+P21 = """data_P21
+_cell_length_a 3
+_cell_length_b 4
+_cell_length_c 5
+_cell_angle_alpha 90
+_cell_angle_beta 100
+_cell_angle_gamma 90
+loop_
+_space_group_symop_operation_xyz
+'x, y, z'
+'-x, y+1/2, -z'
+loop_
+_atom_site_label
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+C1 0.1 0.2 0.3
+O1 0.3 0.25 0.1
+"""
+
+
+def _write_cif(path, structure, wyckoff_symbols=True):
+    """Write the Wyckoff sites of a prototype to a CIF."""
+    basis_vectors, _ = structure.get_basis_vectors()
+    lattice_vectors = structure.get_lattice_vectors()
+    lengths = np.linalg.norm(lattice_vectors, axis=1)
+    angles = [
+        np.degrees(
+            np.arccos(
+                lattice_vectors[i].dot(lattice_vectors[j])
+                / lengths[i]
+                / lengths[j]
+            )
+        )
+        for i, j in ((1, 2), (0, 2), (0, 1))
+    ]
+    lines = [
+        "data_test",
+        f"_space_group_IT_number {structure.space_group_number}",
+    ]
+    for tag, value in zip(
+        ["length_a", "length_b", "length_c", "angle_alpha", "angle_beta"]
+        + ["angle_gamma"],
+        [*lengths, *angles],
+    ):
+        lines.append(f"_cell_{tag} {float(value)!r}")
+    lines += ["loop_", "_atom_site_label"]
+    lines += [f"_atom_site_fract_{x}" for x in "xyz"]
+    if wyckoff_symbols:
+        lines.append("_atom_site_Wyckoff_symbol")
+    # the first basis vectors are the Wyckoff positions of the sites
+    for i, letter in enumerate(structure.wyckoff_site_list):
+        line = structure.type_by_site[i] + str(i + 1) + " "
+        line += " ".join(repr(float(x)) for x in basis_vectors[i])
+        if wyckoff_symbols:
+            line += " " + letter
+        lines.append(line)
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("prototype_index", [0, 10, 100, 252, 400, 589])
+def test_prototype_round_trip(tmp_path, prototype_index):
+    structure = AflowPrototype(prototype_index=prototype_index, set_type=True)
+    basis_vectors, type_list = structure.get_basis_vectors()
+    lattice_vectors = structure.get_lattice_vectors()
+    fn = tmp_path / "structure.cif"
+
+    _write_cif(fn, structure)
+    result = read_cif(fn)
+    assert result.prototype.space_group_number == structure.space_group_number
+    assert result.prototype.wyckoff_site_list == structure.wyckoff_site_list
+    assert np.allclose(result.basis_vectors, basis_vectors)
+    assert result.type_list == type_list
+    assert np.allclose(result.lattice_vectors, lattice_vectors)
+    assert np.allclose(
+        result.prototype.get_basis_vectors(**result.basis_params)[0],
+        basis_vectors,
+    )
+
+    # without Wyckoff symbols the sites are expanded by the space group
+    _write_cif(fn, structure, wyckoff_symbols=False)
+    result = read_cif(fn)
+    assert result.prototype is None
+    assert np.allclose(result.lattice_vectors, lattice_vectors)
+    assert len(result.basis_vectors) == len(basis_vectors)
+    distances = result.basis_vectors[:, np.newaxis] - basis_vectors
+    distances -= np.rint(distances)
+    match = np.abs(distances).max(axis=-1) < 1e-6
+    assert np.all(match.sum(axis=1) == 1)
+    assert [type_list[i] for i in match.argmax(axis=1)] == result.type_list
+
+
+def test_cif_syntax(tmp_path):
+    fn = tmp_path / "NaCl.cif"
+    fn.write_text(NACL)
+    result = read_cif(fn)
+    assert result.prototype.wyckoff_site_list == ["a", "b"]
+    assert result.lattice_params == {"a": 5.6402}
+    assert result.type_names == ["Na", "Cl"]
+    assert result.type_list == ["Na", "Cl"] * 4
+
+
+def test_hexagonal_axes(tmp_path):
+    fn = tmp_path / "Bi.cif"
+    fn.write_text(BISMUTH)
+    result = read_cif(fn)
+    assert result.prototype.space_group.lattice_type == "rhombohedral"
+    assert np.isclose(result.basis_params["x1"], 0.2339)
+    hexagonal_volume = 4.546**2 * 11.862 * np.sqrt(3) / 2
+    assert np.isclose(get_volume(result.lattice_vectors), hexagonal_volume / 3)
+    assert len(result.basis_vectors) == 2
+
+
+def test_orbit_point(tmp_path):
+    # (2/3, 1/3, 3/4) is the second point of the Wyckoff position 2c
+    fn = tmp_path / "Mg.cif"
+    fn.write_text(
+        BISMUTH.replace("166", "194")
+        .replace("11.862", "4.0")
+        .replace("Bi1 0 0 0.2339 6c", "Mg1 0.666667 0.333333 0.75 2c")
+    )
+    result = read_cif(fn)
+    assert result.prototype.wyckoff_site_list == ["c"]
+    assert np.allclose(
+        np.sort(result.basis_vectors, axis=0),
+        [[1 / 3, 1 / 3, 0.25], [2 / 3, 2 / 3, 0.75]],
+    )
+
+    # the rounded images are merged without the Wyckoff symbol
+    fn.write_text(
+        fn.read_text()
+        .replace("_atom_site_Wyckoff_symbol\n", "")
+        .replace(" 2c", "")
+    )
+    result = read_cif(fn)
+    assert result.prototype is None
+    assert len(result.basis_vectors) == 2
+
+
+def test_symmetry_operations(tmp_path):
+    fn = tmp_path / "P21.cif"
+    fn.write_text(P21)
+    result = read_cif(fn)
+    assert result.prototype is None
+    assert result.type_list == ["C", "C", "O", "O"]
+    assert np.allclose(
+        result.basis_vectors,
+        [[0.1, 0.2, 0.3], [0.9, 0.7, 0.7], [0.3, 0.25, 0.1], [0.7, 0.75, 0.9]],
+    )
+
+
+def test_decimal_translations(tmp_path):
+    fn = tmp_path / "P21.cif"
+    fn.write_text(P21.replace("'-x, y+1/2, -z'", "'-x, y+0.5, -z'"))
+    result = read_cif(fn)
+    assert result.type_list == ["C", "C", "O", "O"]
+    assert np.allclose(
+        result.basis_vectors,
+        [[0.1, 0.2, 0.3], [0.9, 0.7, 0.7], [0.3, 0.25, 0.1], [0.7, 0.75, 0.9]],
+    )
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_read_cif_directory(tmp_path, processes):
+    (tmp_path / "NaCl.cif").write_text(NACL)
+    (tmp_path / "Bi.cif").write_text(BISMUTH)
+    (tmp_path / "P21.cif").write_text(P21)
+    (tmp_path / "broken.cif").write_text("data_broken\n_cell_length_a 1\n")
+    with pytest.raises(ValueError):
+        read_cif_directory(tmp_path, processes=processes)
+    structures = read_cif_directory(
+        tmp_path, processes=processes, chunksize=1, skip_errors=True
+    )
+    assert list(structures) == [
+        str(tmp_path / name) for name in ("Bi.cif", "NaCl.cif", "P21.cif")
+    ]
+    assert structures[str(tmp_path / "NaCl.cif")].type_names == ["Na", "Cl"]
+    (tmp_path / "more").mkdir()
+    (tmp_path / "more" / "P21.cif").write_text(P21)
+    for pattern, count in (("*.cif", 3), ("**/*.cif", 4)):
+        structures = read_cif_directory(
+            tmp_path, pattern, processes, skip_errors=True
+        )
+        assert len(structures) == count
@@ -0,0 +1,88 @@
+# pytest
+import numpy as np
+import pytest
+
+from fedorov import AflowPrototype, Prototype
+from fedorov.generate import generate_many
+
+SPECS = [
+    {"prototype_index": i, "set_type": True} for i in range(0, 590, 37)
+] + [
+    {
+        "space_group_number": 225,
+        "wyckoff_site": "ae",
+        "type_by_site": "AB",
+        "basis_params": {"x2": x},
+        "lattice_params": {"a": a},
+    }
+    for x, a in [(0.2, 1.0), (0.25, 2.0), (0.3, 3.0)]
+]
+
+
+def _check(structures):
+    assert len(structures.offsets) == len(SPECS) + 1
+    for i, spec in enumerate(SPECS):
+        spec = dict(spec)
+        basis_params = spec.pop("basis_params", {})
+        lattice_params = spec.pop("lattice_params", {})
+        if "prototype_index" in spec:
+            structure = AflowPrototype(**spec)
+        else:
+            structure = Prototype(**spec)
+        basis_vectors, type_list = structure.get_basis_vectors(**basis_params)
+        particles = slice(structures.offsets[i], structures.offsets[i + 1])
+        assert np.array_equal(
+            structures.basis_vectors[particles], basis_vectors
+        )
+        assert [chr(ord("A") + t) for t in structures.typeid[particles]] == (
+            type_list
+        )
+        assert np.array_equal(
+            structures.lattice_vectors[i],
+            structure.get_lattice_vectors(**lattice_params),
+        )
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_generate_many(tmp_path, processes):
+    structures = generate_many(
+        SPECS, tmp_path, processes=processes, chunksize=4
+    )
+    _check(structures)
+    _check(generate_many(SPECS, processes=processes, chunksize=5))
+
+
+def test_resume(tmp_path):
+    progress = []
+    generate_many(SPECS, tmp_path, processes=1, chunksize=4)
+    # forget the first two chunks and corrupt them
+    done = np.load(tmp_path / "done.npy", mmap_mode="r+")
+    done[:8] = False
+    done.flush()
+    del done
+    basis_vectors = np.load(tmp_path / "basis_vectors.npy", mmap_mode="r+")
+    basis_vectors[:] = -1
+    basis_vectors.flush()
+    del basis_vectors
+    with pytest.raises(ValueError):
+        generate_many(SPECS[:-1], tmp_path, processes=1)
+    structures = generate_many(
+        SPECS,
+        tmp_path,
+        processes=1,
+        chunksize=4,
+        progress=lambda *args: progress.append(args),
+    )
+    assert progress == [(len(SPECS) - 4, len(SPECS)), (len(SPECS),) * 2]
+    # only the forgotten chunks were generated again
+    assert np.all(structures.basis_vectors[structures.offsets[8] :] == -1)
+
+    structures = generate_many(SPECS, tmp_path, processes=1, resume=False)
+    _check(structures)
+
+
+def test_invalid_specs():
+    with pytest.raises(ValueError):
+        generate_many([{"a": 1}], processes=1)
+    with pytest.raises(ValueError):
+        generate_many([{"prototype_index": 0, "colour": 1}], processes=1)
@@ -0,0 +1,161 @@
+# pytest
+import numpy as np
+import pytest
+
+from fedorov import AflowPrototype, PlaneGroup, Prototype
+from fedorov.data import convert_to_box
+from fedorov.io import write_gsd, write_lammps_data, write_poscar, write_xyz
+from fedorov.supercell import build_supercell
+
+
+class TestGSD:
+    @pytest.fixture(autouse=True)
+    def gsd_hoomd(self):
+        return pytest.importorskip("gsd.hoomd")
+
+    def test_prototype(self, tmp_path, gsd_hoomd):
+        structure = AflowPrototype(prototype_index=10, set_type=True)
+        fn = tmp_path / "structure.gsd"
+        write_gsd(fn, structure, replicas=(2, 3, 4))
+        supercell = structure.get_supercell((2, 3, 4))
+        with gsd_hoomd.open(fn, "r") as f:
+            frame = f[0]
+        box = convert_to_box(supercell.lattice_vectors)
+        assert np.allclose(frame.configuration.box, box)
+        assert frame.particles.N == len(supercell.positions)
+        assert frame.particles.types == supercell.types
+        assert np.array_equal(frame.particles.typeid, supercell.typeid)
+        # all particles are inside the box centered at the origin
+        fractional = np.linalg.solve(
+            supercell.lattice_vectors.T, frame.particles.position.T
+        )
+        assert np.all(fractional >= -0.5 - 1e-6)
+        assert np.all(fractional < 0.5 + 1e-6)
+
+    def test_rotated_lattice(self, tmp_path, gsd_hoomd):
+        structure = Prototype(space_group_number=225, wyckoff_site="a")
+        supercell = structure.get_supercell(2)
+        rotation = np.array([[0, 1, 0], [-1, 0, 0], [0, 0, 1]])
+        rotated = supercell._replace(
+            positions=supercell.positions.dot(rotation),
+            lattice_vectors=supercell.lattice_vectors.dot(rotation),
+            orientations=np.tile([1.0, 0, 0, 0], (32, 1)),
+        )
+        fn = tmp_path / "structure.gsd"
+        write_gsd(fn, rotated)
+        with gsd_hoomd.open(fn, "r") as f:
+            frame = f[0]
+        assert np.allclose(frame.configuration.box, [2, 2, 2, 0, 0, 0])
+        assert np.allclose(
+            np.sort(frame.particles.position, axis=0),
+            np.sort(supercell.positions - 1, axis=0),
+        )
+        assert np.allclose(
+            np.abs(frame.particles.orientation),
+            [np.sqrt(0.5), 0, 0, np.sqrt(0.5)],
+        )
+
+    def test_plane_group(self, tmp_path, gsd_hoomd):
+        plane_group = PlaneGroup(9)
+        basis_vectors, type_list = plane_group.get_basis_vectors(
+            np.array([[0.1, 0.12]])
+        )
+        supercell = build_supercell(
+            basis_vectors, plane_group.get_lattice_vectors(a=1, b=2), 3
+        )
+        fn = tmp_path / "structure.gsd"
+        write_gsd(fn, supercell)
+        with gsd_hoomd.open(fn, "r") as f:
+            frame = f[0]
+        assert frame.configuration.dimensions == 2
+        assert np.allclose(frame.configuration.box, [3, 6, 0, 0, 0, 0])
+        assert np.all(frame.particles.position[:, 2] == 0)
+
+
+def _read_table(lines, n_columns):
+    return np.array([line.split()[:n_columns] for line in lines])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 2**16])
+def test_text_writers(tmp_path, chunk_size):
+    structure = AflowPrototype(prototype_index=10, set_type=True)
+    supercell = structure.get_supercell((2, 1, 3))
+    n = len(supercell.positions)
+    box = convert_to_box(supercell.lattice_vectors)
+
+    for source in (structure, supercell):
+        replicas = (2, 1, 3) if source is structure else 1
+
+        fn = tmp_path / "structure.data"
+        write_lammps_data(fn, source, replicas=replicas, chunk_size=chunk_size)
+        lines = fn.read_text().splitlines()
+        assert lines[2] == f"{n} atoms"
+        assert lines[3] == f"{len(supercell.types)} atom types"
+        bounds = _read_table(lines[5:8], 2).astype(float)
+        assert np.allclose(bounds[:, 1] - bounds[:, 0], box[:3])
+        atoms = _read_table(lines[lines.index("Atoms # atomic") + 2 :], 5)
+        assert np.array_equal(atoms[:, 0].astype(int), np.arange(1, n + 1))
+        assert np.array_equal(atoms[:, 1].astype(int), supercell.typeid + 1)
+        assert np.allclose(atoms[:, 2:].astype(float), supercell.positions)
+
+        fn = tmp_path / "structure.xyz"
+        write_xyz(fn, source, replicas=replicas, chunk_size=chunk_size)
+        lines = fn.read_text().splitlines()
+        assert int(lines[0]) == n
+        lattice = lines[1].split('"')[1].split()
+        assert np.allclose(
+            np.array(lattice, dtype=float).reshape(3, 3),
+            supercell.lattice_vectors,
+        )
+        atoms = _read_table(lines[2:], 4)
+        assert list(atoms[:, 0]) == [
+            supercell.types[i] for i in supercell.typeid
+        ]
+        assert np.allclose(atoms[:, 1:].astype(float), supercell.positions)
+
+        fn = tmp_path / "POSCAR"
+        write_poscar(fn, source, replicas=replicas, chunk_size=chunk_size)
+        lines = fn.read_text().splitlines()
+        lattice = _read_table(lines[2:5], 3).astype(float)
+        assert np.allclose(lattice, supercell.lattice_vectors)
+        assert lines[5].split() == supercell.types
+        counts = np.array(lines[6].split(), dtype=int)
+        assert np.array_equal(counts, np.bincount(supercell.typeid))
+        atoms = _read_table(lines[8:], 3).astype(float)
+        order = np.argsort(supercell.typeid, kind="stable")
+        assert np.allclose(atoms, supercell.positions[order])
+
+
+def test_lammps_triclinic(tmp_path):
+    basis_vectors, _ = PlaneGroup(1).get_basis_vectors(np.array([[0.1, 0.2]]))
+    lattice_vectors = np.array([[1.0, 0.0], [0.5, 0.9]])
+    supercell = build_supercell(basis_vectors, lattice_vectors, (3, 2))
+    fn = tmp_path / "structure.data"
+    write_lammps_data(fn, supercell)
+    lines = fn.read_text().splitlines()
+    assert lines[7] == "-0.5 0.5 zlo zhi"
+    tilts = np.array(lines[8].split()[:3], dtype=float)
+    assert np.allclose(tilts, [1.0, 0, 0])
+    atoms = _read_table(lines[12:], 5)[:, 2:].astype(float)
+    assert np.allclose(atoms[:, :2], supercell.positions)
+    assert np.all(atoms[:, 2] == 0)
+
+    with pytest.raises(ValueError):
+        write_poscar(tmp_path / "POSCAR", supercell)
+
+
+def test_poscar_single_pass(tmp_path, monkeypatch):
+    from fedorov import supercell
+
+    calls = []
+    iter_supercell = supercell.iter_supercell
+
+    def counting_iter_supercell(*args, **kwargs):
+        calls.append(None)
+        return iter_supercell(*args, **kwargs)
+
+    monkeypatch.setattr(supercell, "iter_supercell", counting_iter_supercell)
+    structures = AflowPrototype.from_query(pearson_symbol="cP5", set_type=True)
+    structure = structures[0]
+    write_poscar(tmp_path / "POSCAR", structure, replicas=2, chunk_size=7)
+    assert len(calls) == 1
@@ -0,0 +1,171 @@
+# pytest
+import itertools
+
+import numpy as np
+import pytest
+
+from fedorov import Prototype
+from fedorov.neighbors import find_neighbors, get_min_distances
+
+
+def _canonical(i, j, vector):
+    """Identify a pair i <= j, the image of a particle itself up to sign."""
+    vector = tuple(np.round(vector, 9) + 0.0)
+    if i == j:
+        vector = max(vector, tuple(-x + 0.0 for x in vector))
+    return (i, j, *vector)
+
+
+def _brute_force(positions, lattice_vectors, r_max):
+    # wrap into the unit cell so that a few images cover the cutoff
+    fractional = positions.dot(np.linalg.inv(lattice_vectors)) % 1
+    pairs = set()
+    n_particles, dimensions = positions.shape
+    for i, j in itertools.combinations_with_replacement(range(n_particles), 2):
+        for shift in itertools.product(range(-4, 5), repeat=dimensions):
+            vector = (fractional[j] - fractional[i] + shift).dot(
+                lattice_vectors
+            )
+            if np.linalg.norm(vector) < r_max and (i != j or any(shift)):
+                pairs.add(_canonical(i, j, vector))
+    return pairs
+
+
+@pytest.mark.parametrize("dimensions", [2, 3])
+def test_triclinic(dimensions):
+    rng = np.random.RandomState(dimensions)
+    for r_max in (0.4, 1.2, 2.5):
+        lattice_vectors = 1.5 * np.identity(dimensions) + rng.uniform(
+            -0.4, 0.4, (dimensions, dimensions)
+        )
+        positions = rng.uniform(-2, 2, (10, dimensions))
+        pairs = find_neighbors(positions, lattice_vectors, r_max, chunk_size=3)
+        assert np.all(pairs.i <= pairs.j)
+        assert np.allclose(
+            np.linalg.norm(pairs.vectors, axis=1), pairs.distances
+        )
+        found = {
+            _canonical(*pair) for pair in zip(pairs.i, pairs.j, pairs.vectors)
+        }
+        assert len(found) == len(pairs.i)
+        assert found == _brute_force(positions, lattice_vectors, r_max)
+
+        full = find_neighbors(positions, lattice_vectors, r_max, full=True)
+        assert len(full.i) == 2 * len(pairs.i)
+        assert np.allclose(
+            np.sort(full.distances), np.sort(np.repeat(pairs.distances, 2))
+        )
+
+
+def test_fcc_coordination():
+    structure = Prototype(space_group_number=225, wyckoff_site="a")
+    basis_vectors, _ = structure.get_basis_vectors()
+    lattice_vectors = structure.get_lattice_vectors()
+    # the unit cell is smaller than the cutoff, the neighbors are images
+    pairs = find_neighbors(
+        basis_vectors, lattice_vectors, 0.75, fractional=True
+    )
+    assert len(pairs.i) == 4 * 12 // 2
+    assert np.allclose(pairs.distances, np.sqrt(0.5))
+
+    supercell = structure.get_supercell([5, 6, 7])
+    pairs = find_neighbors(
+        supercell.positions, supercell.lattice_vectors, 0.75, full=True
+    )
+    assert np.all(np.bincount(pairs.i) == 12)
+    assert np.all(np.diff(pairs.i) >= 0)
+    # the bond vectors point to a periodic image of j
+    images = supercell.positions[pairs.i] + pairs.vectors
+    images -= supercell.positions[pairs.j]
+    images = images.dot(np.linalg.inv(supercell.lattice_vectors))
+    assert np.allclose(images, np.rint(images))
+
+    with pytest.raises(ValueError):
+        find_neighbors(basis_vectors, lattice_vectors, 0)
+
+
+def test_min_distances():
+    rng = np.random.RandomState(0)
+    basis_vectors = rng.uniform(0, 1, (20, 4, 3))
+    lattice_vectors = np.identity(3) + rng.uniform(-0.6, 0.6, (20, 3, 3))
+    radii = rng.uniform(0, 0.2, 4)
+    distances = get_min_distances(basis_vectors, lattice_vectors, radii, 64)
+    for i in range(20):
+        # the closest pair is within the minimum distance plus the contact
+        r_max = distances[i] + 2 * radii.max() + 1e-6
+        pairs = find_neighbors(
+            basis_vectors[i], lattice_vectors[i], r_max, fractional=True
+        )
+        expected = pairs.distances - radii[pairs.i] - radii[pairs.j]
+        assert np.isclose(distances[i], expected.min())
+    assert np.isclose(
+        get_min_distances(basis_vectors[0], lattice_vectors[0]),
+        get_min_distances(basis_vectors[:1], lattice_vectors[:1])[0],
+    )
+
+
+def test_min_distances_memory():
+    import tracemalloc
+
+    rng = np.random.RandomState(1)
+    basis_vectors = rng.uniform(0, 1, (50, 4, 3))
+    lattice_vectors = np.identity(3) + rng.uniform(-0.6, 0.6, (50, 3, 3))
+    # a nearly degenerate cell needs many more images than the others
+    lattice_vectors[0] = [[1, 0, 0], [0.999, 0.02, 0], [0, 0, 1]]
+    radii = rng.uniform(0, 0.2, 4)
+    tracemalloc.start()
+    try:
+        distances = get_min_distances(
+            basis_vectors, lattice_vectors, radii, chunk_size=1000
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 2e6
+    for i in range(50):
+        # the closest pair is within the minimum distance plus the contact
+        r_max = distances[i] + 2 * radii.max() + 1e-6
+        pairs = find_neighbors(
+            basis_vectors[i], lattice_vectors[i], r_max, fractional=True
+        )
+        expected = pairs.distances - radii[pairs.i] - radii[pairs.j]
+        assert np.isclose(distances[i], expected.min())
+    assert np.allclose(
+        get_min_distances(basis_vectors, lattice_vectors, radii, chunk_size=50),
+        distances,
+    )
+
+
+def test_prototype_screening():
+    # rock salt, the nearest neighbors are at a / 2
+    structure = Prototype(225, "ab", "AB")
+    a = np.array([1.0, 2.0, 3.0])
+    assert np.allclose(
+        structure.get_min_distances(lattice_params={"a": a}), a / 2
+    )
+    # the A particles are at a / sqrt(2) from each other
+    assert np.allclose(
+        structure.get_min_distances(
+            lattice_params={"a": a}, radii={"A": 0.5, "B": 0.1}
+        ),
+        np.minimum(a / 2 - 0.6, a / np.sqrt(2) - 1),
+    )
+    assert list(
+        structure.get_feasible(lattice_params={"a": a}, radii=0.25)
+    ) == [True, True, True]
+    assert list(structure.get_feasible(lattice_params={"a": a}, radii=0.3)) == [
+        False,
+        True,
+        True,
+    ]
+
+    with pytest.raises(ValueError):
+        structure.get_feasible(lattice_params={"a": a})
+
+    # the particles of the Wyckoff position 8g of space group 221 overlap at
+    # x = 0
+    structure = Prototype(221, "g")
+    x = np.linspace(0, 0.5, 11)
+    distances = structure.get_min_distances({"x1": x})
+    assert distances[0] == 0
+    assert np.allclose(distances[1:3], 2 * x[1:3])
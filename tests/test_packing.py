@@ -0,0 +1,111 @@
+# pytest
+import numpy as np
+import pytest
+
+from fedorov import Prototype
+
+pytest.importorskip("scipy")
+
+from fedorov.packing import (  # noqa
+    _PackingProblem,
+    maximize_packing,
+    maximize_packing_many,
+)
+
+CLOSE_PACKED = np.pi / (3 * np.sqrt(2))
+
+
+def test_cubic():
+    result = maximize_packing(Prototype(225, "a"), 0.5)
+    assert np.isclose(result.packing_fraction, CLOSE_PACKED)
+    assert np.isclose(result.lattice_params["a"], np.sqrt(2))
+    result = maximize_packing(Prototype(229, "a"), 0.5)
+    assert np.isclose(result.packing_fraction, np.pi * np.sqrt(3) / 8)
+    # rock salt, the small spheres fit in the octahedral holes of the fcc
+    # packing of the large spheres
+    result = maximize_packing(Prototype(225, "ab", "AB"), {"A": 0.5, "B": 0.2})
+    assert np.isclose(result.lattice_params["a"], np.sqrt(2))
+    assert np.isclose(
+        result.packing_fraction, 4 * 4 / 3 * np.pi * 0.133 / np.sqrt(2) ** 3
+    )
+
+
+def test_free_parameters():
+    # hcp, starting from the wrong axial ratio
+    result = maximize_packing(
+        Prototype(194, "c"), 0.5, lattice_params={"a": 1, "c": 1.2}
+    )
+    assert np.isclose(result.packing_fraction, CLOSE_PACKED)
+    assert np.isclose(
+        result.lattice_params["c"] / result.lattice_params["a"],
+        np.sqrt(8 / 3),
+    )
+    # a triclinic cell of one sphere, the densest lattice packing is fcc
+    result = maximize_packing(
+        Prototype(1, "a"),
+        0.5,
+        basis_params={"x1": 0, "y1": 0, "z1": 0},
+        lattice_params={
+            "a": 1,
+            "b": 1.3,
+            "c": 0.8,
+            "alpha": 1.7,
+            "beta": 1.5,
+            "gamma": 1.65,
+        },
+    )
+    assert np.isclose(result.packing_fraction, CLOSE_PACKED)
+
+
+# one space group of each lattice class
+@pytest.mark.parametrize("space_group_number", [1, 10, 47, 123, 166, 191, 221])
+def test_gradients(space_group_number):
+    prototype = Prototype(space_group_number, "a")
+    problem = _PackingProblem(prototype, 0.3)
+    values = {"a": 1.1, "b": 1.3, "c": 0.9, "alpha": 1.2}
+    values.update(beta=1.4, gamma=1.75)
+    theta = np.array(
+        [0.1 * (i + 1) for i in range(len(problem.basis_names))]
+        + [values[name] for name in problem.lattice_names]
+    )
+    lattice_vectors, derivatives = problem.get_lattice(theta)
+    step = 1e-6
+    for q, name in enumerate(problem.lattice_names):
+        shifted = [
+            prototype.get_lattice_vectors(
+                **dict(values, **{name: values[name] + sign * step})
+            )
+            for sign in (1, -1)
+        ]
+        numerical = (shifted[0] - shifted[1]) / (2 * step)
+        assert np.allclose(derivatives[q], numerical, atol=1e-7)
+
+    # the jacobian of the contact constraints
+    problem.contacts = problem.get_pairs(theta, 2)[:3]
+    values, jacobian = problem.constraints(theta)
+    numerical = np.empty_like(jacobian)
+    for q in range(len(theta)):
+        shift = np.zeros(len(theta))
+        shift[q] = step
+        numerical[:, q] = (
+            problem.constraints(theta + shift)[0]
+            - problem.constraints(theta - shift)[0]
+        ) / (2 * step)
+    assert np.allclose(jacobian, numerical, atol=1e-6)
+
+
+def test_many():
+    results = maximize_packing_many(
+        [
+            {"space_group_number": 225, "wyckoff_site": "a"},
+            {"space_group_number": 229, "wyckoff_site": "a"},
+        ],
+        0.5,
+        processes=1,
+    )
+    assert np.allclose(
+        [result.packing_fraction for result in results],
+        [CLOSE_PACKED, np.pi * np.sqrt(3) / 8],
+    )
+    with pytest.raises(ValueError):
+        maximize_packing(Prototype(225, "a"), 0)
@@ -0,0 +1,54 @@
+# pytest
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from fedorov import AflowPrototype, SpaceGroup, profiling
+
+
+def test_profile():
+    structure = AflowPrototype(10)
+    with profiling.profile() as report:
+        structure.get_basis_vectors()
+        structure.get_basis_vectors()
+        SpaceGroup(225).get_basis_vectors(np.array([[0.1, 0.2, 0.3]]))
+    assert not profiling.is_enabled()
+    assert report["prototype.get_basis_vectors"]["calls"] == 2
+    assert report["wyckoff.evaluate"]["calls"] == 2
+    assert report["space_group.deduplicate"]["calls"] == 1
+    assert report["data.wrap"]["calls"] == 4
+    for stats in report.values():
+        assert 0 <= stats["self_time"] <= stats["time"]
+        assert stats["bytes"] == 0
+
+    # nothing is recorded outside of the block
+    structure.get_basis_vectors()
+    with profiling.profile(memory=True) as report:
+        structure.get_basis_vectors()
+    assert report["prototype.get_basis_vectors"]["calls"] == 1
+    assert report["prototype.get_basis_vectors"]["bytes"] > 0
+
+    profiling.reset()
+    assert profiling.get_report() == {}
+    with pytest.raises(ValueError):
+        profiling.disable()
+
+
+def test_environment_variable(tmp_path):
+    fn = tmp_path / "report.json"
+    subprocess.run(
+        [sys.executable, "-c", "import fedorov; fedorov.AflowPrototype(0)"],
+        check=True,
+        env={
+            **os.environ,
+            "FEDOROV_PROFILE": "1",
+            "FEDOROV_PROFILE_REPORT": str(fn),
+        },
+    )
+    report = json.loads(fn.read_text())
+    assert report["aflow_prototype.init"]["calls"] == 1
+    assert report["data.load.aflow_database"]["calls"] == 1
@@ -0,0 +1,106 @@
+# pytest
+import numpy as np
+import pytest
+
+from fedorov import AflowPrototype, PlaneGroup, Prototype
+from fedorov.supercell import build_supercell, iter_supercell, write_supercell
+
+
+def test_prototype_supercell():
+    structure = AflowPrototype(prototype_index=5, set_type=True)
+    supercell = structure.get_supercell((2, 3, 4))
+    basis_vectors, type_list = structure.get_basis_vectors()
+    lattice_vectors = structure.get_lattice_vectors()
+    reference = [
+        (basis_vectors + [i, j, k]).dot(lattice_vectors)
+        for k in range(4)
+        for j in range(3)
+        for i in range(2)
+    ]
+    assert np.allclose(supercell.positions, np.concatenate(reference))
+    assert supercell.types == ["A", "B", "C"]
+    assert [supercell.types[i] for i in supercell.typeid] == type_list * 24
+    assert np.allclose(
+        supercell.lattice_vectors, lattice_vectors * [[2], [3], [4]]
+    )
+    assert supercell.orientations is None
+
+
+def test_plane_group_supercell():
+    plane_group = PlaneGroup(9)
+    basis_vectors, type_list, quaternions = plane_group.get_basis_vectors(
+        np.array([[0.1, 0.12]]),
+        base_quaternions=np.array([[1, 0, 0, 0]]),
+        apply_orientation=True,
+    )
+    supercell = build_supercell(
+        basis_vectors,
+        plane_group.get_lattice_vectors(a=1, b=2),
+        3,
+        type_list=type_list,
+        orientations=quaternions,
+        dtype=np.float32,
+    )
+    assert supercell.positions.shape == (72, 2)
+    assert supercell.positions.dtype == np.float32
+    assert supercell.orientations.shape == (72, 4)
+    assert np.allclose(supercell.positions.max(axis=0), [2.9, 5.8], atol=0.1)
+
+
+def test_supercell_errors():
+    structure = Prototype(space_group_number=225, wyckoff_site="a")
+    with pytest.raises(ValueError):
+        structure.get_supercell((2, 0, 2))
+    with pytest.raises(ValueError):
+        build_supercell(np.zeros((4, 3)), np.identity(2), 2)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 50, 10**6])
+@pytest.mark.parametrize("suffix", [".npy", ".bin"])
+def test_write_supercell(tmp_path, chunk_size, suffix):
+    structure = AflowPrototype(prototype_index=10)
+    basis_vectors, type_list = structure.get_basis_vectors()
+    lattice_vectors = structure.get_lattice_vectors()
+    replicas = (3, 2, 5)
+    supercell = build_supercell(
+        basis_vectors, lattice_vectors, replicas, type_list, dtype=np.float32
+    )
+    chunks = list(
+        iter_supercell(
+            basis_vectors,
+            lattice_vectors,
+            replicas,
+            type_list,
+            dtype=np.float32,
+            chunk_size=chunk_size,
+        )
+    )
+    assert np.array_equal(
+        np.concatenate([chunk.positions for chunk in chunks]),
+        supercell.positions,
+    )
+
+    reports = []
+    positions, types = write_supercell(
+        tmp_path / ("positions" + suffix),
+        basis_vectors,
+        lattice_vectors,
+        replicas,
+        type_list,
+        dtype=np.float32,
+        chunk_size=chunk_size,
+        typeid_filename=tmp_path / ("typeid" + suffix),
+        progress=lambda done, total: reports.append((done, total)),
+    )
+    del positions
+    if suffix == ".npy":
+        positions = np.load(tmp_path / "positions.npy")
+        typeid = np.load(tmp_path / "typeid.npy")
+    else:
+        positions = np.fromfile(tmp_path / "positions.bin", np.float32)
+        typeid = np.fromfile(tmp_path / "typeid.bin", np.int32)
+    assert np.array_equal(positions.reshape(-1, 3), supercell.positions)
+    assert np.array_equal(typeid, supercell.typeid)
+    assert types == supercell.types
+    assert reports[-1] == (len(supercell.positions),) * 2
+    assert len(reports) == len(chunks)